@@ -1,64 +1,133 @@
 import argparse
 import asyncio
-import json
-from pathlib import Path
+import signal
 from typing import List
 
-from dotenv import load_dotenv
-
+from galadriel import AgentInput
 from galadriel import AgentRuntime
-from galadriel.connectors.llm import LlmClient
+from src import prompt_log
 from src.agent.twitter_agent import TwitterAgent
-from src.models import TwitterAgentConfig
+from src.agent_config_loader import load_agent_config
+from src.agent_config_watcher import AgentConfigWatcher
+from src.agent_config_watcher import AgentConfigWatcherConfig
+from src.connectors.cassette import Cassette
+from src.connectors.connection_pool import ConnectionPool
+from src.connectors.connection_pool import ConnectionPoolConfig
+from src.connectors.llm_usage import LlmBudgetConfig
+from src.connectors.llm_usage import LlmUsageTracker
+from src.connectors.twitter_timeline_client import TwitterTimelineClient
+from src.loop_monitor import LoopMonitor
+from src.loop_monitor import LoopMonitorConfig
+from src.profiler import Profiler
+from src.profiler import ProfilerConfig
+from src.prompt_log import PromptLogConfig
+from src.replies.thread_cache import ThreadCache
 from src.repository.database import DatabaseClient
+from src.repository.dead_letter_store import DeadLetterStore
+from src.repository.usage_store import UsageStore
 from src.twitter_client import TwitterClient
-
-
-def _load_dotenv():
-    env_path = Path(".") / ".env"
-    load_dotenv(dotenv_path=env_path)
+from src.twitter_mentions_input import TwitterMentionsInput
+from src.twitter_mentions_input import TwitterMentionsInputConfig
 
 
 async def main(agent_name: str):
-    agent_config = _load_agent_config(agent_name)
+    agent_config = load_agent_config(agent_name)
+    # Full prompts go to their own rotated file, only if enabled in the settings
+    prompt_log.configure(PromptLogConfig.from_settings(agent_config.settings))
 
-    galadriel_client = LlmClient()
-    database_client = DatabaseClient()
+    # One connection pool for all the connectors, keeps connections alive between posts
+    # CASSETTE_MODE records the external calls, or replays them without network
+    connection_pool = ConnectionPool(
+        ConnectionPoolConfig.from_settings(agent_config.settings), Cassette.from_env()
+    )
+    galadriel_client = connection_pool.get_llm_client()
+    database_settings = agent_config.settings.get("database", {})
+    database_client = DatabaseClient(
+        flush_interval_seconds=database_settings.get("flush_interval_seconds", 5),
+        flush_batch_size=database_settings.get("flush_batch_size", 20),
+        is_fsync=database_settings.get("fsync", False),
+        hot_window_size=database_settings.get("hot_window_size", 200),
+    )
+    # Failed events are recorded by the agent and retried by the client
+    dead_letter_store = DeadLetterStore(database_client.data_dir)
+    # Recorded by the agent, the client stops scheduling replies over the budget
+    usage_tracker = LlmUsageTracker(
+        LlmBudgetConfig.from_settings(agent_config.settings),
+        UsageStore(database_client.data_dir),
+        agent_config.name,
+    )
+    # Filled by the inputs, read by the reply agent
+    thread_cache = ThreadCache()
     twitter_client = TwitterClient(
         agent=agent_config,
         database_client=database_client,
+        connection_pool=connection_pool,
+        dead_letter_store=dead_letter_store,
+        thread_cache=thread_cache,
+        usage_tracker=usage_tracker,
     )
 
+    profiler = Profiler(ProfilerConfig.from_settings(agent_config.settings))
+
     # Set up my own agent
     twitter_agent = TwitterAgent(
         agent_config=agent_config,
         llm_client=galadriel_client,
         database_client=database_client,
+        connection_pool=connection_pool,
+        dead_letter_store=dead_letter_store,
+        thread_cache=thread_cache,
+        profiler=profiler,
+        usage_tracker=usage_tracker,
     )
 
+    # Edits to the character file are applied without a restart
+    config_watcher = AgentConfigWatcher(
+        agent_name,
+        agent_config,
+        twitter_agent.update_config,
+        AgentConfigWatcherConfig.from_settings(agent_config.settings),
+    )
+
+    inputs: List[AgentInput] = [twitter_client]
+    mentions_config = TwitterMentionsInputConfig.from_settings(agent_config.settings)
+    if mentions_config.is_mentions_enabled or mentions_config.is_home_timeline_enabled:
+        inputs.append(
+            TwitterMentionsInput(
+                config=mentions_config,
+                twitter_client=twitter_client,
+                timeline_client=connection_pool.get_twitter_tool(TwitterTimelineClient),
+            )
+        )
+
     runtime = AgentRuntime(
-        inputs=[twitter_client],
+        inputs=inputs,
         outputs=[twitter_client],
         agent=twitter_agent,
     )
-    await runtime.run()
-
-
-def _load_agent_config(agent_name: str) -> TwitterAgentConfig:
-    _load_dotenv()
-    agent_path = Path("agent_configurator") / f"{agent_name}.json"
-    with open(agent_path, "r", encoding="utf-8") as f:
-        agent_dict = json.loads(f.read())
-    missing_fields: List[str] = [
-        field
-        for field in TwitterAgentConfig.required_fields()
-        if not agent_dict.get(field)
-    ]
-    if missing_fields:
-        raise KeyError(
-            f"Character file is missing required fields: {', '.join(missing_fields)}"
-        )
-    return TwitterAgentConfig.from_json(agent_dict)
+    # Logs the call sites that block the event loop
+    loop_monitor = LoopMonitor(LoopMonitorConfig.from_settings(agent_config.settings))
+    if loop_monitor.config.is_enabled:
+        loop_monitor.start()
+    if config_watcher.config.is_enabled:
+        config_watcher.start()
+    # docker stop sends SIGTERM, cancel the runtime so pending memories get saved
+    runtime_task = asyncio.create_task(runtime.run())
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, runtime_task.cancel)
+    # kill -USR1 starts a profile of the next executions, a second one stops it
+    loop.add_signal_handler(signal.SIGUSR1, profiler.toggle)
+    try:
+        await runtime_task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        profiler.close()
+        loop_monitor.close()
+        await config_watcher.close()
+        await twitter_client.close()
+        await database_client.close()
+        await connection_pool.close()
 
 
 if __name__ == "__main__":
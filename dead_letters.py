@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import datetime
+from typing import List
+from typing import Optional
+
+from src.repository.dead_letter_store import DeadLetter
+from src.repository.dead_letter_store import DeadLetterStore
+
+
+async def main(
+    command: str,
+    data_dir: str,
+    status: Optional[str],
+    error_class: Optional[str],
+    keys: List[str],
+):
+    store = DeadLetterStore(data_dir)
+    entries = [
+        e
+        for e in await store.get_entries()
+        if (not status or e.status == status)
+        and (not error_class or e.error_class == error_class)
+        and (not keys or e.key in keys)
+    ]
+    if command == "list":
+        for entry in entries:
+            _print_entry(entry)
+        print(f"{len(entries)} dead letters")
+        return
+    # A running agent picks up the replayed events on its next retry check
+    replayed = await store.replay([e.key for e in entries if e.status != "done"])
+    for entry in replayed:
+        _print_entry(entry)
+    print(f"Replayed {len(replayed)} dead letters")
+
+
+def _print_entry(entry: DeadLetter) -> None:
+    updated_at = datetime.datetime.fromtimestamp(entry.updated_at).isoformat()
+    print(
+        f"{entry.key} {entry.status:<7} {entry.error_class:<9} "
+        f"type={entry.message.type} attempts={entry.attempts} updated={updated_at}"
+    )
+    print(f"    {entry.error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Inspect and replay the events the agent failed to handle."
+    )
+    parser.add_argument("command", choices=["list", "replay"])
+    parser.add_argument(
+        "--data_dir",
+        default="data",
+        help="Specify the data directory of the agent.",
+    )
+    parser.add_argument(
+        "--status",
+        default=None,
+        choices=["pending", "done", "failed"],
+        help="Only include dead letters with the status.",
+    )
+    parser.add_argument(
+        "--error_class",
+        default=None,
+        choices=["transient", "permanent"],
+        help="Only include dead letters with the error class.",
+    )
+    parser.add_argument(
+        "--key",
+        action="append",
+        default=[],
+        help="Only include the dead letter with the key, can be given multiple times.",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(args.command, args.data_dir, args.status, args.error_class, args.key)
+    )
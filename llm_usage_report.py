@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+from typing import Dict
+from typing import Optional
+
+from src import utils
+from src.repository.usage_store import TaskUsage
+from src.repository.usage_store import UsageStore
+from src.repository.usage_store import get_day
+
+
+async def main(data_dir: str, days_count: int, agent_name: Optional[str]):
+    store = UsageStore(data_dir)
+    min_day = get_day(utils.get_current_timestamp() - (days_count - 1) * 86400)
+    days = {d: a for d, a in (await store.get_days()).items() if d >= min_day}
+    if not days:
+        print("No LLM usage recorded")
+        return
+
+    # Agent -> task -> usage over all the days
+    totals: Dict[str, Dict[str, TaskUsage]] = {}
+    print("Tokens per day")
+    for day, agents in sorted(days.items()):
+        for agent, tasks in sorted(agents.items()):
+            if agent_name and agent != agent_name:
+                continue
+            for task, usage in tasks.items():
+                totals.setdefault(agent, {}).setdefault(task, TaskUsage()).add(usage)
+            day_tokens = sum(u.total_tokens for u in tasks.values())
+            day_requests = sum(u.requests for u in tasks.values())
+            print(f"  {day} {agent}: {day_tokens} tokens, {day_requests} requests")
+
+    print(f"\nTotals over {len(days)} days")
+    for agent, tasks in sorted(totals.items()):
+        print(f"  {agent}")
+        for task, usage in sorted(tasks.items()):
+            _print_task_usage(task, usage, len(days))
+
+
+def _print_task_usage(task: str, usage: TaskUsage, days_count: int) -> None:
+    requests = max(usage.requests, 1)
+    print(
+        f"    {task:<13} requests={usage.requests} failures={usage.failures} "
+        f"prompt_tokens={usage.prompt_tokens} "
+        f"completion_tokens={usage.completion_tokens} "
+        f"tokens/request={usage.total_tokens // requests} "
+        f"tokens/day={usage.total_tokens // days_count} "
+        f"avg_latency={usage.latency_seconds / requests:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the LLM token usage and latency per agent and task."
+    )
+    parser.add_argument(
+        "--data_dir",
+        default="data",
+        help="Specify the data directory of the agent.",
+    )
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=7,
+        help="Number of days to include, up to today.",
+    )
+    parser.add_argument(
+        "--agent",
+        default=None,
+        help="Only include the agent with the name.",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.data_dir, args.days, args.agent))
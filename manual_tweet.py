@@ -2,23 +2,19 @@ import argparse
 import asyncio
 import json
 import os
-from pathlib import Path
-from typing import List
 from typing import Optional
 
-from dotenv import load_dotenv
-
 from galadriel.agent import AgentInput
 from galadriel.agent import AgentOutput
 from galadriel.agent import AgentRuntime
-from galadriel.connectors.llm import LlmClient
-from galadriel.connectors.perplexity import PerplexityClient
 from galadriel.entities import Message
 from galadriel.entities import PushOnlyQueue
 from galadriel.tools.twitter import TwitterGetPostTool
 from galadriel.tools.twitter import TwitterSearchTool
 from src.agent.twitter_post_agent import TwitterPostAgent
-from src.models import TwitterAgentConfig
+from src.agent_config_loader import load_agent_config
+from src.connectors.connection_pool import ConnectionPool
+from src.connectors.connection_pool import ConnectionPoolConfig
 from src.models import TwitterPost
 from src.repository.database import DatabaseClient
 from src.twitter_client import TwitterClient
@@ -29,16 +25,21 @@ async def main(
     tweet_id: Optional[str],
     context_file: Optional[str],
 ):
-    agent_config = _load_agent_config(agent_name)
-    llm_client = LlmClient()
+    agent_config = load_agent_config(agent_name)
+    connection_pool = ConnectionPool(
+        ConnectionPoolConfig.from_settings(agent_config.settings)
+    )
+    llm_client = connection_pool.get_llm_client()
     database_client = DatabaseClient()
     post_agent = TwitterPostAgent(
         agent_config=agent_config,
         llm_client=llm_client,
         database_client=database_client,
-        perplexity_client=PerplexityClient(os.getenv("PERPLEXITY_API_KEY", "")),
-        twitter_search_tool=TwitterSearchTool(),
-        twitter_get_post_tool=TwitterGetPostTool(),
+        perplexity_client=connection_pool.get_perplexity_client(
+            os.getenv("PERPLEXITY_API_KEY", "")
+        ),
+        twitter_search_tool=connection_pool.get_twitter_tool(TwitterSearchTool),
+        twitter_get_post_tool=connection_pool.get_twitter_tool(TwitterGetPostTool),
     )
 
     input_client = TestingTwitterClient(
@@ -68,18 +69,22 @@ async def main(
 
     if should_post == "n":
         print("Skipping posting tweet")
+        await database_client.close()
+        await connection_pool.close()
         return
     print("Posting tweet!")
 
     twitter_client = TwitterClient(
         agent=agent_config,
         database_client=database_client,
+        connection_pool=connection_pool,
     )
     await twitter_client.send(
         Message(content=""),
         output_client.result,
-        "",
     )
+    await database_client.close()
+    await connection_pool.close()
 
 
 class TestingTwitterClient(AgentInput):
@@ -134,28 +139,6 @@ class OutputClient(AgentOutput):
         self.result = response
 
 
-def _load_dotenv():
-    env_path = Path(".") / ".env"
-    load_dotenv(dotenv_path=env_path)
-
-
-def _load_agent_config(agent_name: str) -> TwitterAgentConfig:
-    _load_dotenv()
-    agent_path = Path("agent_configurator") / f"{agent_name}.json"
-    with open(agent_path, "r", encoding="utf-8") as f:
-        agent_dict = json.loads(f.read())
-    missing_fields: List[str] = [
-        field
-        for field in TwitterAgentConfig.required_fields()
-        if not agent_dict.get(field)
-    ]
-    if missing_fields:
-        raise KeyError(
-            f"Character file is missing required fields: {', '.join(missing_fields)}"
-        )
-    return TwitterAgentConfig.from_json(agent_dict)
-
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Generate a tweet manually with a tweet to quote."
@@ -1,25 +1,53 @@
 import os
 from typing import Literal
 from typing import Optional
+from typing import TYPE_CHECKING
 
 from galadriel import Agent
 from galadriel.connectors.llm import LlmClient
-from galadriel.connectors.perplexity import PerplexityClient
 from galadriel.entities import Message
 from galadriel.logging_utils import get_agent_logger
 from galadriel.tools.twitter import TwitterGetPostTool
 from galadriel.tools.twitter import TwitterSearchTool
-from src.agent.twitter_post_agent import TwitterPostAgent
 from src.agent.twitter_reply_agent import TwitterReplyAgent
+from src.connectors.connection_pool import ConnectionPool
+from src.connectors.connection_pool import ConnectionPoolConfig
+from src.connectors.llm_usage import LlmBudgetConfig
+from src.connectors.llm_usage import LlmUsageTracker
+from src.connectors.model_router import ModelRouter
+from src.connectors.model_router import get_routes
+from src.connectors.resilience import Resilience
+from src.connectors.resilience import ResilienceConfig
 from src.models import TwitterAgentConfig
+from src.profiler import Profiler
+from src.replies.reply_prefilter import ReplyPrefilterConfig
+from src.replies.thread_cache import ThreadCache
 from src.repository.database import DatabaseClient
+from src.repository.dead_letter_store import DeadLetterStore
+from src.repository.usage_store import UsageStore
+
+if TYPE_CHECKING:
+    from src.agent.twitter_post_agent import TwitterPostAgent
 
 logger = get_agent_logger()
 
+# Settings applied by a reload, the others are read once at startup
+RELOADED_SETTINGS = [
+    "model",
+    "model_routes",
+    "llm_budget",
+    "reply_prefilter",
+    "speculative_replies",
+]
+
 
 class TwitterAgent(Agent):
+    agent_config: TwitterAgentConfig
+    model_router: ModelRouter
     reply_agent: Optional[TwitterReplyAgent]
-    post_agent: Optional[TwitterPostAgent]
+    post_agent: Optional["TwitterPostAgent"]
+    dead_letter_store: DeadLetterStore
+    profiler: Profiler
 
     def __init__(
         self,
@@ -27,40 +55,130 @@ class TwitterAgent(Agent):
         llm_client: LlmClient,
         database_client: DatabaseClient,
         original_tweet_type: Optional[Literal["perplexity", "search"]] = None,
+        connection_pool: Optional[ConnectionPool] = None,
+        dead_letter_store: Optional[DeadLetterStore] = None,
+        thread_cache: Optional[ThreadCache] = None,
+        profiler: Optional[Profiler] = None,
+        usage_tracker: Optional[LlmUsageTracker] = None,
     ):
+        self.agent_config = agent_config
+        self.profiler = profiler or Profiler()
+        self.dead_letter_store = dead_letter_store or DeadLetterStore(
+            database_client.data_dir
+        )
+        if not connection_pool:
+            connection_pool = ConnectionPool(
+                ConnectionPoolConfig.from_settings(agent_config.settings)
+            )
+        # Shared, so a failing provider is avoided by both agents
+        resilience = Resilience(ResilienceConfig.from_settings(agent_config.settings))
+        if not usage_tracker:
+            usage_tracker = LlmUsageTracker(
+                LlmBudgetConfig.from_settings(agent_config.settings),
+                UsageStore(database_client.data_dir),
+                agent_config.name,
+            )
+        model_router = ModelRouter(
+            llm_client, agent_config.settings, resilience, usage_tracker
+        )
+        self.model_router = model_router
         self.reply_agent = TwitterReplyAgent(
             agent_config=agent_config,
             llm_client=llm_client,
             database_client=database_client,
+            model_router=model_router,
+            thread_cache=thread_cache,
         )
         perplexity_api_key = os.getenv("PERPLEXITY_API_KEY")
         if perplexity_api_key:
+            # Imported here, Perplexity (and aiohttp) is only loaded when enabled
+            from src.agent.twitter_post_agent import (  # pylint:disable=C0415
+                TwitterPostAgent,
+            )
+
             self.post_agent = TwitterPostAgent(
                 agent_config=agent_config,
                 llm_client=llm_client,
                 database_client=database_client,
-                perplexity_client=PerplexityClient(perplexity_api_key),
-                twitter_search_tool=TwitterSearchTool(),
-                twitter_get_post_tool=TwitterGetPostTool(),
+                perplexity_client=connection_pool.get_perplexity_client(
+                    perplexity_api_key
+                ),
+                twitter_search_tool=connection_pool.get_twitter_tool(TwitterSearchTool),
+                twitter_get_post_tool=connection_pool.get_twitter_tool(
+                    TwitterGetPostTool
+                ),
                 tweet_type=original_tweet_type,
+                model_router=model_router,
+                resilience=resilience,
             )
         else:
+            self.post_agent = None
             logger.warning(
                 "Missing PERPLEXITY_API_KEY in .env, skipping TwitterPostAgent initialization"
             )
 
+    def update_config(self, agent_config: TwitterAgentConfig) -> None:
+        """
+        Swaps in a reloaded character config. Everything derived from it is built
+        before the swap, so an invalid config leaves the running one in place.
+        Requests in flight finish with the prompts and routes they already read.
+        """
+        previous_settings = self.agent_config.settings
+        routes = None
+        budget_config = None
+        prefilter_config = None
+        if agent_config.settings != previous_settings:
+            routes = get_routes(agent_config.settings)
+            budget_config = LlmBudgetConfig.from_settings(agent_config.settings)
+            prefilter_config = ReplyPrefilterConfig.from_settings(agent_config.settings)
+            restart_settings = [
+                key
+                for key in set(previous_settings) | set(agent_config.settings)
+                if key not in RELOADED_SETTINGS
+                and previous_settings.get(key) != agent_config.settings.get(key)
+            ]
+            if restart_settings:
+                # Includes all the post agent settings, it only reloads the persona
+                logger.warning(
+                    "Changed settings need a restart to apply, only %s are reloaded: %s",
+                    ", ".join(RELOADED_SETTINGS),
+                    ", ".join(sorted(restart_settings)),
+                )
+
+        # No awaits from here on, the event loop sees the old or the new config
+        if routes:
+            self.model_router.routes = routes
+        if budget_config and self.model_router.usage_tracker:
+            self.model_router.usage_tracker.config = budget_config
+        if self.reply_agent:
+            self.reply_agent.update_config(agent_config, prefilter_config)
+        if self.post_agent:
+            self.post_agent.update_config(agent_config)
+        self.agent_config = agent_config
+
     async def execute(self, request: Message) -> Message:
         try:
-            request_type = request.type
-            if request_type:
-                if request_type and request_type == "tweet_reply" and self.reply_agent:
-                    return await self.reply_agent.execute(request)
-                if (
-                    request_type
-                    and request_type == "tweet_original"
-                    and self.post_agent
-                ):
-                    return await self.post_agent.execute(request)
+            response = await self._execute(request)
         except Exception as e:
             logger.error("Error in twitter_agent", exc_info=True)
+            # Kept for a retry instead of waiting for the next sweep to find it again
+            await self.dead_letter_store.add(request, e)
+            return Message(content="")
+        finally:
+            # Ends the profile after the requested executions, no-op if not profiling
+            self.profiler.record_execution()
+        await self.dead_letter_store.mark_done(request)
+        return response
+
+    async def _execute(self, request: Message) -> Message:
+        request_type = request.type
+        if request_type:
+            if request_type and request_type == "tweet_reply" and self.reply_agent:
+                return await self.reply_agent.execute(request)
+            if (
+                request_type
+                and request_type in ["tweet_original", "tweet_draft"]
+                and self.post_agent
+            ):
+                return await self.post_agent.execute(request)
         return Message(content="")
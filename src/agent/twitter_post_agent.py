@@ -9,17 +9,26 @@ from typing import Optional
 from galadriel import Agent
 from galadriel.connectors.llm import LlmClient
 from galadriel.connectors.perplexity import PerplexityClient
+from galadriel.connectors.perplexity import PerplexitySources
 from galadriel.connectors.twitter import SearchResult
 from galadriel.domain.prompts import format_prompt
 from galadriel.entities import Message
 from galadriel.logging_utils import get_agent_logger
 from galadriel.tools.twitter import TwitterGetPostTool
 from galadriel.tools.twitter import TwitterSearchTool
+from src.connectors.model_router import ModelRouter
+from src.connectors.resilience import CircuitOpenError
+from src.connectors.resilience import NoResultError
+from src.connectors.resilience import Resilience
+from src.connectors.resilience import ResilienceConfig
 from src.models import TwitterAgentConfig
 from src.models import TwitterPost
 from src.prompts import get_default_prompt_state_use_case
 from src.prompts import get_search_query
+from src.quotes import rank_quote_candidates
+from src.quotes.quote_candidate_pool import QuoteCandidatePool
 from src.repository.database import DatabaseClient
+from src.repository.quote_candidate_repository import QuoteCandidateRepository
 from src.responses import format_response
 
 logger = get_agent_logger()
@@ -62,20 +71,23 @@ Thread of Tweets You Are Replying To:
 """
 
 TWEET_RETRY_COUNT = 3
-# How many tweets between last quote from the same user
-QUOTED_USER_REOCCURRENCE_LIMIT = 3
+# How long search results are reused for quotes, before searching again
+DEFAULT_QUOTE_CANDIDATE_POOL_TTL_MINUTES = 6 * 60
 
 
 class TwitterPostAgent(Agent):
     agent: TwitterAgentConfig
 
     database_client: DatabaseClient
-    llm_client: LlmClient
+    model_router: ModelRouter
 
     twitter_search_tool: TwitterSearchTool
     twitter_get_post_tool: TwitterGetPostTool
 
     perplexity_client: PerplexityClient
+    resilience: Resilience
+
+    quote_candidate_pool: QuoteCandidatePool
 
     post_interval_minutes_min: int
     post_interval_minutes_max: int
@@ -91,10 +103,17 @@ class TwitterPostAgent(Agent):
         twitter_search_tool: TwitterSearchTool,
         twitter_get_post_tool: TwitterGetPostTool,
         tweet_type: Optional[Literal["perplexity", "search"]] = None,
+        model_router: Optional[ModelRouter] = None,
+        resilience: Optional[Resilience] = None,
     ):
         self.agent = agent_config
 
-        self.llm_client = llm_client
+        self.resilience = resilience or Resilience(
+            ResilienceConfig.from_settings(self.agent.settings)
+        )
+        self.model_router = model_router or ModelRouter(
+            llm_client, self.agent.settings, self.resilience
+        )
         self.database_client = database_client
 
         self.perplexity_client = perplexity_client
@@ -102,17 +121,42 @@ class TwitterPostAgent(Agent):
         self.twitter_search_tool = twitter_search_tool
         self.twitter_get_post_tool = twitter_get_post_tool
 
+        self.quote_candidate_pool = QuoteCandidatePool(
+            repository=QuoteCandidateRepository(database_client.data_dir),
+            ttl_seconds=int(
+                self.agent.settings.get(
+                    "quote_candidate_pool_ttl_minutes",
+                    DEFAULT_QUOTE_CANDIDATE_POOL_TTL_MINUTES,
+                )
+                * 60
+            ),
+        )
+
         self.tweet_type = tweet_type
 
+    def update_config(self, agent_config: TwitterAgentConfig) -> None:
+        """
+        Swaps in a reloaded character config, the persona and search queries
+        are read from it for every post. The settings read in __init__, eg
+        resilience and quote_candidate_pool_ttl_minutes, need a restart.
+        """
+        self.agent = agent_config
+
     async def execute(self, request: Message) -> Message:
         request_type = request.type
         if request_type and request_type == "tweet_original":
             response = await self._generate_original_tweet(request)
             if response:
                 return response
-            raise Exception("Error running agent")
+            raise NoResultError("Error running agent")
+        if request_type and request_type == "tweet_draft":
+            # Generated ahead of the posting time, posted later by the TwitterClient
+            response = await self._generate_original_tweet(request)
+            if response.type == "tweet":
+                response.type = "tweet_draft"
+            return response
         logger.debug(
-            f"TwitterClient got unexpected request_type: {request_type}, skipping"
+            "TwitterClient got unexpected request_type: %s, skipping", request_type
         )
 
     async def _generate_original_tweet(self, request: Message) -> Message:
@@ -122,7 +166,7 @@ class TwitterPostAgent(Agent):
             else:
                 response = await self._generate_quote(None)
             if not response:
-                raise Exception("Error generating tweet")
+                raise NoResultError("Error generating tweet")
             return response
 
         quote_tweet_id = (request.additional_kwargs or {}).get("quote_tweet_id")
@@ -142,7 +186,7 @@ class TwitterPostAgent(Agent):
             response = await self._generate_perplexity_tweet_with_retries(tweet_context)
         if response:
             return response
-        raise Exception("Error running agent")
+        raise NoResultError("Error running agent")
 
     async def _generate_perplexity_tweet_with_retries(
         self, tweet_context: Optional[str]
@@ -151,11 +195,20 @@ class TwitterPostAgent(Agent):
             response = await self._post_perplexity_tweet(tweet_context)
             if response:
                 return response
+            if (
+                not tweet_context
+                and not self.resilience.get_policy("perplexity").breaker.is_available()
+            ):
+                logger.info("Perplexity circuit breaker is open, not retrying")
+                return None
             if i < TWEET_RETRY_COUNT:
                 logger.info(
-                    f"Failed to post tweet, retrying, attempts made: {i + 1}/{TWEET_RETRY_COUNT}"
+                    "Failed to post tweet, retrying, attempts made: %d/%d",
+                    i + 1,
+                    TWEET_RETRY_COUNT,
                 )
                 await asyncio.sleep(i * 5)
+        return None
 
     async def _post_perplexity_tweet(
         self, tweet_context: Optional[str]
@@ -164,14 +217,13 @@ class TwitterPostAgent(Agent):
         prompt_state = await self._get_post_prompt_state(tweet_context)
 
         prompt = format_prompt.execute(PROMPT_TEMPLATE, prompt_state)
-        logger.debug(f"Got full formatted prompt: \n{prompt}")
 
         messages = [
             {"role": "system", "content": self.agent.system},
             {"role": "user", "content": prompt},
         ]
-        response = await self.llm_client.completion(
-            self.agent.settings.get("model", "gpt-4o"), messages  # type: ignore
+        response = await self.model_router.completion(
+            "original_post", messages  # type: ignore
         )
         if not response:
             logger.error("No API response from Galadriel")
@@ -210,35 +262,51 @@ class TwitterPostAgent(Agent):
                 ).to_dict(),
             )
         else:
-            logger.error(
-                f"Unexpected API response from Galadriel: \n{response.to_json()}"
-            )
+            logger.error("Unexpected API response from Galadriel: \n%s", response)
         return None
 
     async def _generate_quote(self, quote_tweet_id: Optional[str]) -> Optional[Message]:
-        filtered_tweets = []
+        tweet_to_quote: Optional[SearchResult] = None
         if quote_tweet_id:
-            logger.info(f"Generating quote for tweet id: {quote_tweet_id}")
+            logger.info(
+                "Generating quote for tweet id: %s",
+                quote_tweet_id,
+                extra={"tweet_id": quote_tweet_id},
+            )
             result = self.twitter_get_post_tool(quote_tweet_id)
             if result:
-                filtered_tweets = [SearchResult.from_dict(json.loads(result))]
+                tweet_to_quote = SearchResult.from_dict(json.loads(result))
         else:
-            logger.info(f"Generating quote by searching for tweets.")
-            results = self.twitter_search_tool(
-                self.agent.extra_fields["twitter_profile"].get("search_query", "")
-            )
-            if not results:
-                logger.info("Failed to get twitter search results")
-                return None
-            formatted_results: List[SearchResult] = [
-                SearchResult.from_dict(r) for r in json.loads(results)
-            ]
-            filtered_tweets = await self._filter_quote_candidates(formatted_results)
-        if not filtered_tweets:
+            tweet_to_quote = await self._get_quote_candidate()
+        if not tweet_to_quote:
             logger.info("No relevant tweets found, skipping")
             return None
 
-        return await self._generate_quote_for_tweet(filtered_tweets[0])
+        return await self._generate_quote_for_tweet(tweet_to_quote)
+
+    async def _get_quote_candidate(self) -> Optional[SearchResult]:
+        search_query = self.agent.extra_fields["twitter_profile"].get(
+            "search_query", ""
+        )
+        exclusions = rank_quote_candidates.get_exclusions(
+            await self.database_client.get_history_summary()
+        )
+        if candidate := await self.quote_candidate_pool.pop(search_query, exclusions):
+            logger.info("Generating quote from previously searched tweets.")
+            return candidate
+
+        logger.info("Generating quote by searching for tweets.")
+        results = self.twitter_search_tool(search_query)
+        if not results:
+            logger.info("Failed to get twitter search results")
+            return None
+        formatted_results: List[SearchResult] = [
+            SearchResult.from_dict(r) for r in json.loads(results)
+        ]
+        await self.quote_candidate_pool.refill(
+            search_query, self._filter_quote_candidates(formatted_results, exclusions)
+        )
+        return await self.quote_candidate_pool.pop(search_query, exclusions)
 
     async def _generate_quote_for_tweet(
         self, tweet_to_quote: SearchResult
@@ -249,15 +317,12 @@ class TwitterPostAgent(Agent):
 
         prompt_state = await self._get_quote_prompt_state(tweet_to_quote.text)
         prompt = format_prompt.execute(PROMPT_QUOTE_TEMPLATE, prompt_state)
-        logger.debug(f"Got full formatted quote prompt: \n{prompt}")
 
         messages = [
             {"role": "system", "content": self.agent.system},
             {"role": "user", "content": prompt},
         ]
-        response = await self.llm_client.completion(
-            self.agent.settings.get("model", "gpt-4o"), messages  # type: ignore
-        )
+        response = await self.model_router.completion("quote", messages)  # type: ignore
         if not response:
             logger.error("No API response from Galadriel")
             return None
@@ -299,9 +364,7 @@ class TwitterPostAgent(Agent):
                 ).to_dict(),
             )
         else:
-            logger.error(
-                f"Unexpected API response from Galadriel: \n{response.to_json()}"
-            )
+            logger.error("Unexpected API response from Galadriel: \n%s", response)
         return None
 
     async def _get_post_prompt_state(self, tweet_context: Optional[str]) -> Dict:
@@ -319,9 +382,7 @@ class TwitterPostAgent(Agent):
                 self.agent, self.database_client
             )
             data["search_topic"] = search_query.topic
-            perplexity_result = await self.perplexity_client.search_topic(
-                search_query.query
-            )
+            perplexity_result = await self._search_perplexity(search_query.query)
             if perplexity_result:
                 data["perplexity_content"] = perplexity_result.content
                 data["perplexity_sources"] = (
@@ -335,6 +396,17 @@ class TwitterPostAgent(Agent):
 
         return data
 
+    async def _search_perplexity(self, query: str) -> Optional[PerplexitySources]:
+        try:
+            return await self.resilience.get_policy("perplexity").call(
+                lambda: self.perplexity_client.search_topic(query)
+            )
+        except CircuitOpenError:
+            logger.info("Perplexity circuit breaker is open, skipping search")
+        except asyncio.TimeoutError:
+            logger.error("Perplexity search timed out")
+        return None
+
     async def _get_quote_prompt_state(self, quote: str) -> Dict:
         data = await get_default_prompt_state_use_case.execute(
             self.agent,
@@ -343,32 +415,9 @@ class TwitterPostAgent(Agent):
         data["quote"] = quote
         return data
 
-    async def _filter_quote_candidates(
-        self, results: List[SearchResult]
+    def _filter_quote_candidates(
+        self,
+        results: List[SearchResult],
+        exclusions: rank_quote_candidates.QuoteExclusions,
     ) -> List[SearchResult]:
-        filtered_tweets = [
-            tweet
-            for tweet in results
-            if ("https:" not in tweet.text and tweet.attachments is None)
-        ]
-        existing_tweets = await self.database_client.get_tweets()
-        existing_quoted_ids = [
-            t.quoted_tweet_id for t in existing_tweets if t.quoted_tweet_id
-        ]
-        filtered_tweets = [
-            tweet for tweet in filtered_tweets if tweet.id not in existing_quoted_ids
-        ]
-
-        recently_quoted_users: List[str] = []
-        for tweet in reversed(existing_tweets):
-            if username := tweet.quoted_tweet_username:
-                recently_quoted_users.append(username)
-            if len(recently_quoted_users) >= QUOTED_USER_REOCCURRENCE_LIMIT:
-                break
-        filtered_tweets = [
-            tweet
-            for tweet in filtered_tweets
-            if tweet.username not in recently_quoted_users
-        ]
-
-        return filtered_tweets
+        return rank_quote_candidates.execute(self.agent, results, exclusions)
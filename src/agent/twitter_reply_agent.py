@@ -1,3 +1,4 @@
+import asyncio
 from typing import Dict
 from typing import Optional
 
@@ -7,14 +8,26 @@ from galadriel.connectors.twitter import SearchResult
 from galadriel.domain.prompts import format_prompt
 from galadriel.entities import Message
 from galadriel.logging_utils import get_agent_logger
+from openai.types.chat import ChatCompletion
+from src import metrics
+from src.connectors.model_router import ModelRouter
+from src.connectors.model_router import estimate_tokens
+from src.connectors.resilience import NoResultError
 from src.models import TwitterAgentConfig
 from src.models import TwitterPost
 from src.prompts import get_default_prompt_state_use_case
+from src.replies.reply_prefilter import ReplyPrefilter
+from src.replies.reply_prefilter import ReplyPrefilterConfig
+from src.replies.thread_cache import ThreadCache
+from src.replies.thread_cache import format_thread
 from src.repository.database import DatabaseClient
 from src.responses import format_response
 
 logger = get_agent_logger()
 
+# Sources of tweet_reply events that can be in any conversation
+EXTERNAL_SOURCES = ["mentions", "home_timeline"]
+
 PROMPT_SHOULD_REPLY_TEMPLATE = """# INSTRUCTIONS: Determine if {{agent_name}} (@{{twitter_user_name}}) should respond to the message and participate in the conversation. Do not comment. Just respond with "true" or "false".
 
 Response options are RESPOND, IGNORE and STOP.
@@ -79,40 +92,92 @@ class TwitterReplyAgent(Agent):
     agent: TwitterAgentConfig
 
     database_client: DatabaseClient
-    llm_client: LlmClient
+    model_router: ModelRouter
+
+    reply_prefilter: ReplyPrefilter
+    thread_cache: ThreadCache
+
+    # Generate the reply in parallel with the should reply call
+    is_speculative_replies: bool
 
     def __init__(
         self,
         agent_config: TwitterAgentConfig,
         llm_client: LlmClient,
         database_client: DatabaseClient,
+        model_router: Optional[ModelRouter] = None,
+        thread_cache: Optional[ThreadCache] = None,
     ):
         self.agent = agent_config
 
-        self.llm_client = llm_client
+        self.model_router = model_router or ModelRouter(llm_client, self.agent.settings)
         self.database_client = database_client
+        self.thread_cache = thread_cache or ThreadCache()
+
+        self.reply_prefilter = ReplyPrefilter(
+            ReplyPrefilterConfig.from_settings(self.agent.settings)
+        )
+        self.is_speculative_replies = self.agent.settings.get(
+            "speculative_replies", False
+        )
+
+    def update_config(
+        self,
+        agent_config: TwitterAgentConfig,
+        prefilter_config: Optional[ReplyPrefilterConfig] = None,
+    ) -> None:
+        """
+        Swaps in a reloaded character config, prefilter_config is built by the
+        caller if the settings changed. The prefilter keeps its history.
+        """
+        if prefilter_config:
+            self.reply_prefilter.config = prefilter_config
+        self.is_speculative_replies = bool(
+            agent_config.settings.get("speculative_replies", False)
+        )
+        self.agent = agent_config
 
     async def execute(self, request: Message) -> Message:
         request_type = request.type
         if request_type and request_type == "tweet_reply":
             conversation_id = request.conversation_id
             reply = SearchResult.from_dict(request.additional_kwargs)
-            response = await self._handle_reply(conversation_id, reply)
+            # Mentions and timeline tweets are not in the agent's own conversations
+            is_own_conversation = (
+                request.additional_kwargs.get("source") not in EXTERNAL_SOURCES
+            )
+            response = await self._handle_reply(
+                conversation_id, reply, is_own_conversation
+            )
             if response:
                 return response
-            raise Exception("Error running agent")
+            # Skipped on purpose, only errors are raised so the event is retried
+            return Message(content="")
         elif request_type == "tweet_original":
             pass
         logger.debug(
-            f"TwitterClient got unexpected request_type: {request_type}, skipping"
+            "TwitterClient got unexpected request_type: %s, skipping", request_type
         )
 
     async def _handle_reply(
-        self, reply_to_id: str, reply: SearchResult
+        self,
+        reply_to_id: str,
+        reply: SearchResult,
+        is_own_conversation: bool = True,
     ) -> Optional[Message]:
         tweets = await self.database_client.get_tweets()
         filtered_tweets = [t for t in tweets if t.id == reply_to_id]
-        if not len(filtered_tweets):
+        if is_own_conversation and not len(filtered_tweets):
+            return None
+        if await self.database_client.is_replied_to(reply.id):
+            logger.info(
+                "Reply %s was already answered, skipping",
+                reply.id,
+                extra={"tweet_id": reply.id},
+            )
+            return None
+        thread = self.thread_cache.get_thread(reply_to_id, reply.id)
+        if self.reply_prefilter.execute(reply_to_id, reply, tweets, len(thread)):
             return None
 
         prompt_state = await get_default_prompt_state_use_case.execute(
@@ -124,21 +189,48 @@ class TwitterReplyAgent(Agent):
         ] = f"""ID: ${reply.id}
     From: @{reply.username}
     Text: {reply.text}"""
-        # TODO: "current_post" should be the original post, and "formatted_conversation" should contain the reply(ies)
-        prompt_state["formatted_conversation"] = ""
+        # Built from the cached tweets of the conversation, without API calls
+        prompt_state["formatted_conversation"] = format_thread(thread)
+
+        # Generate the reply while the LLM decides if it should be sent at all
+        speculative_reply = None
+        if self.is_speculative_replies:
+            speculative_reply = asyncio.create_task(
+                self._get_reply_completion(prompt_state)
+            )
+        try:
+            is_respond = await self._should_reply(prompt_state)
+        except BaseException:
+            if speculative_reply:
+                await _discard_speculative_reply(speculative_reply, prompt_state)
+            raise
+        if not is_respond:
+            if speculative_reply:
+                await _discard_speculative_reply(speculative_reply, prompt_state)
+            return None
 
+        if speculative_reply:
+            reply_response = await speculative_reply
+            metrics.increment("speculative_reply.used")
+            _record_speculative_tokens(
+                "speculative_reply.used_tokens", _get_total_tokens(reply_response)
+            )
+        else:
+            reply_response = await self._get_reply_completion(prompt_state)
+        return self._format_reply(reply_response, reply_to_id, reply)
+
+    async def _should_reply(self, prompt_state: Dict) -> bool:
         prompt = format_prompt.execute(PROMPT_SHOULD_REPLY_TEMPLATE, prompt_state)
 
         messages = [
             {"role": "system", "content": self.agent.system},
             {"role": "user", "content": prompt},
         ]
-        response = await self.llm_client.completion(
-            self.agent.settings.get("model", "gpt-4o"), messages  # type: ignore
+        response = await self.model_router.completion(
+            "should_reply", messages  # type: ignore
         )
         if not response:
-            logger.error("No API response from LLM")
-            return None
+            raise NoResultError("No API response from LLM")
         if (
             response.choices
             and response.choices[0].message
@@ -146,35 +238,29 @@ class TwitterReplyAgent(Agent):
         ):
             message = response.choices[0].message.content
             # Is this check good enough?
-            if (
-                "RESPOND".lower() not in message.lower()
-                and "true" not in message.lower()
-            ):
-                return None
-
-            return await self._generate_reply(prompt_state, reply_to_id, reply)
-        else:
-            logger.error(
-                f"Unexpected API response from Galadriel: \n{response.to_json()}"
-            )
-        return None
+            return "RESPOND".lower() in message.lower() or "true" in message.lower()
+        logger.error("Unexpected API response from Galadriel: \n%s", response)
+        return False
 
-    async def _generate_reply(
-        self, prompt_state: Dict, conversation_id: str, reply: SearchResult
-    ) -> Optional[Message]:
+    async def _get_reply_completion(
+        self, prompt_state: Dict
+    ) -> Optional[ChatCompletion]:
         prompt = format_prompt.execute(PROMPT_REPLY_TEMPLATE, prompt_state)
-        logger.debug(f"Got full formatted reply prompt: \n{prompt}")
 
         messages = [
             {"role": "system", "content": self.agent.system},
             {"role": "user", "content": prompt},
         ]
-        reply_response = await self.llm_client.completion(
-            self.agent.settings.get("model", "gpt-4o"), messages
-        )
+        return await self.model_router.completion("reply", messages)  # type: ignore
+
+    def _format_reply(
+        self,
+        reply_response: Optional[ChatCompletion],
+        conversation_id: str,
+        reply: SearchResult,
+    ) -> Optional[Message]:
         if not reply_response:
-            logger.error("No API reply_response from Galadriel")
-            return None
+            raise NoResultError("No API reply_response from Galadriel")
         if (
             reply_response.choices
             and reply_response.choices[0].message
@@ -206,3 +292,44 @@ class TwitterReplyAgent(Agent):
                 ).to_dict(),
             )
         return None
+
+
+async def _discard_speculative_reply(
+    speculative_reply: asyncio.Task, prompt_state: Dict
+) -> None:
+    metrics.increment("speculative_reply.discarded")
+    if not speculative_reply.done():
+        speculative_reply.cancel()
+        # The prompt was most likely already processed, the usage is not known
+        prompt = format_prompt.execute(PROMPT_REPLY_TEMPLATE, prompt_state)
+        wasted_tokens = estimate_tokens([{"role": "user", "content": prompt}])
+    elif speculative_reply.cancelled() or speculative_reply.exception():
+        wasted_tokens = 0
+    else:
+        wasted_tokens = _get_total_tokens(speculative_reply.result())
+    _record_speculative_tokens("speculative_reply.wasted_tokens", wasted_tokens)
+    try:
+        # Shielded, so cancelling the caller does not look like the task was cancelled
+        await asyncio.shield(speculative_reply)
+    except asyncio.CancelledError:
+        # Only the cancellation of the discarded task is expected, not of the caller
+        if not speculative_reply.cancelled():
+            raise
+    except Exception:
+        pass
+
+
+def _record_speculative_tokens(metric_name: str, tokens: int) -> None:
+    metrics.increment(metric_name, tokens)
+    wasted_tokens = metrics.get_counter("speculative_reply.wasted_tokens")
+    total_tokens = wasted_tokens + metrics.get_counter("speculative_reply.used_tokens")
+    if total_tokens:
+        metrics.set_gauge(
+            "speculative_reply.wasted_token_ratio", wasted_tokens / total_tokens
+        )
+
+
+def _get_total_tokens(response: Optional[ChatCompletion]) -> int:
+    if response and response.usage:
+        return response.usage.total_tokens
+    return 0
@@ -0,0 +1,47 @@
+import hashlib
+from pathlib import Path
+from typing import Dict
+from typing import List
+
+from dotenv import load_dotenv
+
+from src.models import TwitterAgentConfig
+from src.repository import file_utils
+
+AGENT_CONFIG_DIR = "agent_configurator"
+
+# Character file hash -> validated config
+_configs: Dict[str, TwitterAgentConfig] = {}
+
+
+def load_agent_config(
+    agent_name: str, config_dir: str = AGENT_CONFIG_DIR
+) -> TwitterAgentConfig:
+    """
+    Loads .env and the character file from agent_configurator/{agent_name}.json.
+    Each version of a file is parsed and validated once, by the hash of its content.
+    """
+    load_dotenv(dotenv_path=Path(".") / ".env")
+    agent_path = Path(config_dir) / f"{agent_name}.json"
+    with open(agent_path, "rb") as f:
+        content = f.read()
+    file_hash = hashlib.sha256(content).hexdigest()
+    agent_config = _configs.get(file_hash)
+    if not agent_config:
+        agent_config = _parse_agent_config(content)
+        _configs[file_hash] = agent_config
+    return agent_config
+
+
+def _parse_agent_config(content: bytes) -> TwitterAgentConfig:
+    agent_dict = file_utils.loads(content)
+    missing_fields: List[str] = [
+        field
+        for field in TwitterAgentConfig.required_fields()
+        if not agent_dict.get(field)
+    ]
+    if missing_fields:
+        raise KeyError(
+            f"Character file is missing required fields: {', '.join(missing_fields)}"
+        )
+    return TwitterAgentConfig.from_json(agent_dict)
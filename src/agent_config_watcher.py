@@ -0,0 +1,115 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Callable
+from typing import Dict
+from typing import Optional
+
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+from src import utils
+from src.agent_config_loader import AGENT_CONFIG_DIR
+from src.agent_config_loader import load_agent_config
+from src.models import TwitterAgentConfig
+
+logger = get_agent_logger()
+
+
+@dataclass
+class AgentConfigWatcherConfig:
+    is_enabled: bool = True
+    check_interval_seconds: float = 5
+
+    @staticmethod
+    def from_settings(settings: Dict) -> "AgentConfigWatcherConfig":
+        return utils.config_from_settings(
+            AgentConfigWatcherConfig, settings, "config_watcher"
+        )
+
+
+class AgentConfigWatcher:
+    """
+    Polls the modification time of the character file and reloads it when it
+    changes. A file that does not parse or misses fields is logged and the
+    running config is kept until the next change.
+    """
+
+    agent_name: str
+    agent_config: TwitterAgentConfig
+    on_reload: Callable[[TwitterAgentConfig], None]
+    config: AgentConfigWatcherConfig
+    config_dir: str
+
+    _modified_at: Optional[int]
+    _task: Optional[asyncio.Task]
+
+    def __init__(
+        self,
+        agent_name: str,
+        agent_config: TwitterAgentConfig,
+        on_reload: Callable[[TwitterAgentConfig], None],
+        config: Optional[AgentConfigWatcherConfig] = None,
+        config_dir: str = AGENT_CONFIG_DIR,
+    ):
+        self.agent_name = agent_name
+        self.agent_config = agent_config
+        self.on_reload = on_reload
+        self.config = config or AgentConfigWatcherConfig()
+        self.config_dir = config_dir
+        self._modified_at = self._get_modified_at()
+        self._task = None
+
+    @property
+    def file_path(self) -> str:
+        return os.path.join(self.config_dir, f"{self.agent_name}.json")
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def check(self) -> bool:
+        """
+        Returns True if a changed character file was reloaded
+        """
+        modified_at = self._get_modified_at()
+        if modified_at is None or modified_at == self._modified_at:
+            return False
+        self._modified_at = modified_at
+        try:
+            agent_config = load_agent_config(self.agent_name, self.config_dir)
+            # Same content, eg the file was only touched
+            if agent_config is self.agent_config:
+                return False
+            self.on_reload(agent_config)
+        except Exception:
+            metrics.increment("config_watcher.failures")
+            logger.error(
+                "Failed to reload %s, keeping the running config",
+                self.file_path,
+                exc_info=True,
+            )
+            return False
+        self.agent_config = agent_config
+        metrics.increment("config_watcher.reloads")
+        logger.info("Reloaded the character config from %s", self.file_path)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.check_interval_seconds)
+            self.check()
+
+    def _get_modified_at(self) -> Optional[int]:
+        try:
+            return os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            return None
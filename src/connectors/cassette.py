@@ -0,0 +1,324 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from collections import deque
+from dataclasses import asdict
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import IO
+from typing import List
+from typing import Literal
+from typing import Optional
+from typing import TYPE_CHECKING
+
+from openai.types.chat.chat_completion import ChatCompletion
+
+from galadriel.connectors.llm import LlmClient
+from galadriel.connectors.twitter import SearchResult
+from galadriel.connectors.twitter import TwitterApiClient
+from galadriel.connectors.twitter import TwitterCredentials
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+from src import utils
+from src.connectors.twitter_timeline_client import TimelinePage
+from src.connectors.twitter_timeline_client import TwitterTimelineClient
+
+if TYPE_CHECKING:
+    from galadriel.connectors.perplexity import PerplexityClient
+
+logger = get_agent_logger()
+
+CassetteMode = Literal["record", "replay"]
+
+DEFAULT_CASSETTE_DIR = os.path.join("data", "cassettes")
+
+# The replayed clients are never connected, but still need credentials to be created
+REPLAY_API_KEY = "replay"
+REPLAY_TWITTER_CREDENTIALS = TwitterCredentials(
+    consumer_api_key=REPLAY_API_KEY,
+    consumer_api_secret=REPLAY_API_KEY,
+    access_token=REPLAY_API_KEY,
+    access_token_secret=REPLAY_API_KEY,
+)
+
+# Recorded errors that are raised again with the same type on replay, so the
+# retries and dead letter classification behave the same as in production
+_REPLAYED_ERRORS: Dict[str, type] = {
+    "TimeoutError": TimeoutError,
+    "APITimeoutError": TimeoutError,
+    "ConnectionError": ConnectionError,
+    "APIConnectionError": ConnectionError,
+    "ClientConnectionError": ConnectionError,
+}
+
+
+class CassetteExhaustedError(Exception):
+    pass
+
+
+class RecordedError(Exception):
+    pass
+
+
+class Cassette:
+    """
+    Records the requests and responses of the external connectors with their
+    timings to a gzipped JSON lines file, or replays a recorded file instead of
+    calling the connectors. Replayed calls take the recorded duration multiplied
+    by time_scale, 0 replays as fast as possible.
+    """
+
+    mode: CassetteMode
+    file_path: str
+    time_scale: float
+
+    _started_at: float
+    _file: Optional[IO[str]]
+    # Target -> recorded calls not replayed yet, in call order
+    _entries: Dict[str, Deque[Dict]]
+
+    def __init__(self, mode: CassetteMode, file_path: str, time_scale: float = 1.0):
+        self.mode = mode
+        self.file_path = file_path
+        self.time_scale = time_scale
+        self._started_at = time.monotonic()
+        self._file = None
+        self._entries = defaultdict(deque)
+        if mode == "replay":
+            for entry in read_entries(file_path):
+                self._entries[entry["target"]].append(entry)
+            logger.info(
+                f"Replaying {sum(len(e) for e in self._entries.values())} "
+                f"recorded calls from {file_path}"
+            )
+        else:
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            self._file = gzip.open(file_path, "at", encoding="utf-8")
+            logger.info(f"Recording external calls to {file_path}")
+
+    @staticmethod
+    def from_env() -> Optional["Cassette"]:
+        """
+        CASSETTE_MODE is "record" or "replay", CASSETTE_PATH defaults to a new
+        file in data/cassettes when recording, CASSETTE_TIME_SCALE defaults to 1
+        """
+        mode = os.getenv("CASSETTE_MODE")
+        if not mode:
+            return None
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown CASSETTE_MODE: {mode}")
+        file_path = os.getenv("CASSETTE_PATH")
+        if not file_path:
+            if mode == "replay":
+                raise ValueError("CASSETTE_PATH is required to replay a cassette")
+            file_path = os.path.join(
+                DEFAULT_CASSETTE_DIR,
+                f"cassette_{utils.get_current_timestamp()}.jsonl.gz",
+            )
+        return Cassette(
+            mode,  # type: ignore
+            file_path,
+            float(os.getenv("CASSETTE_TIME_SCALE", "1")),
+        )
+
+    @property
+    def is_replay(self) -> bool:
+        return self.mode == "replay"
+
+    def wrap_async(
+        self,
+        obj: Any,
+        method_name: str,
+        target: str,
+        serialize: Callable[[Any], Any] = lambda response: response,
+        deserialize: Callable[[Any], Any] = lambda response: response,
+    ) -> None:
+        """
+        Replaces the async method on the instance with the recording or replaying one
+        """
+        method = getattr(obj, method_name)
+
+        async def _wrapped(*args, **kwargs):
+            request = _get_request(args, kwargs)
+            if self.is_replay:
+                entry = self._get_entry(target, request)
+                await asyncio.sleep(entry["duration"] * self.time_scale)
+                return _get_response(entry, deserialize)
+            started_at = time.monotonic()
+            try:
+                response = await method(*args, **kwargs)
+            except Exception as e:
+                self._record(target, request, started_at, error=e)
+                raise
+            self._record(target, request, started_at, response=serialize(response))
+            return response
+
+        setattr(obj, method_name, _wrapped)
+
+    def wrap_sync(
+        self,
+        obj: Any,
+        method_name: str,
+        target: str,
+        serialize: Callable[[Any], Any] = lambda response: response,
+        deserialize: Callable[[Any], Any] = lambda response: response,
+    ) -> None:
+        method = getattr(obj, method_name)
+
+        def _wrapped(*args, **kwargs):
+            request = _get_request(args, kwargs)
+            if self.is_replay:
+                entry = self._get_entry(target, request)
+                # Blocks like the recorded call did
+                time.sleep(entry["duration"] * self.time_scale)
+                return _get_response(entry, deserialize)
+            started_at = time.monotonic()
+            try:
+                response = method(*args, **kwargs)
+            except Exception as e:
+                self._record(target, request, started_at, error=e)
+                raise
+            self._record(target, request, started_at, response=serialize(response))
+            return response
+
+        setattr(obj, method_name, _wrapped)
+
+    def wrap_llm_client(self, llm_client: LlmClient) -> None:
+        # The transport call, made by LlmClient.completion and by the model router
+        self.wrap_async(
+            llm_client.client.chat.completions,
+            "create",
+            "llm",
+            serialize=lambda response: (
+                response.model_dump(mode="json") if response else None
+            ),
+            deserialize=lambda response: (
+                ChatCompletion.model_validate(response) if response else None
+            ),
+        )
+
+    def wrap_perplexity_client(self, perplexity_client: "PerplexityClient") -> None:
+        # Imported here, aiohttp is only needed when the post agent is enabled
+        from galadriel.connectors.perplexity import (  # pylint:disable=C0415
+            PerplexitySources,
+        )
+
+        self.wrap_async(
+            perplexity_client,
+            "search_topic",
+            "perplexity",
+            serialize=lambda response: asdict(response) if response else None,
+            deserialize=lambda response: (
+                PerplexitySources(**response) if response else None
+            ),
+        )
+
+    def wrap_twitter_tool(self, tool: TwitterApiClient) -> None:
+        if isinstance(tool, TwitterTimelineClient):
+            for method_name in ["get_mentions", "get_home_timeline", "get_tweets"]:
+                self.wrap_sync(
+                    tool,
+                    method_name,
+                    f"twitter.{method_name}",
+                    serialize=_serialize_timeline_page,
+                    deserialize=_deserialize_timeline_page,
+                )
+        else:
+            self.wrap_sync(tool, "forward", f"twitter.{getattr(tool, 'name')}")
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+        for target, entries in self._entries.items():
+            if entries:
+                logger.info(f"{len(entries)} recorded {target} calls were not replayed")
+
+    def _get_entry(self, target: str, request: Dict) -> Dict:
+        entries = self._entries[target]
+        if not entries:
+            raise CassetteExhaustedError(f"No recorded {target} calls left")
+        entry = entries.popleft()
+        metrics.increment("cassette.replayed")
+        if entry["request"] != request:
+            # The pipeline changed, the traffic shape is still replayed
+            metrics.increment("cassette.request_mismatches")
+            logger.debug(f"Replayed {target} call has a different request")
+        return entry
+
+    def _record(
+        self,
+        target: str,
+        request: Dict,
+        started_at: float,
+        response: Any = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        if not self._file:
+            return
+        entry = {
+            "target": target,
+            "started_at": round(started_at - self._started_at, 4),
+            "duration": round(time.monotonic() - started_at, 4),
+            "request": request,
+            "response": response,
+            "error": (
+                {"type": type(error).__name__, "message": str(error)} if error else None
+            ),
+        }
+        try:
+            self._file.write(json.dumps(entry, default=str) + "\n")
+            metrics.increment("cassette.recorded")
+        except Exception:
+            logger.error(f"Failed to record {target} call", exc_info=True)
+
+
+def read_entries(file_path: str) -> List[Dict]:
+    """
+    Returns the recorded calls in the order they were made, a cassette cut
+    short by a crash is read up to the last complete entry
+    """
+    entries: List[Dict] = []
+    with gzip.open(file_path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                entries.append(json.loads(line))
+        except (EOFError, json.JSONDecodeError):
+            logger.warning(f"Cassette {file_path} is truncated")
+    return sorted(entries, key=lambda e: e["started_at"])
+
+
+def _get_request(args: tuple, kwargs: Dict) -> Dict:
+    # Round tripped through JSON so it compares equal to the recorded request
+    return json.loads(json.dumps({"args": list(args), "kwargs": kwargs}, default=str))
+
+
+def _get_response(entry: Dict, deserialize: Callable[[Any], Any]) -> Any:
+    error = entry.get("error")
+    if error:
+        error_class = _REPLAYED_ERRORS.get(error["type"])
+        if error_class:
+            raise error_class(error["message"])
+        raise RecordedError(f"{error['type']}: {error['message']}")
+    return deserialize(entry["response"])
+
+
+def _serialize_timeline_page(page: TimelinePage) -> Dict:
+    return {
+        "results": [r.to_dict() for r in page.results],
+        "conversation_ids": page.conversation_ids,
+        "newest_id": page.newest_id,
+    }
+
+
+def _deserialize_timeline_page(page: Dict) -> TimelinePage:
+    return TimelinePage(
+        results=[SearchResult.from_dict(r) for r in page["results"]],
+        conversation_ids=page["conversation_ids"],
+        newest_id=page["newest_id"],
+    )
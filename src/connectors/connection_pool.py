@@ -0,0 +1,244 @@
+import importlib.util
+from dataclasses import dataclass
+from typing import Dict
+from typing import Optional
+from typing import TYPE_CHECKING
+from typing import Type
+from typing import TypeVar
+
+import httpx
+from openai import AsyncOpenAI
+from requests.adapters import HTTPAdapter
+from requests_oauthlib import OAuth1Session
+
+from galadriel.connectors.llm import LlmClient
+from galadriel.connectors.twitter import TwitterApiClient
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+from src import utils
+from src.connectors.cassette import Cassette
+from src.connectors.cassette import REPLAY_API_KEY
+from src.connectors.cassette import REPLAY_TWITTER_CREDENTIALS
+
+if TYPE_CHECKING:
+    import aiohttp
+
+    from src.connectors.pooled_perplexity_client import PooledPerplexityClient
+
+logger = get_agent_logger()
+
+TwitterTool = TypeVar("TwitterTool", bound=TwitterApiClient)
+
+
+@dataclass
+class ConnectionPoolConfig:
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry_seconds: float = 300
+    connect_timeout_seconds: float = 10
+    read_timeout_seconds: float = 60
+    # Only used if the optional "h2" package is installed
+    http2: bool = True
+
+    @staticmethod
+    def from_settings(settings: Dict) -> "ConnectionPoolConfig":
+        return utils.config_from_settings(
+            ConnectionPoolConfig, settings, "connection_pool"
+        )
+
+
+class ConnectionPool:
+    """
+    Keep-alive connections shared by all the external connectors: LLM (httpx),
+    Perplexity (aiohttp) and the Twitter tools (requests). With a cassette the
+    connectors are recorded, or replayed without any connections.
+    """
+
+    config: ConnectionPoolConfig
+    cassette: Optional[Cassette]
+
+    _llm_client: Optional[LlmClient]
+    _httpx_client: Optional[httpx.AsyncClient]
+    _aiohttp_session: Optional["aiohttp.ClientSession"]
+    _twitter_session: Optional[OAuth1Session]
+    _twitter_adapter: Optional[HTTPAdapter]
+
+    def __init__(
+        self,
+        config: Optional[ConnectionPoolConfig] = None,
+        cassette: Optional[Cassette] = None,
+    ):
+        self.config = config or ConnectionPoolConfig()
+        self.cassette = cassette
+        self._llm_client = None
+        self._httpx_client = None
+        self._aiohttp_session = None
+        self._twitter_session = None
+        self._twitter_adapter = None
+
+    def get_llm_client(self) -> LlmClient:
+        if not self._llm_client:
+            llm_client = LlmClient(
+                _api_key=REPLAY_API_KEY if self._is_replay() else None
+            )
+            # Base URL and API key are resolved by LlmClient, only the transport is replaced
+            llm_client.client = AsyncOpenAI(
+                base_url=llm_client.client.base_url,
+                api_key=llm_client.client.api_key,
+                http_client=self._get_httpx_client(),
+            )
+            if self.cassette:
+                self.cassette.wrap_llm_client(llm_client)
+            self._llm_client = llm_client
+        return self._llm_client
+
+    def get_perplexity_client(self, api_key: str) -> "PooledPerplexityClient":
+        # Imported here, Perplexity (and aiohttp) is only needed by the post agent
+        from src.connectors.pooled_perplexity_client import (  # pylint:disable=C0415
+            PooledPerplexityClient,
+        )
+
+        perplexity_client = PooledPerplexityClient(api_key, self)
+        if self.cassette:
+            self.cassette.wrap_perplexity_client(perplexity_client)
+        return perplexity_client
+
+    def get_twitter_tool(self, tool_class: Type[TwitterTool]) -> TwitterTool:
+        if self._is_replay():
+            tool = tool_class(REPLAY_TWITTER_CREDENTIALS)
+        else:
+            tool = tool_class()
+        if not self._twitter_session:
+            self._twitter_session = tool.oauth_session
+            self._twitter_adapter = _TimeoutHTTPAdapter(
+                timeout=(
+                    self.config.connect_timeout_seconds,
+                    self.config.read_timeout_seconds,
+                ),
+                pool_connections=1,
+                pool_maxsize=self.config.max_connections,
+            )
+            self._twitter_session.mount("https://", self._twitter_adapter)
+            self._twitter_session.hooks["response"].append(
+                lambda *_, **__: metrics.increment("http.twitter.requests")
+            )
+        # All the tools use the same credentials, so they can share the OAuth session
+        tool.oauth_session = self._twitter_session
+        if self.cassette:
+            self.cassette.wrap_twitter_tool(tool)
+        return tool
+
+    async def get_aiohttp_session(self) -> "aiohttp.ClientSession":
+        import aiohttp  # pylint:disable=C0415
+
+        # aiohttp sessions have to be created inside a running event loop
+        if not self._aiohttp_session or self._aiohttp_session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(
+                _get_aiohttp_trace("http.perplexity.requests")
+            )
+            trace_config.on_connection_create_end.append(
+                _get_aiohttp_trace("http.perplexity.new_connections")
+            )
+            self._aiohttp_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.config.max_connections,
+                    keepalive_timeout=self.config.keepalive_expiry_seconds,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=self.config.read_timeout_seconds,
+                    connect=self.config.connect_timeout_seconds,
+                ),
+                trace_configs=[trace_config],
+            )
+        return self._aiohttp_session
+
+    def get_metrics(self) -> Dict[str, float]:
+        if self._twitter_adapter:
+            pools = self._twitter_adapter.poolmanager.pools
+            connection_pools = [pools[key] for key in pools.keys()]
+            metrics.set_gauge(
+                "http.twitter.new_connections",
+                sum(p.num_connections for p in connection_pools),
+            )
+            metrics.set_gauge(
+                "http.twitter.idle_connections",
+                sum(p.pool.qsize() for p in connection_pools if p.pool),
+            )
+        if self._aiohttp_session and not self._aiohttp_session.closed:
+            connector = self._aiohttp_session.connector
+            if connector:
+                conns = connector._conns  # pylint:disable=W0212
+                metrics.set_gauge(
+                    "http.perplexity.idle_connections",
+                    sum(len(c) for c in conns.values()),
+                )
+        return metrics.get_snapshot("http.")
+
+    async def close(self) -> None:
+        if self._httpx_client:
+            await self._httpx_client.aclose()
+        if self._aiohttp_session:
+            await self._aiohttp_session.close()
+        if self._twitter_session:
+            self._twitter_session.close()
+        if self.cassette:
+            self.cassette.close()
+
+    def _is_replay(self) -> bool:
+        return bool(self.cassette and self.cassette.is_replay)
+
+    def _get_httpx_client(self) -> httpx.AsyncClient:
+        if not self._httpx_client:
+            is_http2 = self.config.http2 and _is_http2_available()
+            self._httpx_client = httpx.AsyncClient(
+                http2=is_http2,
+                limits=httpx.Limits(
+                    max_connections=self.config.max_connections,
+                    max_keepalive_connections=self.config.max_keepalive_connections,
+                    keepalive_expiry=self.config.keepalive_expiry_seconds,
+                ),
+                timeout=httpx.Timeout(
+                    self.config.read_timeout_seconds,
+                    connect=self.config.connect_timeout_seconds,
+                ),
+                event_hooks={"request": [_on_httpx_request]},
+            )
+            logger.debug(f"Created LLM HTTP client, http2: {is_http2}")
+        return self._httpx_client
+
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    # requests has no session wide timeout, the Twitter tools do not set one either
+
+    def __init__(self, timeout, *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):  # pylint:disable=W0221
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+async def _on_httpx_request(request: httpx.Request) -> None:
+    metrics.increment("http.llm.requests")
+    request.extensions["trace"] = _httpx_trace
+
+
+async def _httpx_trace(event_name: str, _: Dict) -> None:
+    if event_name == "connection.connect_tcp.complete":
+        metrics.increment("http.llm.new_connections")
+    elif event_name == "connection.start_tls.complete":
+        metrics.increment("http.llm.tls_handshakes")
+
+
+def _get_aiohttp_trace(metric_name: str):
+    async def _trace(*_) -> None:
+        metrics.increment(metric_name)
+
+    return _trace
+
+
+def _is_http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
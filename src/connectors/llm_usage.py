@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import List
+from typing import Literal
+from typing import Optional
+
+from openai.types.chat import ChatCompletion
+
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+from src import utils
+from src.repository.usage_store import TaskUsage
+from src.repository.usage_store import UsageStore
+
+logger = get_agent_logger()
+
+BudgetState = Literal["ok", "downgrade", "throttle"]
+
+# Tasks that are downgraded to cheaper models and throttled near the budget,
+# original posts are rare and keep their models
+BUDGETED_TASKS = ["should_reply", "reply"]
+
+
+@dataclass
+class LlmBudgetConfig:
+    # Tokens per day (UTC) for all the tasks of the agent
+    daily_tokens: Optional[int] = None
+    # Tokens per day for single tasks, eg {"reply": 100000}
+    task_daily_tokens: Dict[str, int] = field(default_factory=dict)
+    # Share of a budget after which replies use downgrade_models
+    downgrade_ratio: float = 0.8
+    downgrade_models: List[str] = field(default_factory=list)
+    # Share of a budget after which no new replies are scheduled
+    throttle_ratio: float = 1.0
+
+    @staticmethod
+    def from_settings(settings: Dict) -> "LlmBudgetConfig":
+        """
+        Reads the config from the "llm_budget" key in the character settings
+        """
+        return utils.config_from_settings(LlmBudgetConfig, settings, "llm_budget")
+
+
+class LlmUsageTracker:
+    """
+    Accounts the tokens and latency of the LLM calls per agent and task, and
+    compares today's usage to the daily budgets
+    """
+
+    config: LlmBudgetConfig
+    usage_store: UsageStore
+    agent_name: str
+
+    _state: BudgetState
+
+    def __init__(
+        self,
+        config: LlmBudgetConfig,
+        usage_store: UsageStore,
+        agent_name: str,
+    ):
+        self.config = config
+        self.usage_store = usage_store
+        self.agent_name = agent_name
+        self._state = "ok"
+
+    async def record(
+        self, task: str, response: Optional[ChatCompletion], latency_seconds: float
+    ) -> None:
+        usage = TaskUsage(requests=1, latency_seconds=latency_seconds)
+        if not response:
+            usage.failures = 1
+        elif response.usage:
+            usage.prompt_tokens = response.usage.prompt_tokens
+            usage.completion_tokens = response.usage.completion_tokens
+        await self.usage_store.add(self.agent_name, task, usage)
+
+    async def get_budget_state(self, task: str) -> BudgetState:
+        if task not in BUDGETED_TASKS:
+            return "ok"
+        used_ratio = await self._get_used_ratio(task)
+        metrics.set_gauge("llm.budget.used_ratio", used_ratio)
+        state: BudgetState = "ok"
+        if used_ratio >= self.config.throttle_ratio:
+            state = "throttle"
+        elif used_ratio >= self.config.downgrade_ratio:
+            state = "downgrade"
+        if state != self._state:
+            logger.info(f"LLM budget {used_ratio:.0%} used, replies are now: {state}")
+            self._state = state
+        return state
+
+    async def _get_used_ratio(self, task: str) -> float:
+        usage = await self.usage_store.get_usage(self.agent_name)
+        ratios = [0.0]
+        if self.config.daily_tokens:
+            ratios.append(
+                sum(u.total_tokens for u in usage.values()) / self.config.daily_tokens
+            )
+        task_daily_tokens = self.config.task_daily_tokens.get(task)
+        if task_daily_tokens and task in usage:
+            ratios.append(usage[task].total_tokens / task_daily_tokens)
+        return max(ratios)
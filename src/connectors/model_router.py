@@ -0,0 +1,214 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Literal
+from typing import Optional
+from typing import get_args
+
+from openai.types.chat import ChatCompletion
+from openai.types.chat import ChatCompletionMessageParam
+
+from galadriel.connectors.llm import LlmClient
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+from src import prompt_log
+from src.connectors.llm_usage import LlmUsageTracker
+from src.connectors.resilience import CircuitOpenError
+from src.connectors.resilience import Resilience
+from src.connectors.resilience import ResilienceConfig
+from src.connectors.resilience import ResiliencePolicy
+
+logger = get_agent_logger()
+
+Task = Literal["should_reply", "reply", "original_post", "quote"]
+
+DEFAULT_MODEL = "gpt-4o"
+# Used to estimate the prompt size without a tokenizer
+CHARS_PER_TOKEN_ESTIMATE = 4
+
+
+@dataclass
+class ModelRoute:
+    # Tried in order, the next model is used when one fails or is too slow
+    models: List[str]
+    # Prompts with more estimated tokens go to long_prompt_models instead
+    max_prompt_tokens: Optional[int] = None
+    long_prompt_models: List[str] = field(default_factory=list)
+    # Without it the timeout adapts to the latencies of the model
+    timeout_seconds: Optional[float] = None
+
+    @staticmethod
+    def from_dict(data: Dict, default_model: str) -> "ModelRoute":
+        return ModelRoute(
+            models=data.get("models") or [default_model],
+            max_prompt_tokens=data.get("max_prompt_tokens"),
+            long_prompt_models=data.get("long_prompt_models", []),
+            timeout_seconds=data.get("timeout_seconds"),
+        )
+
+
+class ModelRouter:
+    """
+    Picks the model for each kind of LLM call, configured in the "model_routes"
+    key of the character settings, eg:
+    "model_routes": {"should_reply": {"models": ["gpt-4o-mini", "gpt-4o"], "timeout_seconds": 10}}
+    Tasks without a route use the "model" setting.
+    Every model has its own circuit breaker, models with an open breaker are skipped.
+    Near the daily LLM budget the reply tasks use the budget's downgrade_models.
+    """
+
+    llm_client: LlmClient
+    routes: Dict[str, ModelRoute]
+    resilience: Resilience
+    usage_tracker: Optional[LlmUsageTracker]
+
+    def __init__(
+        self,
+        llm_client: LlmClient,
+        settings: Dict,
+        resilience: Optional[Resilience] = None,
+        usage_tracker: Optional[LlmUsageTracker] = None,
+    ):
+        self.llm_client = llm_client
+        self.usage_tracker = usage_tracker
+        self.resilience = resilience or Resilience(
+            ResilienceConfig.from_settings(settings)
+        )
+        self.routes = get_routes(settings)
+
+    async def completion(
+        self, task: Task, messages: Iterable[ChatCompletionMessageParam]
+    ) -> Optional[ChatCompletion]:
+        messages = list(messages)
+        response = await self._route(task, messages)
+        # Sampled to the prompt log, if it is enabled
+        prompt_log.log_completion(task, messages, response)
+        return response
+
+    async def _route(
+        self, task: Task, messages: List[ChatCompletionMessageParam]
+    ) -> Optional[ChatCompletion]:
+        route = self.routes[task]
+        models = await self._get_downgrade_models(task) or self._get_models(
+            route, messages
+        )
+        if not models:
+            logger.error(f"Circuit breakers of all the models for {task} are open")
+            return None
+        for i, model in enumerate(models):
+            if i:
+                metrics.increment(f"llm.route.{task}.failovers")
+                logger.info(f"Failing over to model {model} for {task}")
+            response = await self._completion(task, model, route, messages)
+            if response:
+                return response
+        # Every model failed once, the LLM client retries the first one with backoff
+        logger.info(f"All models failed for {task}, retrying {models[0]}")
+        start_time = time.monotonic()
+        try:
+            response = await self._get_policy(models[0]).call(
+                lambda: self.llm_client.completion(models[0], messages),
+                route.timeout_seconds,
+            )
+        except (CircuitOpenError, asyncio.TimeoutError):
+            response = None
+        await self._record_usage(task, response, time.monotonic() - start_time)
+        return response
+
+    def _get_models(
+        self, route: ModelRoute, messages: List[ChatCompletionMessageParam]
+    ) -> List[str]:
+        models = route.models
+        if (
+            route.max_prompt_tokens
+            and route.long_prompt_models
+            and estimate_tokens(messages) > route.max_prompt_tokens
+        ):
+            models = route.long_prompt_models
+            metrics.increment("llm.route.long_prompts")
+        return [m for m in models if self._get_policy(m).breaker.is_available()]
+
+    async def _completion(
+        self,
+        task: Task,
+        model: str,
+        route: ModelRoute,
+        messages: List[ChatCompletionMessageParam],
+    ) -> Optional[ChatCompletion]:
+        """
+        Calls the OpenAI client directly instead of LlmClient.completion, which
+        retries with backoff: each model gets one attempt, so failing over to the
+        next model is not delayed. LlmClient.completion is only the last resort.
+        """
+        metric_prefix = f"llm.route.{task}.{model}"
+        metrics.increment(f"{metric_prefix}.requests")
+        start_time = time.monotonic()
+        try:
+            response = await self._get_policy(model).call(
+                lambda: self.llm_client.client.chat.completions.create(
+                    model=model, messages=messages
+                ),
+                route.timeout_seconds,
+            )
+        except asyncio.TimeoutError:
+            metrics.increment(f"{metric_prefix}.timeouts")
+            response = None
+        except CircuitOpenError:
+            response = None
+        except Exception:
+            logger.error(f"Error calling model {model} for {task}", exc_info=True)
+            response = None
+        latency = time.monotonic() - start_time
+        await self._record_usage(task, response, latency)
+        if not response:
+            metrics.increment(f"{metric_prefix}.failures")
+            return None
+        metrics.increment(f"{metric_prefix}.latency_seconds", latency)
+        if response.usage:
+            metrics.increment(f"{metric_prefix}.tokens", response.usage.total_tokens)
+        return response
+
+    async def _get_downgrade_models(self, task: Task) -> List[str]:
+        if not self.usage_tracker or not self.usage_tracker.config.downgrade_models:
+            return []
+        if await self.usage_tracker.get_budget_state(task) == "ok":
+            return []
+        metrics.increment(f"llm.route.{task}.downgrades")
+        return [
+            m
+            for m in self.usage_tracker.config.downgrade_models
+            if self._get_policy(m).breaker.is_available()
+        ]
+
+    async def _record_usage(
+        self, task: Task, response: Optional[ChatCompletion], latency: float
+    ) -> None:
+        if not self.usage_tracker:
+            return
+        try:
+            await self.usage_tracker.record(task, response, latency)
+        except Exception:
+            logger.error("Failed to record LLM usage", exc_info=True)
+
+    def _get_policy(self, model: str) -> ResiliencePolicy:
+        return self.resilience.get_policy(f"llm.{model}")
+
+
+def get_routes(settings: Dict) -> Dict[str, ModelRoute]:
+    default_model = settings.get("model", DEFAULT_MODEL)
+    route_settings = settings.get("model_routes", {})
+    return {
+        task: ModelRoute.from_dict(route_settings.get(task, {}), default_model)
+        for task in get_args(Task)
+    }
+
+
+def estimate_tokens(messages: Iterable[ChatCompletionMessageParam]) -> int:
+    return int(
+        sum(len(str(m.get("content") or "")) for m in messages)
+        / CHARS_PER_TOKEN_ESTIMATE
+    )
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Literal
+from typing import Optional
+from typing import TYPE_CHECKING
+
+import aiohttp
+
+from galadriel.connectors.perplexity import PerplexityClient
+from galadriel.connectors.perplexity import PerplexitySources
+from galadriel.connectors.perplexity import _get_date_reminder
+from galadriel.logging_utils import get_agent_logger
+
+if TYPE_CHECKING:
+    from src.connectors.connection_pool import ConnectionPool
+
+logger = get_agent_logger()
+
+PERPLEXITY_URL = "https://api.perplexity.ai/chat/completions"
+
+
+class PooledPerplexityClient(PerplexityClient):
+    """
+    Same request as PerplexityClient, but sent with the shared aiohttp session
+    and its timeouts, instead of a new session (and TLS connection) per search
+    """
+
+    connection_pool: "ConnectionPool"
+
+    def __init__(self, api_key: str, connection_pool: "ConnectionPool"):
+        super().__init__(api_key)
+        self.connection_pool = connection_pool
+
+    async def search_topic(
+        self,
+        topic: str,
+        relevancy_filter: Literal["month", "week", "day", "hour"] = "hour",
+    ) -> Optional[PerplexitySources]:
+        logger.info("Using perplexity API with search query: %s", topic)
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+        payload = {
+            "model": "sonar-pro",
+            "messages": [
+                {"role": "system", "content": "Be precise and concise."},
+                {"role": "user", "content": topic + _get_date_reminder()},
+            ],
+            "max_tokens": 8192,
+            "temperature": 0.2,
+            "top_p": 0.9,
+            "search_domain_filter": ["perplexity.ai"],
+            "return_images": False,
+            "return_related_questions": False,
+            "search_recency_filter": relevancy_filter,
+            "top_k": 0,
+            "stream": False,
+            "presence_penalty": 0,
+            "frequency_penalty": 1,
+        }
+        session = await self.connection_pool.get_aiohttp_session()
+        try:
+            # The session's ClientTimeout applies, from the connection pool config
+            async with session.post(
+                PERPLEXITY_URL, headers=headers, json=payload
+            ) as response:
+                response.raise_for_status()
+                response_json = await response.json()
+        except asyncio.TimeoutError:
+            logger.error("The Perplexity request timed out.")
+            return None
+        except aiohttp.ClientError as e:
+            logger.error("Perplexity request failed: %s", e)
+            return None
+        sources = "\n".join(
+            f"[{index + 1}] {url}"
+            for index, url in enumerate(response_json.get("citations", []))
+        )
+        return PerplexitySources(
+            content=response_json["choices"][0]["message"]["content"],
+            sources=sources,
+        )
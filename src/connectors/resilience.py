@@ -0,0 +1,264 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import Literal
+from typing import Optional
+from typing import TypeVar
+
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+from src import utils
+
+logger = get_agent_logger()
+
+T = TypeVar("T")
+
+BreakerState = Literal["closed", "open", "half_open"]
+# Breaker states as gauge values
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class NoResultError(Exception):
+    """
+    The LLM or the search gave no usable result, retrying later is likely to work
+    """
+
+
+@dataclass
+class ResilienceConfig:
+    # Consecutive failures that open the breaker
+    failure_threshold: int = 5
+    # How long an open breaker rejects calls, before letting a probe through
+    reset_timeout_seconds: float = 60
+    # Timeout is the latency percentile times the multiplier, within the limits
+    timeout_percentile: float = 99
+    timeout_multiplier: float = 2
+    min_timeout_seconds: float = 5
+    max_timeout_seconds: float = 120
+    # Used until enough latencies are recorded
+    default_timeout_seconds: float = 60
+    min_latency_samples: int = 10
+    latency_window_size: int = 100
+    # A second request is sent if the first one is slower than this percentile
+    is_hedging: bool = False
+    hedge_percentile: float = 95
+
+    @staticmethod
+    def from_settings(settings: Dict) -> "ResilienceConfig":
+        """
+        Reads the config from the "resilience" key in the character settings
+        """
+        return utils.config_from_settings(ResilienceConfig, settings, "resilience")
+
+
+class CircuitBreaker:
+    name: str
+    config: ResilienceConfig
+    state: BreakerState
+
+    _failures_count: int
+    _opened_at: float
+    _is_probe_running: bool
+
+    def __init__(self, name: str, config: ResilienceConfig):
+        self.name = name
+        self.config = config
+        self._failures_count = 0
+        self._opened_at = 0
+        self._is_probe_running = False
+        self._set_state("closed")
+
+    def is_available(self) -> bool:
+        """
+        False if calls would be rejected, does not start a probe
+        """
+        if self.state == "open":
+            return self._is_reset_timeout_passed()
+        return not (self.state == "half_open" and self._is_probe_running)
+
+    def allow_request(self) -> bool:
+        if self.state == "open" and self._is_reset_timeout_passed():
+            self._set_state("half_open")
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._is_probe_running:
+            # Only one request at a time checks if the service has recovered
+            self._is_probe_running = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._failures_count = 0
+        self._is_probe_running = False
+        if self.state != "closed":
+            logger.info(f"Circuit breaker {self.name} closed")
+            self._set_state("closed")
+
+    def record_failure(self) -> None:
+        self._failures_count += 1
+        self._is_probe_running = False
+        if (
+            self.state == "half_open"
+            or self._failures_count >= self.config.failure_threshold
+        ):
+            if self.state != "open":
+                logger.warning(f"Circuit breaker {self.name} opened")
+                metrics.increment(f"resilience.{self.name}.opened")
+            self._opened_at = time.monotonic()
+            self._set_state("open")
+
+    def release_probe(self) -> None:
+        # The probe was cancelled, so the next request can probe again
+        self._is_probe_running = False
+
+    def _is_reset_timeout_passed(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.config.reset_timeout_seconds
+
+    def _set_state(self, state: BreakerState) -> None:
+        self.state = state
+        metrics.set_gauge(f"resilience.{self.name}.state", BREAKER_STATE_VALUES[state])
+
+
+class LatencyTracker:
+    config: ResilienceConfig
+
+    _latencies: Deque[float]
+
+    def __init__(self, config: ResilienceConfig):
+        self.config = config
+        self._latencies = deque(maxlen=config.latency_window_size)
+
+    def add(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def get_percentile(self, percentile: float) -> Optional[float]:
+        if len(self._latencies) < self.config.min_latency_samples:
+            return None
+        latencies = sorted(self._latencies)
+        index = min(int(len(latencies) * percentile / 100), len(latencies) - 1)
+        return latencies[index]
+
+    def get_timeout(self) -> float:
+        latency = self.get_percentile(self.config.timeout_percentile)
+        if latency is None:
+            return self.config.default_timeout_seconds
+        return min(
+            max(
+                latency * self.config.timeout_multiplier,
+                self.config.min_timeout_seconds,
+            ),
+            self.config.max_timeout_seconds,
+        )
+
+
+class ResiliencePolicy:
+    """
+    Circuit breaker, adaptive timeout and optional hedging for one provider
+    """
+
+    name: str
+    config: ResilienceConfig
+    breaker: CircuitBreaker
+    latency_tracker: LatencyTracker
+
+    def __init__(self, name: str, config: ResilienceConfig):
+        self.name = name
+        self.config = config
+        self.breaker = CircuitBreaker(name, config)
+        self.latency_tracker = LatencyTracker(config)
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[Optional[T]]],
+        timeout_seconds: Optional[float] = None,
+    ) -> Optional[T]:
+        """
+        Raises CircuitOpenError without calling if the breaker is open,
+        a None result counts as a failure
+        """
+        if not self.breaker.allow_request():
+            metrics.increment(f"resilience.{self.name}.rejected")
+            raise CircuitOpenError(f"Circuit breaker {self.name} is open")
+        timeout = timeout_seconds or self.latency_tracker.get_timeout()
+        metrics.set_gauge(f"resilience.{self.name}.timeout_seconds", timeout)
+        start_time = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._call_hedged(request), timeout)
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except asyncio.TimeoutError:
+            metrics.increment(f"resilience.{self.name}.timeouts")
+            logger.warning(f"{self.name} did not respond in {timeout:.1f}s")
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            metrics.increment(f"resilience.{self.name}.failures")
+            self.breaker.record_failure()
+            raise
+        if result is None:
+            metrics.increment(f"resilience.{self.name}.failures")
+            self.breaker.record_failure()
+            return None
+        self.latency_tracker.add(time.monotonic() - start_time)
+        self.breaker.record_success()
+        return result
+
+    async def _call_hedged(
+        self, request: Callable[[], Awaitable[Optional[T]]]
+    ) -> Optional[T]:
+        hedge_delay = self.latency_tracker.get_percentile(self.config.hedge_percentile)
+        if not self.config.is_hedging or hedge_delay is None:
+            return await request()
+
+        tasks = [asyncio.ensure_future(request())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                # The first request is in the slow tail, race it with a second one
+                metrics.increment(f"resilience.{self.name}.hedged")
+                tasks.append(asyncio.ensure_future(request()))
+            pending = set(tasks)
+            result = None
+            while pending and result is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if not task.exception() and task.result() is not None:
+                        result = task.result()
+            if result is None:
+                # Both failed, surface the error of the first request
+                return tasks[0].result()
+            return result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+class Resilience:
+    """
+    Policies by provider name, shared by the agents
+    """
+
+    config: ResilienceConfig
+
+    _policies: Dict[str, ResiliencePolicy]
+
+    def __init__(self, config: Optional[ResilienceConfig] = None):
+        self.config = config or ResilienceConfig()
+        self._policies = {}
+
+    def get_policy(self, name: str) -> ResiliencePolicy:
+        if name not in self._policies:
+            self._policies[name] = ResiliencePolicy(name, self.config)
+        return self._policies[name]
@@ -0,0 +1,148 @@
+import os
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from galadriel.connectors.twitter import SearchResult
+from galadriel.connectors.twitter import TwitterApiClient
+from galadriel.connectors.twitter import TwitterCredentials
+from galadriel.tools.twitter import CredentialsException
+
+TWEET_FIELDS = (
+    "public_metrics,text,author_id,referenced_tweets,attachments,conversation_id"
+)
+# Twitter API limits
+MAX_RESULTS_PER_PAGE = 100
+MAX_TWEETS_PER_LOOKUP = 100
+
+
+@dataclass
+class TimelinePage:
+    # Oldest first
+    results: List[SearchResult]
+    # Tweet id -> conversation id, SearchResult does not have it
+    conversation_ids: Dict[str, str]
+    # Cursor for the next poll, None if there was nothing new
+    newest_id: Optional[str]
+    # More new tweets than max_pages, the ones between the pages read and the
+    # previous cursor are skipped
+    is_truncated: bool = False
+
+
+class TwitterTimelineClient(TwitterApiClient):
+    """
+    Mentions, home timeline and tweet lookups, the endpoints galadriel's
+    Twitter tools do not have
+    """
+
+    _user_id: Optional[str]
+
+    def __init__(self, _credentials: Optional[TwitterCredentials] = None):
+        super().__init__(_credentials or _get_credentials_from_env())
+        self._user_id = None
+
+    def get_mentions(self, since_id: Optional[str], max_pages: int) -> TimelinePage:
+        return self._get_timeline(
+            f"users/{self._get_user_id()}/mentions", since_id, max_pages
+        )
+
+    def get_home_timeline(
+        self, since_id: Optional[str], max_pages: int
+    ) -> TimelinePage:
+        return self._get_timeline(
+            f"users/{self._get_user_id()}/timelines/reverse_chronological",
+            since_id,
+            max_pages,
+        )
+
+    def get_tweets(self, tweet_ids: List[str]) -> TimelinePage:
+        """
+        Looks up the tweets in batches, missing or deleted tweets are left out
+        """
+        results: List[SearchResult] = []
+        conversation_ids: Dict[str, str] = {}
+        for i in range(0, len(tweet_ids), MAX_TWEETS_PER_LOOKUP):
+            response = self._make_request(
+                "GET",
+                "tweets",
+                params={
+                    "ids": ",".join(tweet_ids[i : i + MAX_TWEETS_PER_LOOKUP]),
+                    "tweet.fields": TWEET_FIELDS,
+                    "expansions": "author_id",
+                    "user.fields": "name,username",
+                },
+            )
+            results.extend(self._format_search_results(response))
+            conversation_ids.update(_get_conversation_ids(response))
+        return TimelinePage(
+            results=results, conversation_ids=conversation_ids, newest_id=None
+        )
+
+    def _get_timeline(
+        self, endpoint: str, since_id: Optional[str], max_pages: int
+    ) -> TimelinePage:
+        results: List[SearchResult] = []
+        conversation_ids: Dict[str, str] = {}
+        newest_id = None
+        pagination_token = None
+        for _ in range(max_pages):
+            params = {
+                "tweet.fields": TWEET_FIELDS,
+                "expansions": "author_id",
+                "user.fields": "name,username",
+                "max_results": MAX_RESULTS_PER_PAGE,
+            }
+            if since_id:
+                params["since_id"] = since_id
+            if pagination_token:
+                params["pagination_token"] = pagination_token
+            response = self._make_request("GET", endpoint, params=params)
+            meta = response.get("meta", {})
+            # Pages are newest first, the first page has the newest tweet
+            newest_id = newest_id or meta.get("newest_id")
+            results.extend(self._format_search_results(response))
+            conversation_ids.update(_get_conversation_ids(response))
+            pagination_token = meta.get("next_token")
+            # Without since_id only the first page is needed to start the cursor
+            if not pagination_token or not since_id:
+                pagination_token = None
+                break
+        return TimelinePage(
+            results=list(reversed(results)),
+            conversation_ids=conversation_ids,
+            newest_id=newest_id,
+            is_truncated=bool(pagination_token),
+        )
+
+    def _get_user_id(self) -> str:
+        if not self._user_id:
+            response = self._make_request("GET", "users/me")
+            self._user_id = response["data"]["id"]
+        return self._user_id
+
+
+def _get_conversation_ids(response: Dict) -> Dict[str, str]:
+    return {
+        tweet["id"]: tweet["conversation_id"]
+        for tweet in response.get("data", [])
+        if tweet.get("conversation_id")
+    }
+
+
+def _get_credentials_from_env() -> TwitterCredentials:
+    # Same variables as galadriel's Twitter tools
+    names = [
+        "TWITTER_CONSUMER_API_KEY",
+        "TWITTER_CONSUMER_API_SECRET",
+        "TWITTER_ACCESS_TOKEN",
+        "TWITTER_ACCESS_TOKEN_SECRET",
+    ]
+    if not all(os.getenv(name) for name in names):
+        raise CredentialsException("Missing Twitter environment variables")
+    return TwitterCredentials(
+        consumer_api_key=os.getenv("TWITTER_CONSUMER_API_KEY", ""),
+        consumer_api_secret=os.getenv("TWITTER_CONSUMER_API_SECRET", ""),
+        access_token=os.getenv("TWITTER_ACCESS_TOKEN", ""),
+        access_token_secret=os.getenv("TWITTER_ACCESS_TOKEN_SECRET", ""),
+    )
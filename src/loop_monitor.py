@@ -0,0 +1,198 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from types import FrameType
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+from src import utils
+
+logger = get_agent_logger()
+
+# The call site of a blocking call is the innermost frame in this repository
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_STACK_FRAMES = 20
+REPORTED_CALL_SITES = 5
+
+
+@dataclass
+class LoopMonitorConfig:
+    is_enabled: bool = True
+    check_interval_seconds: float = 0.5
+    # The loop being blocked longer than this captures the stack
+    blocked_threshold_seconds: float = 0.1
+    report_interval_seconds: float = 10 * 60
+
+    @staticmethod
+    def from_settings(settings: Dict) -> "LoopMonitorConfig":
+        return utils.config_from_settings(LoopMonitorConfig, settings, "loop_monitor")
+
+
+@dataclass
+class BlockingCallSite:
+    call_site: str
+    count: int
+    total_seconds: float
+    max_seconds: float
+    # Stack of the longest block
+    stack: str
+
+
+class LoopMonitor:
+    """
+    Measures the event loop lag from a watchdog thread: a callback is scheduled
+    on the loop and timed until it runs. If the loop does not run it within the
+    threshold, the stack of the loop thread is captured while it is still
+    blocked, and the block is added to the totals of its call site.
+    """
+
+    config: LoopMonitorConfig
+
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _loop_thread_id: Optional[int]
+    _stop_event: threading.Event
+    _thread: Optional[threading.Thread]
+    _call_sites: Dict[str, BlockingCallSite]
+    _max_lag_seconds: float
+
+    def __init__(self, config: Optional[LoopMonitorConfig] = None):
+        self.config = config or LoopMonitorConfig()
+        self._loop = None
+        self._loop_thread_id = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._call_sites = {}
+        self._max_lag_seconds = 0
+
+    def start(self) -> None:
+        """
+        Has to be called from the event loop thread
+        """
+        if self._thread:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._run, name="loop_monitor", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.log_report()
+
+    def get_report(self) -> List[BlockingCallSite]:
+        """
+        Returns the call sites that blocked the loop, most total time first
+        """
+        return sorted(
+            list(self._call_sites.values()),
+            key=lambda c: c.total_seconds,
+            reverse=True,
+        )
+
+    def log_report(self) -> None:
+        report = self.get_report()
+        if not report:
+            logger.info("Event loop max lag: %.3fs", self._max_lag_seconds)
+            return
+        lines = "\n".join(
+            f"{c.call_site}: {c.count} blocks, "
+            f"{c.total_seconds:.2f}s total, {c.max_seconds:.2f}s max"
+            for c in report[:REPORTED_CALL_SITES]
+        )
+        logger.info(
+            "Event loop max lag: %.3fs, blocking call sites:\n%s\n"
+            "Longest block of %s:\n%s",
+            self._max_lag_seconds,
+            lines,
+            report[0].call_site,
+            report[0].stack,
+        )
+
+    def _run(self) -> None:
+        reported_at = time.monotonic()
+        while not self._stop_event.wait(self.config.check_interval_seconds):
+            self._check()
+            if time.monotonic() - reported_at >= self.config.report_interval_seconds:
+                self.log_report()
+                reported_at = time.monotonic()
+
+    def _check(self) -> None:
+        if not self._loop or self._loop.is_closed():
+            return
+        is_run = threading.Event()
+        sent_at = time.monotonic()
+        try:
+            self._loop.call_soon_threadsafe(is_run.set)
+        except RuntimeError:
+            # The loop was closed
+            return
+        if is_run.wait(self.config.blocked_threshold_seconds):
+            self._record_lag(time.monotonic() - sent_at)
+            return
+        # Still blocked, the stack shows what is blocking it. Formatted right
+        # away, the frame keeps running
+        frame = sys._current_frames().get(  # pylint:disable=W0212
+            self._loop_thread_id or 0
+        )
+        call_site = get_call_site(frame) if frame else "unknown"
+        stack = (
+            "".join(traceback.format_stack(frame, limit=MAX_STACK_FRAMES))
+            if frame
+            else ""
+        )
+        while not is_run.wait(self.config.check_interval_seconds):
+            if self._stop_event.is_set():
+                return
+        lag = time.monotonic() - sent_at
+        self._record_lag(lag)
+        self._record_block(call_site, stack, lag)
+
+    def _record_lag(self, lag: float) -> None:
+        self._max_lag_seconds = max(self._max_lag_seconds, lag)
+        metrics.set_gauge("loop.lag_seconds", lag)
+        metrics.set_gauge("loop.max_lag_seconds", self._max_lag_seconds)
+
+    def _record_block(self, call_site: str, stack: str, lag: float) -> None:
+        site = self._call_sites.get(call_site)
+        if not site:
+            site = BlockingCallSite(call_site, 0, 0, 0, stack)
+            self._call_sites[call_site] = site
+        site.count += 1
+        site.total_seconds += lag
+        if lag > site.max_seconds:
+            site.max_seconds = lag
+            site.stack = stack
+        metrics.increment("loop.blocked_calls")
+        metrics.increment("loop.blocked_seconds", lag)
+        # Every block at DEBUG, the call site totals are logged in the report
+        logger.debug("Event loop blocked for %.2fs at %s:\n%s", lag, call_site, stack)
+
+
+def get_call_site(frame: FrameType) -> str:
+    """
+    Innermost frame of the repository code, or the innermost frame if there is none
+    """
+    current: Optional[FrameType] = frame
+    while current:
+        file_name = current.f_code.co_filename
+        if file_name.startswith(PROJECT_DIR) and "site-packages" not in file_name:
+            break
+        current = current.f_back
+    if current:
+        file_name = os.path.relpath(current.f_code.co_filename, PROJECT_DIR)
+    else:
+        current = frame
+        file_name = os.path.basename(frame.f_code.co_filename)
+    return f"{file_name}:{current.f_lineno} {current.f_code.co_name}"
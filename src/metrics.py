@@ -0,0 +1,37 @@
+from collections import defaultdict
+from typing import Dict
+
+from galadriel.logging_utils import get_agent_logger
+
+logger = get_agent_logger()
+
+# In-process metrics, names are dot separated, eg "http.perplexity.requests"
+_counters: Dict[str, float] = defaultdict(float)
+_gauges: Dict[str, float] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+    _counters[name] += value
+
+
+def set_gauge(name: str, value: float) -> None:
+    _gauges[name] = value
+
+
+def get_counter(name: str) -> float:
+    return _counters.get(name, 0)
+
+
+def get_snapshot(prefix: str = "") -> Dict[str, float]:
+    snapshot = {k: v for k, v in _counters.items() if k.startswith(prefix)}
+    snapshot.update({k: v for k, v in _gauges.items() if k.startswith(prefix)})
+    return dict(sorted(snapshot.items()))
+
+
+def log_snapshot(prefix: str = "") -> None:
+    logger.info(f"Metrics: {get_snapshot(prefix)}")
+
+
+def reset() -> None:
+    _counters.clear()
+    _gauges.clear()
@@ -1,3 +1,4 @@
+import sys
 from dataclasses import dataclass
 from dataclasses import field
 from typing import Any
@@ -5,6 +6,7 @@ from typing import Dict
 from typing import List
 from typing import Literal
 from typing import Optional
+from typing import cast
 
 
 @dataclass
@@ -44,21 +46,16 @@ class TwitterAgentConfig:
     @classmethod
     def from_json(cls, data: Dict):
         # Separate known fields and extra fields
-        kwargs = {
-            key: value
-            for key, value in data.items()
-            if key in TwitterAgentConfig.required_fields()
-        }
+        required_fields = set(TwitterAgentConfig.required_fields())
+        kwargs = {key: value for key, value in data.items() if key in required_fields}
         extra_fields = {
-            key: value
-            for key, value in data.items()
-            if key not in TwitterAgentConfig.required_fields()
+            key: value for key, value in data.items() if key not in required_fields
         }
         # Pass known fields to the dataclass, and store extra fields
         return cls(**kwargs, extra_fields=extra_fields)
 
 
-@dataclass
+@dataclass(slots=True)
 class Memory:
     id: str
     conversation_id: Optional[str]
@@ -73,24 +70,36 @@ class Memory:
 
     @staticmethod
     def from_dict(data: Dict) -> "Memory":
+        # Types, topics and usernames repeat across memories, interning shares the strings
         return Memory(
             id=data["id"],
             conversation_id=data.get("conversation_id"),
-            type=data["type"],
+            type=cast(Literal["tweet", "tweet_excluded"], sys.intern(data["type"])),
             text=data["text"],
-            topics=data.get("topics", []),
+            topics=[sys.intern(t) for t in data.get("topics") or []],
             timestamp=data["timestamp"],
-            search_topic=data.get("search_topic"),
+            search_topic=_intern(data.get("search_topic")),
             quoted_tweet_id=data.get("quoted_tweet_id"),
-            quoted_tweet_username=data.get("quoted_tweet_username"),
+            quoted_tweet_username=_intern(data.get("quoted_tweet_username")),
             reply_to_id=data.get("reply_to_id"),
         )
 
     def to_dict(self) -> Dict:
-        return self.__dict__
+        return {
+            "id": self.id,
+            "conversation_id": self.conversation_id,
+            "type": self.type,
+            "text": self.text,
+            "topics": self.topics,
+            "timestamp": self.timestamp,
+            "search_topic": self.search_topic,
+            "quoted_tweet_id": self.quoted_tweet_id,
+            "quoted_tweet_username": self.quoted_tweet_username,
+            "reply_to_id": self.reply_to_id,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class TwitterPost:
     type: Literal["tweet", "tweet_excluded"]
     conversation_id: Optional[str]
@@ -116,4 +125,19 @@ class TwitterPost:
         )
 
     def to_dict(self) -> Dict:
-        return self.__dict__
+        return {
+            "type": self.type,
+            "conversation_id": self.conversation_id,
+            "text": self.text,
+            "topics": self.topics,
+            "search_topic": self.search_topic,
+            "quoted_tweet_id": self.quoted_tweet_id,
+            "quoted_tweet_username": self.quoted_tweet_username,
+            "reply_to_id": self.reply_to_id,
+        }
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return sys.intern(value)
@@ -0,0 +1,164 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from galadriel.entities import Message
+from galadriel.entities import PushOnlyQueue
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+
+logger = get_agent_logger()
+
+# Lower is handled first, scheduled posts should not wait behind replies
+MESSAGE_PRIORITIES = {
+    "tweet_original": 0,
+    "tweet_reply": 1,
+    "tweet_draft": 2,
+}
+DEFAULT_PRIORITY = 1
+
+DEFAULT_MAX_SIZE = 100
+# If the output never reports a message as handled, the next one is sent anyway
+DEFAULT_MAX_IN_FLIGHT_SECONDS = 15 * 60
+
+
+class PriorityEventQueue:
+    """
+    Holds the events in front of the runtime queue: the runtime only gets the
+    next event after the previous one has been handled, so the events can be
+    prioritised and deduplicated until the last moment
+    """
+
+    runtime_queue: PushOnlyQueue
+    max_size: int
+    max_in_flight_seconds: float
+
+    _heap: List[Tuple[int, int, float, Optional[str], Message]]
+    _counter: itertools.count
+    _keys: Set[str]
+    _in_flight_message: Optional[Message]
+    _in_flight_key: Optional[str]
+    # Set when the event in flight has been handled
+    _in_flight_done: asyncio.Event
+    _changed: asyncio.Condition
+    _dispatcher: Optional[asyncio.Task]
+
+    def __init__(
+        self,
+        runtime_queue: PushOnlyQueue,
+        max_size: int = DEFAULT_MAX_SIZE,
+        max_in_flight_seconds: float = DEFAULT_MAX_IN_FLIGHT_SECONDS,
+    ):
+        self.runtime_queue = runtime_queue
+        self.max_size = max_size
+        self.max_in_flight_seconds = max_in_flight_seconds
+        self._heap = []
+        # Keeps the order of events with the same priority
+        self._counter = itertools.count()
+        self._keys = set()
+        self._in_flight_message = None
+        self._in_flight_key = None
+        self._in_flight_done = asyncio.Event()
+        self._changed = asyncio.Condition()
+        self._dispatcher = None
+
+    def start(self) -> None:
+        self._dispatcher = asyncio.create_task(self._run_dispatcher())
+
+    async def put(self, message: Message, dedup_key: Optional[str] = None) -> bool:
+        """
+        Waits while the queue is full, returns False if an event with the same
+        dedup key is already queued or being handled
+        """
+        async with self._changed:
+            if dedup_key and self._is_known_key(dedup_key):
+                metrics.increment("event_queue.deduplicated")
+                logger.debug(f"Event {dedup_key} is already queued, skipping")
+                return False
+            await self._changed.wait_for(lambda: len(self._heap) < self.max_size)
+            # Checked again, the same event could have been queued while waiting
+            if dedup_key and self._is_known_key(dedup_key):
+                metrics.increment("event_queue.deduplicated")
+                return False
+            priority = MESSAGE_PRIORITIES.get(message.type or "", DEFAULT_PRIORITY)
+            heapq.heappush(
+                self._heap,
+                (priority, next(self._counter), time.monotonic(), dedup_key, message),
+            )
+            if dedup_key:
+                self._keys.add(dedup_key)
+            metrics.set_gauge("event_queue.size", len(self._heap))
+            self._changed.notify_all()
+        return True
+
+    async def task_done(self, message: Message) -> None:
+        """
+        Called after the runtime has handled the event, releases the next one
+        """
+        async with self._changed:
+            # Could be an event that was already released after a timeout
+            if message is self._in_flight_message:
+                self._release()
+
+    def get_size(self) -> int:
+        return len(self._heap)
+
+    async def close(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+
+    async def _run_dispatcher(self) -> None:
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: self._heap and not self._in_flight_message
+                )
+                _, _, queued_at, dedup_key, message = heapq.heappop(self._heap)
+                self._in_flight_message = message
+                self._in_flight_key = dedup_key
+                in_flight_done = asyncio.Event()
+                self._in_flight_done = in_flight_done
+                metrics.set_gauge("event_queue.size", len(self._heap))
+                metrics.increment(f"event_queue.dispatched.{message.type}")
+                metrics.increment(
+                    "event_queue.wait_seconds", time.monotonic() - queued_at
+                )
+                # Producers waiting for space can continue
+                self._changed.notify_all()
+            await self.runtime_queue.put(message)
+            # Waited outside the lock, so cancelling the dispatcher never waits for it
+            done_waiter = asyncio.ensure_future(in_flight_done.wait())
+            try:
+                done, _ = await asyncio.wait(
+                    [done_waiter], timeout=self.max_in_flight_seconds
+                )
+            finally:
+                done_waiter.cancel()
+            if not done:
+                logger.warning(
+                    f"Event {message.type} was not handled in {self.max_in_flight_seconds}s, continuing"
+                )
+                async with self._changed:
+                    if self._in_flight_message is message:
+                        self._release()
+
+    def _is_known_key(self, dedup_key: str) -> bool:
+        # Keys stay known until the event has been handled
+        return dedup_key in self._keys
+
+    def _release(self) -> None:
+        if self._in_flight_key:
+            self._keys.discard(self._in_flight_key)
+        self._in_flight_message = None
+        self._in_flight_key = None
+        self._in_flight_done.set()
+        self._changed.notify_all()
@@ -0,0 +1,151 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from types import FrameType
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from galadriel.logging_utils import get_agent_logger
+from src import utils
+
+logger = get_agent_logger()
+
+
+@dataclass
+class ProfilerConfig:
+    # Profiles the next executions of the agent
+    executions: int = 10
+    # Profiles a time window instead, if set
+    window_seconds: Optional[float] = None
+    # Stops even if there were not enough executions
+    max_seconds: float = 30 * 60
+    sample_interval_seconds: float = 0.005
+    output_dir: str = os.path.join("logs", "profiles")
+
+    @staticmethod
+    def from_settings(settings: Dict) -> "ProfilerConfig":
+        return utils.config_from_settings(ProfilerConfig, settings, "profiler")
+
+
+class Profiler:
+    """
+    Sampling profiler of the main thread, started and stopped at runtime
+    (SIGUSR1 in agent.py). The samples are written as collapsed stacks, the
+    input format of flamegraph.pl and speedscope. Nothing runs when it is off.
+    """
+
+    config: ProfilerConfig
+    # Path of the last written profile
+    output_path: Optional[str]
+
+    _is_active: bool
+    _executions: int
+    _stop_event: threading.Event
+    _thread: Optional[threading.Thread]
+
+    def __init__(self, config: Optional[ProfilerConfig] = None):
+        self.config = config or ProfilerConfig()
+        self.output_path = None
+        self._is_active = False
+        self._executions = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_active(self) -> bool:
+        return self._is_active
+
+    def toggle(self) -> None:
+        if self._is_active:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self) -> None:
+        if self._is_active:
+            return
+        self._is_active = True
+        self._executions = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(threading.get_ident(), self._stop_event),
+            name="profiler",
+            daemon=True,
+        )
+        self._thread.start()
+        if self.config.window_seconds:
+            logger.info(f"Profiling for {self.config.window_seconds} seconds")
+        else:
+            logger.info(f"Profiling the next {self.config.executions} executions")
+
+    def stop(self) -> None:
+        # The sampling thread writes the profile, so the caller is not blocked
+        self._is_active = False
+        self._stop_event.set()
+
+    def close(self) -> None:
+        # Waits for the profile to be written, for the shutdown
+        self.stop()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def record_execution(self) -> None:
+        if not self._is_active:
+            return
+        self._executions += 1
+        if (
+            not self.config.window_seconds
+            and self._executions >= self.config.executions
+        ):
+            self.stop()
+
+    def _run(self, thread_id: int, stop_event: threading.Event) -> None:
+        stacks: Counter = Counter()
+        started_at = time.monotonic()
+        max_seconds = self.config.window_seconds or self.config.max_seconds
+        while not stop_event.wait(self.config.sample_interval_seconds):
+            frame = sys._current_frames().get(thread_id)  # pylint:disable=W0212
+            if frame:
+                stacks[_get_stack(frame)] += 1
+            if time.monotonic() - started_at >= max_seconds:
+                break
+        if stop_event is self._stop_event:
+            # Not restarted in the meantime
+            self._is_active = False
+        self._write(stacks, time.monotonic() - started_at)
+
+    def _write(self, stacks: Counter, duration: float) -> None:
+        file_path = os.path.join(
+            self.config.output_dir,
+            f"profile_{utils.get_current_timestamp()}.folded",
+        )
+        try:
+            os.makedirs(self.config.output_dir, exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except Exception:
+            logger.error("Failed to write the profile", exc_info=True)
+            return
+        self.output_path = file_path
+        logger.info(
+            f"Wrote profile with {sum(stacks.values())} samples "
+            f"over {duration:.1f}s to {file_path}"
+        )
+
+
+def _get_stack(frame: Optional[FrameType]) -> str:
+    # Collapsed stack, root first, eg "main (agent.py:30);run (runtime.py:40)"
+    names: List[str] = []
+    while frame:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(names))
@@ -0,0 +1,129 @@
+import gzip
+import json
+import logging
+import os
+import random
+import shutil
+import time
+from dataclasses import dataclass
+from logging.handlers import RotatingFileHandler
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+
+from openai.types.chat import ChatCompletion
+from openai.types.chat import ChatCompletionMessageParam
+
+from src import metrics
+from src import utils
+
+
+@dataclass
+class PromptLogConfig:
+    # Full prompts are not logged anywhere by default
+    is_enabled: bool = False
+    # Share of the completions logged
+    sample_rate: float = 0.1
+    max_per_minute: int = 10
+    file_path: str = os.path.join("logs", "prompts.log")
+    # Rotated files are gzipped
+    max_bytes: int = 10 * 1024 * 1024
+    backup_count: int = 5
+
+    @staticmethod
+    def from_settings(settings: Dict) -> "PromptLogConfig":
+        return utils.config_from_settings(PromptLogConfig, settings, "prompt_log")
+
+
+class PromptLog:
+    """
+    Side channel for the LLM prompts and responses, kept out of the agent logs.
+    The completions are sampled and rate limited, one JSON document per line.
+    """
+
+    config: PromptLogConfig
+
+    _logger: Optional[logging.Logger]
+    _window_started_at: float
+    _window_count: int
+
+    def __init__(self, config: Optional[PromptLogConfig] = None):
+        self.config = config or PromptLogConfig()
+        self._logger = None
+        self._window_started_at = 0
+        self._window_count = 0
+        if self.config.is_enabled:
+            self._logger = _get_logger(self.config)
+
+    def log_completion(
+        self,
+        task: str,
+        messages: Iterable[ChatCompletionMessageParam],
+        response: Optional[ChatCompletion],
+    ) -> None:
+        if not self._logger or random.random() >= self.config.sample_rate:
+            return
+        now = time.monotonic()
+        if now - self._window_started_at >= 60:
+            self._window_started_at = now
+            self._window_count = 0
+        if self._window_count >= self.config.max_per_minute:
+            metrics.increment("prompt_log.rate_limited")
+            return
+        self._window_count += 1
+        content = None
+        if response and response.choices and response.choices[0].message:
+            content = response.choices[0].message.content
+        self._logger.info(
+            "%s",
+            json.dumps(
+                {
+                    "timestamp": utils.get_current_timestamp(),
+                    "task": task,
+                    "messages": list(messages),
+                    "response": content,
+                },
+                default=str,
+            ),
+        )
+
+
+_prompt_log = PromptLog()
+
+
+def configure(config: PromptLogConfig) -> None:
+    global _prompt_log  # pylint:disable=W0603
+    _prompt_log = PromptLog(config)
+
+
+def log_completion(
+    task: str,
+    messages: Iterable[ChatCompletionMessageParam],
+    response: Optional[ChatCompletion],
+) -> None:
+    _prompt_log.log_completion(task, messages, response)
+
+
+def _get_logger(config: PromptLogConfig) -> logging.Logger:
+    os.makedirs(os.path.dirname(config.file_path) or ".", exist_ok=True)
+    handler = RotatingFileHandler(
+        config.file_path,
+        maxBytes=config.max_bytes,
+        backupCount=config.backup_count,
+        encoding="utf-8",
+    )
+    handler.namer = lambda name: name + ".gz"
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    prompt_logger = logging.getLogger("prompts")
+    prompt_logger.handlers = [handler]
+    prompt_logger.setLevel(logging.INFO)
+    # Not repeated in the agent logs
+    prompt_logger.propagate = False
+    return prompt_logger
+
+
+def _gzip_rotator(source: str, destination: str) -> None:
+    with open(source, "rb") as f_in, gzip.open(destination, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
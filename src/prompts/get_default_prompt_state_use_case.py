@@ -33,8 +33,8 @@ async def _get_recent_posts(
     database_client: DatabaseClient,
 ) -> str:
     recent_posts: List[str] = []
-    tweets = await database_client.get_tweets()
-    for tweet in reversed(tweets):
+    summary = await database_client.get_history_summary()
+    for tweet in summary.get_recent_tweets(10):
         recent_posts.append(
             f"""Name: {agent.name} (@{agent.extra_fields.get("twitter_profile", {}).get(
                 "username", "user"
@@ -43,9 +43,7 @@ ID: {tweet.id}
 Date: {format_timestamp(tweet.timestamp)}
 Text: {tweet.text}"""
         )
-        if len(recent_posts) >= 10:
-            break
-    return "\n".join([t for t in reversed(recent_posts)])
+    return "\n".join(recent_posts)
 
 
 async def _get_topics(
@@ -18,13 +18,10 @@ class SearchQuery:
 
 async def execute(agent: TwitterAgentConfig, database: DatabaseClient) -> SearchQuery:
     all_search_topics = list(agent.search_queries.keys())
-    tweets = await database.get_tweets()
-    used_search_topics = []
-    for tweet in reversed(tweets):
-        if search_topic := tweet.search_topic:
-            used_search_topics.append(search_topic)
-        if len(used_search_topics) >= MAX_SEARCH_TOPICS_COUNT:
-            break
+    summary = await database.get_history_summary()
+    used_search_topics = set(
+        list(summary.recent_search_topics)[-MAX_SEARCH_TOPICS_COUNT:]
+    )
     filtered_search_topics = [
         t for t in all_search_topics if t not in used_search_topics
     ]
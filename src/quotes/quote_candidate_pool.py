@@ -0,0 +1,98 @@
+from typing import List
+from typing import Optional
+
+from galadriel.connectors.twitter import SearchResult
+from galadriel.logging_utils import get_agent_logger
+from src import utils
+from src.quotes.rank_quote_candidates import QuoteExclusions
+from src.repository.quote_candidate_repository import QuoteCandidateRepository
+
+logger = get_agent_logger()
+
+# Ranked candidates from one search are reused for this long
+DEFAULT_POOL_TTL_SECONDS = 6 * 60 * 60
+
+
+class QuoteCandidatePool:
+    repository: Optional[QuoteCandidateRepository]
+    ttl_seconds: int
+
+    search_query: str
+    candidates: List[SearchResult]
+    created_at: int
+
+    _is_loaded: bool
+
+    def __init__(
+        self,
+        repository: Optional[QuoteCandidateRepository] = None,
+        ttl_seconds: int = DEFAULT_POOL_TTL_SECONDS,
+    ):
+        self.repository = repository
+        self.ttl_seconds = ttl_seconds
+        self.search_query = ""
+        self.candidates = []
+        self.created_at = 0
+        self._is_loaded = repository is None
+
+    def is_stale(self) -> bool:
+        return utils.get_current_timestamp() - self.created_at > self.ttl_seconds
+
+    async def refill(
+        self, search_query: str, ranked_candidates: List[SearchResult]
+    ) -> None:
+        self.search_query = search_query
+        self.candidates = list(ranked_candidates)
+        self.created_at = utils.get_current_timestamp()
+        await self._save()
+
+    async def pop(
+        self, search_query: str, exclusions: QuoteExclusions
+    ) -> Optional[SearchResult]:
+        """
+        Returns the best candidate that is still not excluded, None if the pool
+        ran dry, went stale or was filled with a different search query
+        """
+        await self._load()
+        if self.search_query != search_query or self.is_stale():
+            self.candidates = []
+            return None
+        result = None
+        while self.candidates:
+            candidate = self.candidates.pop(0)
+            # History might have changed since the pool was filled
+            if not exclusions.is_excluded(candidate):
+                result = candidate
+                break
+        await self._save()
+        if result:
+            logger.info(
+                f"Got quote candidate from pool, {len(self.candidates)} candidates left"
+            )
+        return result
+
+    async def _load(self) -> None:
+        if self._is_loaded or not self.repository:
+            return
+        self._is_loaded = True
+        data = await self.repository.get()
+        if not data:
+            return
+        try:
+            self.search_query = data["search_query"]
+            self.created_at = data["created_at"]
+            self.candidates = [SearchResult.from_dict(c) for c in data["candidates"]]
+        except Exception:
+            logger.error("Invalid quote candidate pool, ignoring it", exc_info=True)
+            self.candidates = []
+
+    async def _save(self) -> None:
+        if not self.repository:
+            return
+        await self.repository.save(
+            {
+                "search_query": self.search_query,
+                "created_at": self.created_at,
+                "candidates": [c.to_dict() for c in self.candidates],
+            }
+        )
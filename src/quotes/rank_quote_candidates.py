@@ -0,0 +1,161 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+
+from galadriel.connectors.twitter import SearchResult
+from src import utils
+from src.models import TwitterAgentConfig
+from src.repository.history_summary import HistorySummary
+
+# How many tweets between last quote from the same user
+QUOTED_USER_REOCCURRENCE_LIMIT = 3
+# Users quoted within this many quotes are not excluded, but are ranked lower
+QUOTED_USER_PENALTY_WINDOW = 10
+
+# Twitter snowflake IDs encode the creation time in ms since this epoch
+TWITTER_EPOCH_MS = 1288834974657
+# Score of a tweet halves every RECENCY_HALF_LIFE_HOURS
+RECENCY_HALF_LIFE_HOURS = 6
+
+RECENCY_WEIGHT = 1.0
+ENGAGEMENT_WEIGHT = 1.0
+TOPIC_WEIGHT = 0.5
+# Multiplied for every earlier candidate from the same author in the ranking
+AUTHOR_REPEAT_PENALTY = 0.5
+RECENTLY_QUOTED_USER_PENALTY = 0.5
+
+_WORD_PATTERN = re.compile(r"[a-z0-9$#@]+")
+
+
+@dataclass
+class QuoteExclusions:
+    quoted_ids: Set[str]
+    # username -> how many quotes ago it was last quoted, 0 is the latest quote
+    quoted_users: Dict[str, int]
+
+    def is_excluded(self, tweet: SearchResult) -> bool:
+        return tweet.id in self.quoted_ids or self.is_excluded_user(tweet.username)
+
+    def is_excluded_user(self, username: str) -> bool:
+        quotes_ago = self.quoted_users.get(username)
+        return quotes_ago is not None and quotes_ago < QUOTED_USER_REOCCURRENCE_LIMIT
+
+
+def get_exclusions(summary: HistorySummary) -> QuoteExclusions:
+    quoted_users: Dict[str, int] = {}
+    recent_quoted_users = list(summary.recent_quoted_users)
+    for quotes_ago, username in enumerate(reversed(recent_quoted_users)):
+        if quotes_ago >= QUOTED_USER_PENALTY_WINDOW:
+            break
+        quoted_users.setdefault(username, quotes_ago)
+    return QuoteExclusions(
+        quoted_ids=summary.quoted_tweet_ids, quoted_users=quoted_users
+    )
+
+
+def is_quotable(tweet: SearchResult) -> bool:
+    return "https:" not in tweet.text and tweet.attachments is None
+
+
+def execute(
+    agent: TwitterAgentConfig,
+    candidates: List[SearchResult],
+    exclusions: QuoteExclusions,
+    now: Optional[int] = None,
+) -> List[SearchResult]:
+    """
+    Filters out candidates that can not be quoted and ranks the rest, best first
+    :param agent: agent config, its topics are used for relevance
+    :param candidates: twitter search results
+    :param exclusions: already quoted tweets and users
+    :param now: current timestamp in seconds
+    :return: quotable candidates ordered by score
+    """
+    now = now or utils.get_current_timestamp()
+    topic_words = _get_topic_words(agent.topics)
+
+    seen_ids: Set[str] = set()
+    scored = []
+    for candidate in candidates:
+        if candidate.id in seen_ids:
+            continue
+        seen_ids.add(candidate.id)
+        if not is_quotable(candidate) or exclusions.is_excluded(candidate):
+            continue
+        score = (
+            RECENCY_WEIGHT * _get_recency_score(candidate, now)
+            + ENGAGEMENT_WEIGHT * _get_engagement_score(candidate)
+            + TOPIC_WEIGHT * _get_topic_score(candidate, topic_words)
+        )
+        if candidate.username in exclusions.quoted_users:
+            score *= RECENTLY_QUOTED_USER_PENALTY
+        scored.append((score, candidate))
+
+    return _diversify_authors(scored)
+
+
+def get_tweet_timestamp(tweet_id: str) -> Optional[int]:
+    try:
+        return ((int(tweet_id) >> 22) + TWITTER_EPOCH_MS) // 1000
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_recency_score(tweet: SearchResult, now: int) -> float:
+    timestamp = get_tweet_timestamp(tweet.id)
+    if timestamp is None:
+        return 0.0
+    age_hours = max(0, now - timestamp) / 3600
+    return 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+
+
+def _get_engagement_score(tweet: SearchResult) -> float:
+    interactions = (
+        tweet.like_count
+        + tweet.reply_count
+        + tweet.bookmark_count
+        + 2 * tweet.retweet_count
+        + 3 * tweet.quote_count
+    )
+    # log scale, so a single viral tweet does not outweigh everything else
+    score = math.log10(1 + interactions) / 4
+    if tweet.impression_count:
+        score += min(1.0, 10 * interactions / tweet.impression_count) / 2
+    return score
+
+
+def _get_topic_score(tweet: SearchResult, topic_words: Set[str]) -> float:
+    if not topic_words:
+        return 0.0
+    words = set(_WORD_PATTERN.findall(tweet.text.lower()))
+    return min(1.0, len(words & topic_words) / 3)
+
+
+def _get_topic_words(topics: List[str]) -> Set[str]:
+    words: Set[str] = set()
+    for topic in topics:
+        words.update(w for w in _WORD_PATTERN.findall(topic.lower()) if len(w) > 1)
+    return words
+
+
+def _diversify_authors(scored: List) -> List[SearchResult]:
+    remaining = sorted(scored, key=lambda s: s[0], reverse=True)
+    author_counts: Dict[str, int] = {}
+    ranked: List[SearchResult] = []
+    while remaining:
+        best_index = 0
+        best_score = -1.0
+        for index, (score, candidate) in enumerate(remaining):
+            adjusted = score * AUTHOR_REPEAT_PENALTY ** author_counts.get(
+                candidate.username, 0
+            )
+            if adjusted > best_score:
+                best_index, best_score = index, adjusted
+        _, candidate = remaining.pop(best_index)
+        author_counts[candidate.username] = author_counts.get(candidate.username, 0) + 1
+        ranked.append(candidate)
+    return ranked
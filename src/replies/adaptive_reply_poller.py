@@ -0,0 +1,167 @@
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+from src import utils
+
+logger = get_agent_logger()
+
+# Reply ids remembered per conversation, to count only the new replies
+MAX_SEEN_REPLIES = 500
+# Weight of the latest poll in the reply rate
+RATE_SMOOTHING = 0.5
+
+
+@dataclass
+class AdaptiveReplyPollerConfig:
+    # Replies are generated by the LLM automatically, only when enabled
+    is_enabled: bool = False
+    # Conversations with new replies are polled again after min_interval_seconds,
+    # the interval is multiplied by backoff_multiplier for every poll without any
+    min_interval_seconds: float = 2 * 60
+    max_interval_seconds: float = 6 * 60 * 60
+    backoff_multiplier: float = 2
+    # Replies tool calls for all the conversations together
+    max_requests_per_hour: float = 30
+    # Loop wakes up at least this often to check for new conversations
+    max_sleep_seconds: float = 10 * 60
+
+    @staticmethod
+    def from_settings(settings: Dict) -> "AdaptiveReplyPollerConfig":
+        """
+        Reads the config from the "reply_polling" key in the character settings
+        """
+        return utils.config_from_settings(
+            AdaptiveReplyPollerConfig, settings, "reply_polling"
+        )
+
+
+@dataclass
+class ConversationActivity:
+    interval_seconds: float
+    next_poll_at: float
+    last_polled_at: Optional[float] = None
+    # New replies per hour, smoothed over the polls
+    reply_rate: float = 0
+    seen_reply_ids: Set[str] = field(default_factory=set)
+
+
+class AdaptiveReplyPoller:
+    """
+    Decides which conversations to check for replies: hot conversations are
+    polled often, cold ones are backed off, and all the polls share one budget
+    """
+
+    config: AdaptiveReplyPollerConfig
+
+    _conversations: Dict[str, ConversationActivity]
+    # Token bucket of the request budget
+    _budget: float
+    _budget_updated_at: Optional[float]
+
+    def __init__(self, config: AdaptiveReplyPollerConfig):
+        self.config = config
+        self._conversations = {}
+        self._budget = config.max_requests_per_hour
+        self._budget_updated_at = None
+
+    def get_due_conversations(
+        self, conversation_ids: List[str], now: Optional[float] = None
+    ) -> List[str]:
+        """
+        Returns the conversations to poll now, the most active first.
+        Conversations not in conversation_ids are forgotten.
+        """
+        now = time.monotonic() if now is None else now
+        self._conversations = {
+            conversation_id: self._conversations.get(conversation_id)
+            or ConversationActivity(
+                interval_seconds=self.config.min_interval_seconds, next_poll_at=now
+            )
+            for conversation_id in conversation_ids
+        }
+        due = sorted(
+            (
+                conversation_id
+                for conversation_id, activity in self._conversations.items()
+                if activity.next_poll_at <= now
+            ),
+            key=lambda c: (
+                -self._conversations[c].reply_rate,
+                self._conversations[c].next_poll_at,
+            ),
+        )
+        self._refill_budget(now)
+        allowed = due[: int(self._budget)]
+        self._budget -= len(allowed)
+        if len(allowed) < len(due):
+            metrics.increment("reply_poller.over_budget", len(due) - len(allowed))
+            logger.info(
+                f"Reply polling budget used up, postponing {len(due) - len(allowed)} conversations"
+            )
+        metrics.set_gauge("reply_poller.conversations", len(self._conversations))
+        return allowed
+
+    def record_poll(
+        self, conversation_id: str, reply_ids: List[str], now: Optional[float] = None
+    ) -> int:
+        """
+        Returns the number of replies that were not seen in earlier polls
+        """
+        now = time.monotonic() if now is None else now
+        activity = self._conversations.get(conversation_id)
+        if not activity:
+            return 0
+        new_reply_ids = [r for r in reply_ids if r not in activity.seen_reply_ids]
+        activity.seen_reply_ids.update(new_reply_ids)
+        if len(activity.seen_reply_ids) > MAX_SEEN_REPLIES:
+            activity.seen_reply_ids = set(reply_ids)
+
+        if activity.last_polled_at is not None:
+            hours = max(now - activity.last_polled_at, 1) / 3600
+            activity.reply_rate = (
+                RATE_SMOOTHING * len(new_reply_ids) / hours
+                + (1 - RATE_SMOOTHING) * activity.reply_rate
+            )
+        if new_reply_ids:
+            activity.interval_seconds = self.config.min_interval_seconds
+        else:
+            activity.interval_seconds = min(
+                activity.interval_seconds * self.config.backoff_multiplier,
+                self.config.max_interval_seconds,
+            )
+        activity.last_polled_at = now
+        activity.next_poll_at = now + activity.interval_seconds
+        metrics.increment("reply_poller.polls")
+        if not new_reply_ids:
+            metrics.increment("reply_poller.empty_polls")
+        return len(new_reply_ids)
+
+    def get_sleep_seconds(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        sleep_seconds = self.config.max_sleep_seconds
+        if self._conversations:
+            next_poll_at = min(a.next_poll_at for a in self._conversations.values())
+            sleep_seconds = min(sleep_seconds, next_poll_at - now)
+        if self._budget < 1:
+            # Waits for the budget to have at least one request again
+            seconds_per_request = 3600 / self.config.max_requests_per_hour
+            sleep_seconds = max(sleep_seconds, (1 - self._budget) * seconds_per_request)
+        return max(sleep_seconds, 1)
+
+    def _refill_budget(self, now: float) -> None:
+        if self._budget_updated_at is not None:
+            self._budget = min(
+                self.config.max_requests_per_hour,
+                self._budget
+                + (now - self._budget_updated_at)
+                * self.config.max_requests_per_hour
+                / 3600,
+            )
+        self._budget_updated_at = now
@@ -0,0 +1,237 @@
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Literal
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from galadriel.connectors.twitter import SearchResult
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+from src import utils
+from src.models import Memory
+
+logger = get_agent_logger()
+
+DEFAULT_SPAM_PHRASES = [
+    "airdrop",
+    "giveaway",
+    "check my bio",
+    "check my profile",
+    "dm me",
+    "dm for promo",
+    "follow back",
+    "claim now",
+    "free mint",
+]
+DEFAULT_STOP_PHRASES = [
+    "stop replying",
+    "stop tagging",
+    "leave me alone",
+    "go away",
+    "shut up",
+]
+
+# Users tracked for the per user counts, least recently seen are forgotten first
+MAX_TRACKED_USERS = 1000
+
+MENTION_REGEX = re.compile(r"@\w+")
+LINK_REGEX = re.compile(r"https?://\S+")
+WORD_REGEX = re.compile(r"\w+")
+
+
+@dataclass
+class ReplyPrefilterConfig:
+    is_enabled: bool = True
+    # Shorter replies are ignored, mentions and links are not counted as words
+    min_words: int = 2
+    max_mentions: int = 4
+    max_links: int = 1
+    # Replies from one user in one conversation, the rest are ignored
+    max_replies_per_user: int = 3
+    # Replies the agent has made in one conversation, after that it stops, off if None
+    max_replies_per_conversation: Optional[int] = None
+    # Parent tweets above the reply in the cached thread, deeper threads are stopped
+    max_thread_depth: Optional[int] = 8
+    spam_phrases: List[str] = field(default_factory=lambda: list(DEFAULT_SPAM_PHRASES))
+    stop_phrases: List[str] = field(default_factory=lambda: list(DEFAULT_STOP_PHRASES))
+
+    @staticmethod
+    def from_settings(settings: Dict) -> "ReplyPrefilterConfig":
+        """
+        Reads the config from the "reply_prefilter" key in the character settings
+        """
+        return utils.config_from_settings(
+            ReplyPrefilterConfig, settings, "reply_prefilter"
+        )
+
+
+@dataclass
+class PrefilterDecision:
+    decision: Literal["IGNORE", "STOP"]
+    rule: str
+
+
+@dataclass
+class ReplyFacts:
+    text: str
+    # Without mentions and links
+    words: List[str]
+    has_attachments: bool
+    user_replies_count: int
+    is_repeated: bool
+    conversation_replies_count: int
+    thread_depth: int
+
+
+Rule = Callable[[ReplyPrefilterConfig, ReplyFacts], bool]
+
+# Checked in order, the first matching rule decides
+RULES: List[Tuple[str, Literal["IGNORE", "STOP"], Rule]] = [
+    (
+        "stop_phrase",
+        "STOP",
+        lambda c, f: any(phrase in f.text for phrase in c.stop_phrases),
+    ),
+    (
+        "conversation_reply_cap",
+        "STOP",
+        lambda c, f: c.max_replies_per_conversation is not None
+        and f.conversation_replies_count >= c.max_replies_per_conversation,
+    ),
+    (
+        "thread_depth",
+        "STOP",
+        lambda c, f: c.max_thread_depth is not None
+        and f.thread_depth >= c.max_thread_depth,
+    ),
+    ("media_only", "IGNORE", lambda c, f: not f.words and f.has_attachments),
+    ("no_text", "IGNORE", lambda c, f: not f.words),
+    ("too_short", "IGNORE", lambda c, f: len(f.words) < c.min_words),
+    (
+        "spam_phrase",
+        "IGNORE",
+        lambda c, f: any(phrase in f.text for phrase in c.spam_phrases),
+    ),
+    (
+        "too_many_mentions",
+        "IGNORE",
+        lambda c, f: len(MENTION_REGEX.findall(f.text)) > c.max_mentions,
+    ),
+    (
+        "too_many_links",
+        "IGNORE",
+        lambda c, f: len(LINK_REGEX.findall(f.text)) > c.max_links,
+    ),
+    ("repeated_text", "IGNORE", lambda c, f: f.is_repeated),
+    (
+        "user_reply_count",
+        "IGNORE",
+        lambda c, f: f.user_replies_count > c.max_replies_per_user,
+    ),
+]
+
+
+class ReplyPrefilter:
+    """
+    Cheap local rules, run before the LLM is asked if a reply should be answered
+    """
+
+    config: ReplyPrefilterConfig
+
+    # (conversation_id, username) -> ids of the replies seen from the user
+    _user_reply_ids: "OrderedDict[Tuple[str, str], Set[str]]"
+    # username -> normalized reply text -> id of the first reply with that text
+    _user_texts: "OrderedDict[str, Dict[str, str]]"
+
+    def __init__(self, config: ReplyPrefilterConfig):
+        self.config = config
+        self._user_reply_ids = OrderedDict()
+        self._user_texts = OrderedDict()
+
+    def execute(
+        self,
+        conversation_id: str,
+        reply: SearchResult,
+        tweets: List[Memory],
+        thread_depth: int = 0,
+    ) -> Optional[PrefilterDecision]:
+        """
+        Returns the decision if the reply can be skipped without the LLM,
+        None if the LLM has to decide
+        """
+        if not self.config.is_enabled:
+            return None
+        metrics.increment("reply_prefilter.checked")
+        decision = self._get_decision(
+            self._get_facts(conversation_id, reply, tweets, thread_depth)
+        )
+        if decision:
+            metrics.increment("reply_prefilter.llm_calls_saved")
+            metrics.increment(f"reply_prefilter.rule.{decision.rule}")
+            logger.info(
+                f"Prefilter decided {decision.decision} for reply {reply.id}, rule: {decision.rule}"
+            )
+        return decision
+
+    def _get_decision(self, facts: ReplyFacts) -> Optional[PrefilterDecision]:
+        for rule, decision, is_matching in RULES:
+            if is_matching(self.config, facts):
+                return PrefilterDecision(decision, rule)
+        return None
+
+    def _get_facts(
+        self,
+        conversation_id: str,
+        reply: SearchResult,
+        tweets: List[Memory],
+        thread_depth: int,
+    ) -> ReplyFacts:
+        text = reply.text.lower()
+        words = WORD_REGEX.findall(LINK_REGEX.sub("", MENTION_REGEX.sub("", text)))
+        conversation_replies_count = 0
+        if self.config.max_replies_per_conversation is not None:
+            conversation_replies_count = len(
+                [
+                    t
+                    for t in tweets
+                    if t.conversation_id == conversation_id and t.reply_to_id
+                ]
+            )
+        return ReplyFacts(
+            text=text,
+            words=words,
+            has_attachments=bool(reply.attachments),
+            # Counted before any rule, so skipped replies still count
+            user_replies_count=self._add_user_reply(conversation_id, reply),
+            is_repeated=self._add_user_text(reply, " ".join(words)),
+            conversation_replies_count=conversation_replies_count,
+            thread_depth=thread_depth,
+        )
+
+    def _add_user_reply(self, conversation_id: str, reply: SearchResult) -> int:
+        key = (conversation_id, reply.username)
+        reply_ids = self._user_reply_ids.setdefault(key, set())
+        reply_ids.add(reply.id)
+        _touch(self._user_reply_ids, key)
+        return len(reply_ids)
+
+    def _add_user_text(self, reply: SearchResult, normalized_text: str) -> bool:
+        """
+        Returns True if the user has sent the same text in an earlier reply
+        """
+        texts = self._user_texts.setdefault(reply.username, {})
+        first_reply_id = texts.setdefault(normalized_text, reply.id)
+        _touch(self._user_texts, reply.username)
+        return first_reply_id != reply.id
+
+
+def _touch(items: OrderedDict, key) -> None:
+    items.move_to_end(key)
+    while len(items) > MAX_TRACKED_USERS:
+        items.popitem(last=False)
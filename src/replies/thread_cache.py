@@ -0,0 +1,154 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+from galadriel.connectors.twitter import SearchResult
+from src import metrics
+from src import utils
+
+DEFAULT_MAX_CONVERSATIONS = 200
+DEFAULT_MAX_AGE_SECONDS = 24 * 60 * 60
+# Parent tweets included in the formatted thread
+DEFAULT_MAX_THREAD_TWEETS = 8
+
+
+@dataclass
+class CachedTweet:
+    id: str
+    username: str
+    text: str
+    parent_id: Optional[str]
+
+
+@dataclass
+class ConversationThread:
+    tweets: Dict[str, CachedTweet] = field(default_factory=dict)
+    # parent id -> ids of the replies to it
+    children: Dict[str, List[str]] = field(default_factory=dict)
+    updated_at: int = 0
+
+
+class ThreadCache:
+    """
+    Tweets of the recent conversations, stored once per conversation and
+    linked parent -> child, so the thread of a reply is built without API calls.
+    Least recently used and expired conversations are evicted.
+    """
+
+    max_conversations: int
+    max_age_seconds: int
+
+    _conversations: "OrderedDict[str, ConversationThread]"
+
+    def __init__(
+        self,
+        max_conversations: int = DEFAULT_MAX_CONVERSATIONS,
+        max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS,
+    ):
+        self.max_conversations = max_conversations
+        self.max_age_seconds = max_age_seconds
+        self._conversations = OrderedDict()
+
+    def add_tweets(self, conversation_id: str, tweets: Iterable[SearchResult]) -> int:
+        """
+        Returns the number of tweets that were not cached yet
+        """
+        return sum(
+            self.add_tweet(
+                conversation_id,
+                CachedTweet(
+                    id=t.id,
+                    username=t.username,
+                    text=t.text,
+                    parent_id=get_parent_id(t),
+                ),
+            )
+            for t in tweets
+        )
+
+    def add_tweet(self, conversation_id: str, tweet: CachedTweet) -> bool:
+        thread = self._conversations.get(conversation_id)
+        if not thread:
+            thread = ConversationThread()
+            self._conversations[conversation_id] = thread
+        thread.updated_at = utils.get_current_timestamp()
+        self._conversations.move_to_end(conversation_id)
+        self._evict()
+        if tweet.id in thread.tweets:
+            return False
+        thread.tweets[tweet.id] = tweet
+        if tweet.parent_id:
+            thread.children.setdefault(tweet.parent_id, []).append(tweet.id)
+        return True
+
+    def has_tweet(self, conversation_id: str, tweet_id: str) -> bool:
+        thread = self._conversations.get(conversation_id)
+        return bool(thread and tweet_id in thread.tweets)
+
+    def get_thread(self, conversation_id: str, tweet_id: str) -> List[CachedTweet]:
+        """
+        Returns the parents of the tweet, oldest first
+        """
+        self._evict()
+        thread = self._conversations.get(conversation_id)
+        if not thread:
+            metrics.increment("thread_cache.misses")
+            return []
+        metrics.increment("thread_cache.hits")
+        self._conversations.move_to_end(conversation_id)
+        parents: List[CachedTweet] = []
+        tweet = thread.tweets.get(tweet_id)
+        parent_id = tweet.parent_id if tweet else None
+        while parent_id and (parent := thread.tweets.get(parent_id)):
+            if parent in parents:
+                break
+            parents.insert(0, parent)
+            parent_id = parent.parent_id
+        return parents
+
+    def get_replies(self, conversation_id: str, tweet_id: str) -> List[CachedTweet]:
+        thread = self._conversations.get(conversation_id)
+        if not thread:
+            return []
+        return [thread.tweets[i] for i in thread.children.get(tweet_id, [])]
+
+    def format_thread(
+        self,
+        conversation_id: str,
+        tweet_id: str,
+        max_tweets: int = DEFAULT_MAX_THREAD_TWEETS,
+    ) -> str:
+        return format_thread(self.get_thread(conversation_id, tweet_id), max_tweets)
+
+    def _evict(self) -> None:
+        min_updated_at = utils.get_current_timestamp() - self.max_age_seconds
+        expired = [
+            conversation_id
+            for conversation_id, thread in self._conversations.items()
+            if thread.updated_at < min_updated_at
+        ]
+        for conversation_id in expired:
+            del self._conversations[conversation_id]
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+        metrics.set_gauge("thread_cache.conversations", len(self._conversations))
+
+
+def format_thread(
+    thread: List[CachedTweet], max_tweets: int = DEFAULT_MAX_THREAD_TWEETS
+) -> str:
+    if len(thread) > max_tweets:
+        # The original post and the latest replies are the most useful
+        thread = thread[:1] + thread[len(thread) - max_tweets + 1 :]
+    return "\n".join(f"@{t.username}: {t.text}" for t in thread)
+
+
+def get_parent_id(tweet: SearchResult) -> Optional[str]:
+    for referenced_tweet in tweet.referenced_tweets or []:
+        if referenced_tweet.get("type") == "replied_to":
+            return referenced_tweet.get("id")
+    return None
@@ -0,0 +1,49 @@
+import os
+from typing import Dict
+from typing import Optional
+
+from galadriel.logging_utils import get_agent_logger
+from src.repository import file_utils
+
+logger = get_agent_logger()
+
+CURSORS_FILE = "input_cursors.json"
+
+
+class CursorRepository:
+    """
+    Since-id cursors of the polled Twitter timelines, by timeline name
+    """
+
+    file_path: str
+
+    _cursors: Optional[Dict[str, str]]
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+    ):
+        os.makedirs(data_dir, exist_ok=True)
+        self.file_path = os.path.join(data_dir, CURSORS_FILE)
+        self._cursors = None
+
+    async def get(self, name: str) -> Optional[str]:
+        return (await self._get_cursors()).get(name)
+
+    async def save(self, name: str, cursor: str) -> None:
+        cursors = await self._get_cursors()
+        cursors[name] = cursor
+        try:
+            await file_utils.write_json(self.file_path, cursors)
+        except Exception:
+            logger.error("Failed to save input cursors", exc_info=True)
+
+    async def _get_cursors(self) -> Dict[str, str]:
+        if self._cursors is None:
+            self._cursors = {}
+            if os.path.exists(self.file_path):
+                try:
+                    self._cursors = await file_utils.read_json(self.file_path)
+                except Exception:
+                    logger.error("Failed to read input cursors", exc_info=True)
+        return self._cursors
@@ -1,37 +1,88 @@
+import asyncio
 import json
 import os
-from typing import Dict
 from typing import List
 from typing import Optional
-from typing import Union
-
-import aiofiles
+from typing import Set
 
 from galadriel.logging_utils import get_agent_logger
 from src.models import Memory
+from src.repository import file_utils
+from src.repository.history_summary import HistorySummary
+from src.repository.memory_archive import MemoryArchive
 
 logger = get_agent_logger()
 
 MEMORIES_FILE = "memories.json"
+HISTORY_SUMMARY_FILE = "history_summary.json"
+# Saved summaries with another version are rebuilt
+HISTORY_SUMMARY_VERSION = 2
+
+# Pending memories are written to the file at least this often
+DEFAULT_FLUSH_INTERVAL_SECONDS = 5
+# Or immediately once this many memories are pending
+DEFAULT_FLUSH_BATCH_SIZE = 20
+# How many of the latest memories are kept in memories.json, older ones are archived
+DEFAULT_HOT_WINDOW_SIZE = 200
+# Archive only once this many memories are over the hot window, not on every flush
+ARCHIVE_BATCH_SIZE = 50
 
 
 class DatabaseClient:
+    data_dir: str
     memories_file_path: str
+    history_summary_file_path: str
+
+    flush_interval_seconds: float
+    flush_batch_size: int
+    is_fsync: bool
+    hot_window_size: int
+
+    archive: MemoryArchive
+
+    # Memories added, but not yet written to the file
+    _pending_memories: List[Memory]
+    _flush_tasks: Set[asyncio.Task]
+    _flush_lock: asyncio.Lock
+    _history_summary: Optional[HistorySummary]
 
     def __init__(
         self,
         data_dir: str = "data",
+        flush_interval_seconds: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+        flush_batch_size: int = DEFAULT_FLUSH_BATCH_SIZE,
+        is_fsync: bool = False,
+        hot_window_size: int = DEFAULT_HOT_WINDOW_SIZE,
     ):
         os.makedirs(data_dir, exist_ok=True)
+        self.data_dir = data_dir
         self.memories_file_path = os.path.join(data_dir, MEMORIES_FILE)
+        self.history_summary_file_path = os.path.join(data_dir, HISTORY_SUMMARY_FILE)
+
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_batch_size = flush_batch_size
+        self.is_fsync = is_fsync
+        self.hot_window_size = hot_window_size
+
+        self.archive = MemoryArchive(data_dir)
+
+        self._pending_memories = []
+        self._flush_tasks = set()
+        self._flush_lock = asyncio.Lock()
+        self._history_summary = None
 
         if not os.path.exists(self.memories_file_path):
             with open(self.memories_file_path, "w", encoding="utf-8") as f:
                 f.write(json.dumps([]))
 
     async def _get_memories(self) -> List[Memory]:
+        # Lock, so memories that are being written are not missed
+        async with self._flush_lock:
+            return await self._get_stored_memories() + self._pending_memories
+
+    async def _get_stored_memories(self) -> List[Memory]:
         try:
-            content = await _read_json_list(self.memories_file_path)
+            content = await file_utils.read_json(self.memories_file_path)
             return [Memory.from_dict(c) for c in content]
         except Exception:
             return []
@@ -45,28 +96,135 @@ class DatabaseClient:
             return []
 
     async def get_latest_tweet(self) -> Optional[Memory]:
-        tweets = await self.get_tweets()
-        if not tweets:
-            return None
-        return tweets[-1]
+        summary = await self.get_history_summary()
+        return summary.latest_tweet
+
+    async def get_history_summary(self) -> HistorySummary:
+        if not self._history_summary:
+            self._history_summary = await self._load_history_summary()
+        return self._history_summary
+
+    async def get_archived_memories(
+        self,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[Memory]:
+        return await self.archive.get_memories(start_timestamp, end_timestamp)
+
+    async def get_quoted_tweet_ids(self) -> Set[str]:
+        """
+        IDs of all the tweets ever quoted, including archived ones
+        """
+        summary = await self.get_history_summary()
+        return summary.quoted_tweet_ids
+
+    async def is_replied_to(self, tweet_id: str) -> bool:
+        """
+        True if the tweet was already replied to, including archived replies
+        """
+        summary = await self.get_history_summary()
+        return tweet_id in summary.replied_to_ids
 
     async def add_memory(self, memory: Memory) -> None:
+        """
+        Buffers the memory, it is written to the file in a batch with other memories
+        """
+        summary = await self.get_history_summary()
+        self._pending_memories.append(memory)
+        summary.add(memory)
+        if len(self._pending_memories) >= self.flush_batch_size:
+            self._schedule_flush(0)
+        else:
+            self._schedule_flush(self.flush_interval_seconds)
+
+    async def flush(self) -> bool:
+        """
+        Returns False if the pending memories could not be saved
+        """
+        async with self._flush_lock:
+            if not self._pending_memories:
+                return True
+            pending_memories = self._pending_memories
+            self._pending_memories = []
+            try:
+                memories = await self._get_stored_memories()
+                memories.extend(pending_memories)
+                if len(memories) > self.hot_window_size + ARCHIVE_BATCH_SIZE:
+                    archived_count = len(memories) - self.hot_window_size
+                    await self.archive.add_memories(memories[:archived_count])
+                    memories = memories[archived_count:]
+                memories_dict = [m.to_dict() for m in memories]
+                await file_utils.write_json(
+                    self.memories_file_path, memories_dict, is_fsync=self.is_fsync
+                )
+                await self._save_history_summary()
+                logger.debug(f"Saved {len(pending_memories)} memories")
+            except Exception:
+                logger.error("Failed to save memories", exc_info=True)
+                # Keep them for the next flush
+                self._pending_memories = pending_memories + self._pending_memories
+                self._schedule_flush(self.flush_interval_seconds)
+                return False
+            return True
+
+    async def close(self) -> None:
+        """
+        Has to be called on shutdown, otherwise the pending memories are lost
+        """
+        for task in list(self._flush_tasks):
+            task.cancel()
+        await self.flush()
+
+    async def _load_history_summary(self) -> HistorySummary:
         try:
-            memories = await self._get_memories()
-            memories.append(memory)
-            memories_dict = [m.to_dict() for m in memories]
-            await _write_json(self.memories_file_path, memories_dict)
+            if os.path.exists(self.history_summary_file_path):
+                content = await file_utils.read_json(self.history_summary_file_path)
+                # Only valid if memories.json was not written after the summary
+                if (
+                    content.get("version") == HISTORY_SUMMARY_VERSION
+                    and content.get("memories_file_stat")
+                    == self._get_memories_file_stat()
+                ):
+                    summary = HistorySummary.from_dict(content["summary"])
+                    for memory in self._pending_memories:
+                        summary.add(memory)
+                    return summary
         except Exception:
-            logger.error("Failed to get memories", exc_info=True)
-            return None
-
-
-async def _read_json_list(file_path: str) -> List[Dict]:
-    async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-        content = await f.read()
-        return json.loads(content)
-
-
-async def _write_json(file_path: str, content: Union[List, Dict]) -> None:
-    async with aiofiles.open(file_path, "w", encoding="utf-8") as f:
-        await f.write(json.dumps(content, indent=4))
+            logger.error("Failed to load history summary, rebuilding", exc_info=True)
+        logger.info("Building history summary from memories")
+        return HistorySummary.build(
+            await self._get_memories(),
+            await self.archive.get_quoted_tweet_ids(),
+            await self.archive.get_replied_to_ids(),
+        )
+
+    async def _save_history_summary(self) -> None:
+        if not self._history_summary:
+            return
+        await file_utils.write_json(
+            self.history_summary_file_path,
+            {
+                "version": HISTORY_SUMMARY_VERSION,
+                "memories_file_stat": self._get_memories_file_stat(),
+                "summary": self._history_summary.to_dict(),
+            },
+        )
+
+    def _get_memories_file_stat(self) -> List[int]:
+        stat = os.stat(self.memories_file_path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _schedule_flush(self, delay_seconds: float) -> None:
+        if delay_seconds and self._flush_tasks:
+            # A flush is already scheduled, it will include this memory too
+            return
+        task = asyncio.create_task(self._flush_after(delay_seconds))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush_after(self, delay_seconds: float) -> None:
+        await asyncio.sleep(delay_seconds)
+        # Not scheduled anymore, memories added during the write need a new flush
+        self._flush_tasks.discard(asyncio.current_task())  # type: ignore
+        # Cancelling a scheduled flush must not interrupt a write in progress
+        await asyncio.shield(self.flush())
@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Literal
+from typing import Optional
+from typing import Tuple
+
+from galadriel.entities import Message
+from galadriel.logging_utils import get_agent_logger
+from src import utils
+from src.connectors.resilience import CircuitOpenError
+from src.connectors.resilience import NoResultError
+from src.repository import file_utils
+
+logger = get_agent_logger()
+
+DEAD_LETTERS_FILE = "dead_letters.json"
+
+RETRY_BASE_DELAY_SECONDS = 30
+RETRY_MAX_DELAY_SECONDS = 30 * 60
+MAX_ATTEMPTS = 6
+# Finished entries are kept this long, so they can still be inspected and replayed
+DONE_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+ErrorClass = Literal["transient", "permanent"]
+DeadLetterStatus = Literal["pending", "done", "failed"]
+
+_transient_errors: Optional[Tuple[type, ...]] = None
+
+
+@dataclass
+class DeadLetter:
+    key: str
+    message: Message
+    status: DeadLetterStatus
+    error_class: ErrorClass
+    error: str
+    created_at: int
+    attempts: int = 1
+    next_attempt_at: int = 0
+    updated_at: int = 0
+
+    @staticmethod
+    def from_dict(data: Dict) -> "DeadLetter":
+        return DeadLetter(
+            key=data["key"],
+            message=Message(**data["message"]),
+            status=data["status"],
+            error_class=data["error_class"],
+            error=data["error"],
+            created_at=data["created_at"],
+            attempts=data.get("attempts", 1),
+            next_attempt_at=data.get("next_attempt_at", 0),
+            updated_at=data.get("updated_at", 0),
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "key": self.key,
+            "message": self.message.model_dump(),
+            "status": self.status,
+            "error_class": self.error_class,
+            "error": self.error,
+            "created_at": self.created_at,
+            "attempts": self.attempts,
+            "next_attempt_at": self.next_attempt_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class DeadLetterStore:
+    """
+    Events the agent failed to handle. Transient failures are retried with
+    backoff, permanent ones are kept until they are replayed with dead_letters.py
+    The file is reloaded when it is changed by another process, eg the CLI.
+    """
+
+    file_path: str
+
+    _entries: Optional[Dict[str, DeadLetter]]
+    _file_stat: Optional[Tuple[int, int]]
+
+    def __init__(self, data_dir: str = "data"):
+        os.makedirs(data_dir, exist_ok=True)
+        self.file_path = os.path.join(data_dir, DEAD_LETTERS_FILE)
+        self._entries = None
+        self._file_stat = None
+
+    async def add(self, message: Message, error: BaseException) -> DeadLetter:
+        """
+        Records a failed event, an event that failed before counts as another attempt
+        """
+        entries = await self._get_entries()
+        now = utils.get_current_timestamp()
+        key = get_message_key(message)
+        entry = entries.get(key)
+        if entry and entry.status == "pending":
+            entry.attempts += 1
+        else:
+            entry = DeadLetter(
+                key=key,
+                message=message,
+                status="pending",
+                error_class="transient",
+                error="",
+                created_at=now,
+            )
+            entries[key] = entry
+        entry.error_class = classify_error(error)
+        entry.error = f"{type(error).__name__}: {error}"
+        entry.updated_at = now
+        if entry.error_class == "permanent" or entry.attempts >= MAX_ATTEMPTS:
+            entry.status = "failed"
+            logger.error(
+                f"Event {message.type} failed with a {entry.error_class} error "
+                f"after {entry.attempts} attempts, not retrying"
+            )
+        else:
+            delay = _get_retry_delay(entry.attempts)
+            entry.next_attempt_at = now + delay
+            logger.info(f"Event {message.type} failed, retrying in {delay} seconds")
+        await self._save()
+        return entry
+
+    async def get_due_entries(self) -> List[DeadLetter]:
+        entries = await self._get_entries()
+        now = utils.get_current_timestamp()
+        return [
+            e
+            for e in entries.values()
+            if e.status == "pending" and e.next_attempt_at <= now
+        ]
+
+    async def mark_requeued(self, entry: DeadLetter) -> None:
+        """
+        The event is queued again, it is not picked up again before the next
+        retry delay has passed, in case the retry never finishes
+        """
+        entry.next_attempt_at = utils.get_current_timestamp() + _get_retry_delay(
+            entry.attempts
+        )
+        await self._save()
+
+    async def mark_done(self, message: Message) -> None:
+        """
+        Called for every handled event, only events that failed before are stored
+        """
+        entries = await self._get_entries()
+        entry = entries.get(get_message_key(message))
+        if entry and entry.status == "pending":
+            entry.status = "done"
+            entry.updated_at = utils.get_current_timestamp()
+            logger.info(
+                f"Event {message.type} succeeded after {entry.attempts} attempts"
+            )
+            await self._save()
+
+    async def get_entries(
+        self, status: Optional[DeadLetterStatus] = None
+    ) -> List[DeadLetter]:
+        entries = await self._get_entries()
+        return [e for e in entries.values() if not status or e.status == status]
+
+    async def replay(self, keys: List[str]) -> List[DeadLetter]:
+        """
+        Resets the entries so they are retried right away with all the attempts
+        """
+        entries = await self._get_entries()
+        replayed = []
+        for key in keys:
+            if entry := entries.get(key):
+                entry.status = "pending"
+                entry.attempts = 0
+                entry.next_attempt_at = 0
+                entry.updated_at = utils.get_current_timestamp()
+                replayed.append(entry)
+        await self._save()
+        return replayed
+
+    async def _get_entries(self) -> Dict[str, DeadLetter]:
+        file_stat = self._get_file_stat()
+        if self._entries is None or file_stat != self._file_stat:
+            self._file_stat = file_stat
+            self._entries = await self._read_entries() if file_stat else {}
+        return self._entries
+
+    async def _read_entries(self) -> Dict[str, DeadLetter]:
+        entries: Dict[str, DeadLetter] = {}
+        try:
+            content = await file_utils.read_json(self.file_path)
+            for entry_dict in content:
+                entry = DeadLetter.from_dict(entry_dict)
+                entries[entry.key] = entry
+        except Exception:
+            logger.error("Failed to read dead letters", exc_info=True)
+        return entries
+
+    async def _save(self) -> None:
+        if self._entries is None:
+            self._entries = {}
+        entries = self._entries
+        if self._get_file_stat() not in (None, self._file_stat):
+            # Changed by another process since it was read, eg replayed with the
+            # CLI, the latest update of every entry is kept
+            for key, stored_entry in (await self._read_entries()).items():
+                entry = entries.get(key)
+                if not entry or stored_entry.updated_at > entry.updated_at:
+                    entries[key] = stored_entry
+        now = utils.get_current_timestamp()
+        for key, entry in list(entries.items()):
+            if (
+                entry.status != "pending"
+                and now - entry.updated_at > DONE_RETENTION_SECONDS
+            ):
+                del entries[key]
+        try:
+            await file_utils.write_json(
+                self.file_path, [e.to_dict() for e in entries.values()]
+            )
+            self._file_stat = self._get_file_stat()
+        except Exception:
+            logger.error("Failed to save dead letters", exc_info=True)
+
+    def _get_file_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.file_path)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+
+def get_transient_errors() -> Tuple[type, ...]:
+    """
+    Provider outages, timeouts and rate limits, retrying later is likely to work.
+    The connector modules are imported on first use, the CLI does not need them.
+    """
+    global _transient_errors  # pylint:disable=W0603
+    if _transient_errors is None:
+        import aiohttp  # pylint:disable=C0415
+        import openai  # pylint:disable=C0415
+        import requests  # pylint:disable=C0415
+
+        _transient_errors = (
+            asyncio.TimeoutError,
+            TimeoutError,
+            ConnectionError,
+            CircuitOpenError,
+            NoResultError,
+            aiohttp.ClientError,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            openai.APIConnectionError,
+            openai.RateLimitError,
+            openai.InternalServerError,
+        )
+    return _transient_errors
+
+
+def classify_error(error: BaseException) -> ErrorClass:
+    if isinstance(error, get_transient_errors()):
+        return "transient"
+    return "permanent"
+
+
+def get_message_key(message: Message) -> str:
+    content = json.dumps(
+        [
+            message.type,
+            message.conversation_id,
+            message.content,
+            message.additional_kwargs,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+def _get_retry_delay(attempts: int) -> int:
+    return min(
+        RETRY_BASE_DELAY_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_DELAY_SECONDS
+    )
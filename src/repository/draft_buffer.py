@@ -0,0 +1,131 @@
+import os
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from galadriel.logging_utils import get_agent_logger
+from src import utils
+from src.models import TwitterPost
+from src.quotes import rank_quote_candidates
+from src.repository import file_utils
+from src.repository.history_summary import HistorySummary
+
+logger = get_agent_logger()
+
+DRAFTS_FILE = "drafts.json"
+
+
+@dataclass
+class Draft:
+    post: TwitterPost
+    created_at: int
+    # Prompt state the draft was generated with
+    topics: List[str]
+    search_topic: Optional[str]
+
+    @staticmethod
+    def from_dict(data: Dict) -> "Draft":
+        return Draft(
+            post=TwitterPost.from_dict(data["post"]),
+            created_at=data["created_at"],
+            topics=data.get("topics") or [],
+            search_topic=data.get("search_topic"),
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "post": self.post.to_dict(),
+            "created_at": self.created_at,
+            "topics": self.topics,
+            "search_topic": self.search_topic,
+        }
+
+
+class DraftBuffer:
+    """
+    Original tweets generated ahead of their posting time
+    """
+
+    file_path: str
+    max_age_seconds: int
+
+    _drafts: Optional[List[Draft]]
+
+    def __init__(self, data_dir: str, max_age_seconds: int):
+        os.makedirs(data_dir, exist_ok=True)
+        self.file_path = os.path.join(data_dir, DRAFTS_FILE)
+        self.max_age_seconds = max_age_seconds
+        self._drafts = None
+
+    async def get_count(self) -> int:
+        return len(await self._get_drafts())
+
+    async def add(self, post: TwitterPost) -> None:
+        drafts = await self._get_drafts()
+        drafts.append(
+            Draft(
+                post=post,
+                created_at=utils.get_current_timestamp(),
+                topics=post.topics or [],
+                search_topic=post.search_topic,
+            )
+        )
+        await self._save()
+        logger.info(f"Saved tweet draft, {len(drafts)} drafts in buffer")
+
+    async def pop_valid(self, summary: HistorySummary) -> Optional[Draft]:
+        """
+        Returns the oldest draft that is still fresh and does not repeat recent
+        tweets, drafts that are no longer valid are dropped
+        """
+        drafts = await self._get_drafts()
+        result = None
+        while drafts and not result:
+            draft = drafts.pop(0)
+            if reason := self._get_invalid_reason(draft, summary):
+                logger.info(f"Dropping tweet draft: {reason}")
+            else:
+                result = draft
+        await self._save()
+        return result
+
+    def _get_invalid_reason(
+        self, draft: Draft, summary: HistorySummary
+    ) -> Optional[str]:
+        age_seconds = utils.get_current_timestamp() - draft.created_at
+        if age_seconds > self.max_age_seconds:
+            return f"too old, generated {int(age_seconds / 60)} minutes ago"
+        text = _normalize(draft.post.text)
+        if any(_normalize(t.text) == text for t in summary.recent_tweets):
+            return "same text was already posted"
+        if quoted_tweet_id := draft.post.quoted_tweet_id:
+            exclusions = rank_quote_candidates.get_exclusions(summary)
+            if quoted_tweet_id in exclusions.quoted_ids or exclusions.is_excluded_user(
+                draft.post.quoted_tweet_username or ""
+            ):
+                return "quoted tweet or user was quoted recently"
+        return None
+
+    async def _get_drafts(self) -> List[Draft]:
+        if self._drafts is None:
+            self._drafts = []
+            if os.path.exists(self.file_path):
+                try:
+                    content = await file_utils.read_json(self.file_path)
+                    self._drafts = [Draft.from_dict(d) for d in content]
+                except Exception:
+                    logger.error("Failed to read tweet drafts", exc_info=True)
+        return self._drafts
+
+    async def _save(self) -> None:
+        try:
+            await file_utils.write_json(
+                self.file_path, [d.to_dict() for d in await self._get_drafts()]
+            )
+        except Exception:
+            logger.error("Failed to save tweet drafts", exc_info=True)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
@@ -0,0 +1,50 @@
+import json
+import os
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Union
+
+import aiofiles
+
+try:
+    import orjson
+
+    _HAS_ORJSON = True
+except ImportError:  # Optional, install with the "speedups" extra
+    _HAS_ORJSON = False
+
+
+def loads(content: Union[str, bytes]) -> Any:
+    if _HAS_ORJSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dumps(content: Any, is_indent: bool = False) -> bytes:
+    if _HAS_ORJSON:
+        return orjson.dumps(content, option=orjson.OPT_INDENT_2 if is_indent else 0)
+    return json.dumps(content, indent=2 if is_indent else None).encode("utf-8")
+
+
+async def read_json(file_path: str) -> Any:
+    async with aiofiles.open(file_path, "rb") as f:
+        content = await f.read()
+        return loads(content)
+
+
+async def write_json(
+    file_path: str, content: Union[List, Dict], is_fsync: bool = False
+) -> None:
+    await write_bytes(file_path, dumps(content, is_indent=True), is_fsync)
+
+
+async def write_bytes(file_path: str, content: bytes, is_fsync: bool = False) -> None:
+    # Write to a temporary file first, so a crash never leaves a half written file
+    tmp_file_path = file_path + ".tmp"
+    async with aiofiles.open(tmp_file_path, "wb") as f:
+        await f.write(content)
+        if is_fsync:
+            await f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_file_path, file_path)
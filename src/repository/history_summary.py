@@ -0,0 +1,101 @@
+from collections import deque
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+
+from src.models import Memory
+
+RECENT_TWEETS_COUNT = 10
+RECENT_SEARCH_TOPICS_COUNT = 7
+RECENT_QUOTED_USERS_COUNT = 10
+
+
+class HistorySummary:
+    """
+    Facts about the tweet history needed on every prompt, updated on every new
+    memory, so nothing has to walk the full history. All the lists are oldest first.
+    """
+
+    recent_tweets: Deque[Memory]
+    latest_original_tweet: Optional[Memory]
+    recent_search_topics: Deque[str]
+    recent_quoted_users: Deque[str]
+    quoted_tweet_ids: Set[str]
+    # Tweets that were already replied to
+    replied_to_ids: Set[str]
+
+    def __init__(self):
+        self.recent_tweets = deque(maxlen=RECENT_TWEETS_COUNT)
+        self.latest_original_tweet = None
+        self.recent_search_topics = deque(maxlen=RECENT_SEARCH_TOPICS_COUNT)
+        self.recent_quoted_users = deque(maxlen=RECENT_QUOTED_USERS_COUNT)
+        self.quoted_tweet_ids = set()
+        self.replied_to_ids = set()
+
+    @property
+    def latest_tweet(self) -> Optional[Memory]:
+        if not self.recent_tweets:
+            return None
+        return self.recent_tweets[-1]
+
+    def add(self, memory: Memory) -> None:
+        if memory.type != "tweet":
+            return
+        self.recent_tweets.append(memory)
+        if memory.reply_to_id:
+            self.replied_to_ids.add(memory.reply_to_id)
+        else:
+            self.latest_original_tweet = memory
+        if memory.search_topic:
+            self.recent_search_topics.append(memory.search_topic)
+        if memory.quoted_tweet_username:
+            self.recent_quoted_users.append(memory.quoted_tweet_username)
+        if memory.quoted_tweet_id:
+            self.quoted_tweet_ids.add(memory.quoted_tweet_id)
+
+    @staticmethod
+    def build(
+        memories: Iterable[Memory],
+        archived_quoted_tweet_ids: Iterable[str] = (),
+        archived_replied_to_ids: Iterable[str] = (),
+    ) -> "HistorySummary":
+        summary = HistorySummary()
+        summary.quoted_tweet_ids.update(archived_quoted_tweet_ids)
+        summary.replied_to_ids.update(archived_replied_to_ids)
+        for memory in memories:
+            summary.add(memory)
+        return summary
+
+    @staticmethod
+    def from_dict(data: Dict) -> "HistorySummary":
+        summary = HistorySummary()
+        summary.recent_tweets.extend(
+            Memory.from_dict(m) for m in data.get("recent_tweets", [])
+        )
+        if latest_original_tweet := data.get("latest_original_tweet"):
+            summary.latest_original_tweet = Memory.from_dict(latest_original_tweet)
+        summary.recent_search_topics.extend(data.get("recent_search_topics", []))
+        summary.recent_quoted_users.extend(data.get("recent_quoted_users", []))
+        summary.quoted_tweet_ids.update(data.get("quoted_tweet_ids", []))
+        summary.replied_to_ids.update(data.get("replied_to_ids", []))
+        return summary
+
+    def to_dict(self) -> Dict:
+        return {
+            "recent_tweets": [m.to_dict() for m in self.recent_tweets],
+            "latest_original_tweet": (
+                self.latest_original_tweet.to_dict()
+                if self.latest_original_tweet
+                else None
+            ),
+            "recent_search_topics": list(self.recent_search_topics),
+            "recent_quoted_users": list(self.recent_quoted_users),
+            "quoted_tweet_ids": sorted(self.quoted_tweet_ids),
+            "replied_to_ids": sorted(self.replied_to_ids),
+        }
+
+    def get_recent_tweets(self, count: int = RECENT_TWEETS_COUNT) -> List[Memory]:
+        return list(self.recent_tweets)[-count:]
@@ -0,0 +1,148 @@
+import datetime
+import gzip
+import os
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+
+import aiofiles
+
+from galadriel.logging_utils import get_agent_logger
+from src.models import Memory
+from src.repository import file_utils
+
+logger = get_agent_logger()
+
+ARCHIVE_DIR = "archive"
+INDEX_FILE = "index.json"
+SEGMENT_FILE_PREFIX = "memories-"
+SEGMENT_FILE_SUFFIX = ".json.gz"
+INDEX_KEYS = ["quoted_tweet_ids", "replied_to_ids"]
+
+
+class MemoryArchive:
+    """
+    Old memories, compressed and partitioned by month: archive/memories-YYYY-MM.json.gz
+    The index keeps what is needed for dedup without opening the segments.
+    """
+
+    archive_dir: str
+    index_file_path: str
+
+    # Dedup ids of all the archived memories, by index key
+    _index: Optional[Dict[str, Set[str]]]
+
+    def __init__(self, data_dir: str = "data"):
+        self.archive_dir = os.path.join(data_dir, ARCHIVE_DIR)
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self.index_file_path = os.path.join(self.archive_dir, INDEX_FILE)
+        self._index = None
+
+    async def add_memories(self, memories: List[Memory]) -> None:
+        partitions: Dict[str, List[Memory]] = {}
+        for memory in memories:
+            partitions.setdefault(_get_partition(memory.timestamp), []).append(memory)
+        for partition, partition_memories in partitions.items():
+            segment = await self._read_segment(partition)
+            # Memories archived before a crash are still in memories.json, skip them
+            archived_keys = {_get_memory_key(m) for m in segment}
+            segment.extend(
+                m.to_dict()
+                for m in partition_memories
+                if _get_memory_key(m.to_dict()) not in archived_keys
+            )
+            await self._write_segment(partition, segment)
+
+        index = await self._get_index()
+        index["quoted_tweet_ids"].update(
+            m.quoted_tweet_id for m in memories if m.quoted_tweet_id
+        )
+        index["replied_to_ids"].update(
+            m.reply_to_id for m in memories if m.type == "tweet" and m.reply_to_id
+        )
+        await file_utils.write_json(
+            self.index_file_path, {key: sorted(ids) for key, ids in index.items()}
+        )
+        logger.info(f"Archived {len(memories)} memories")
+
+    async def get_memories(
+        self,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[Memory]:
+        """
+        Archived memories in [start_timestamp, end_timestamp), only the segments
+        overlapping the range are read
+        """
+        start_partition = _get_partition(start_timestamp) if start_timestamp else ""
+        end_partition = _get_partition(end_timestamp) if end_timestamp else "~"
+        memories: List[Memory] = []
+        for partition in self.get_partitions():
+            if not start_partition <= partition <= end_partition:
+                continue
+            for memory_dict in await self._read_segment(partition):
+                memory = Memory.from_dict(memory_dict)
+                if start_timestamp and memory.timestamp < start_timestamp:
+                    continue
+                if end_timestamp and memory.timestamp >= end_timestamp:
+                    continue
+                memories.append(memory)
+        return memories
+
+    async def get_quoted_tweet_ids(self) -> Set[str]:
+        return (await self._get_index())["quoted_tweet_ids"]
+
+    async def get_replied_to_ids(self) -> Set[str]:
+        """
+        IDs of the tweets the archived memories are replies to
+        """
+        return (await self._get_index())["replied_to_ids"]
+
+    async def _get_index(self) -> Dict[str, Set[str]]:
+        if self._index is None:
+            content = {}
+            if os.path.exists(self.index_file_path):
+                try:
+                    content = await file_utils.read_json(self.index_file_path)
+                except Exception:
+                    logger.error("Failed to read memory archive index", exc_info=True)
+            self._index = {key: set(content.get(key, [])) for key in INDEX_KEYS}
+        return self._index
+
+    def get_partitions(self) -> List[str]:
+        return sorted(
+            file_name[len(SEGMENT_FILE_PREFIX) : -len(SEGMENT_FILE_SUFFIX)]
+            for file_name in os.listdir(self.archive_dir)
+            if file_name.startswith(SEGMENT_FILE_PREFIX)
+            and file_name.endswith(SEGMENT_FILE_SUFFIX)
+        )
+
+    def _get_segment_path(self, partition: str) -> str:
+        return os.path.join(
+            self.archive_dir, f"{SEGMENT_FILE_PREFIX}{partition}{SEGMENT_FILE_SUFFIX}"
+        )
+
+    async def _read_segment(self, partition: str) -> List[Dict]:
+        file_path = self._get_segment_path(partition)
+        if not os.path.exists(file_path):
+            return []
+        async with aiofiles.open(file_path, "rb") as f:
+            content = await f.read()
+        return file_utils.loads(gzip.decompress(content))
+
+    async def _write_segment(self, partition: str, segment: List[Dict]) -> None:
+        await file_utils.write_bytes(
+            self._get_segment_path(partition),
+            gzip.compress(file_utils.dumps(segment)),
+        )
+
+
+def _get_memory_key(memory_dict: Dict) -> str:
+    return f"{memory_dict['type']}:{memory_dict['id']}:{memory_dict['timestamp']}"
+
+
+def _get_partition(timestamp: int) -> str:
+    return datetime.datetime.fromtimestamp(
+        timestamp, tz=datetime.timezone.utc
+    ).strftime("%Y-%m")
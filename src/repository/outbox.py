@@ -0,0 +1,169 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Literal
+from typing import Optional
+from typing import Set
+
+from galadriel.logging_utils import get_agent_logger
+from src import utils
+from src.models import TwitterPost
+from src.repository import file_utils
+
+logger = get_agent_logger()
+
+OUTBOX_FILE = "outbox.json"
+
+RETRY_BASE_DELAY_SECONDS = 60
+RETRY_MAX_DELAY_SECONDS = 60 * 60
+MAX_ATTEMPTS = 8
+# Finished entries are kept this long, to catch duplicates
+DONE_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+
+@dataclass
+class OutboxEntry:
+    content_hash: str
+    post: TwitterPost
+    status: Literal["pending", "done", "failed"]
+    created_at: int
+    attempts: int = 0
+    next_attempt_at: int = 0
+    last_error: Optional[str] = None
+    tweet_id: Optional[str] = None
+
+    @staticmethod
+    def from_dict(data: Dict) -> "OutboxEntry":
+        return OutboxEntry(
+            content_hash=data["content_hash"],
+            post=TwitterPost.from_dict(data["post"]),
+            status=data["status"],
+            created_at=data["created_at"],
+            attempts=data.get("attempts", 0),
+            next_attempt_at=data.get("next_attempt_at", 0),
+            last_error=data.get("last_error"),
+            tweet_id=data.get("tweet_id"),
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "content_hash": self.content_hash,
+            "post": self.post.to_dict(),
+            "status": self.status,
+            "created_at": self.created_at,
+            "attempts": self.attempts,
+            "next_attempt_at": self.next_attempt_at,
+            "last_error": self.last_error,
+            "tweet_id": self.tweet_id,
+        }
+
+
+class Outbox:
+    """
+    Generated posts are recorded here before they are sent, so a failed post is
+    retried later instead of generating a new one
+    """
+
+    file_path: str
+
+    _entries: Optional[Dict[str, OutboxEntry]]
+    # Entries being sent for the first time, only retried after they have failed
+    _in_flight: Set[str]
+
+    def __init__(self, data_dir: str = "data"):
+        os.makedirs(data_dir, exist_ok=True)
+        self.file_path = os.path.join(data_dir, OUTBOX_FILE)
+        self._entries = None
+        self._in_flight = set()
+
+    async def add(self, post: TwitterPost) -> Optional[OutboxEntry]:
+        """
+        Returns None if the same post is already in the outbox
+        """
+        entries = await self._get_entries()
+        content_hash = get_content_hash(post)
+        if existing_entry := entries.get(content_hash):
+            logger.info(
+                f"Post already in outbox with status {existing_entry.status}, skipping"
+            )
+            return None
+        entry = OutboxEntry(
+            content_hash=content_hash,
+            post=post,
+            status="pending",
+            created_at=utils.get_current_timestamp(),
+        )
+        entries[content_hash] = entry
+        self._in_flight.add(content_hash)
+        await self._save()
+        return entry
+
+    async def get_due_entries(self) -> List[OutboxEntry]:
+        entries = await self._get_entries()
+        now = utils.get_current_timestamp()
+        return [
+            e
+            for e in entries.values()
+            if e.status == "pending"
+            and e.next_attempt_at <= now
+            and e.content_hash not in self._in_flight
+        ]
+
+    async def mark_done(self, entry: OutboxEntry, tweet_id: Optional[str]) -> None:
+        self._in_flight.discard(entry.content_hash)
+        entry.status = "done"
+        entry.tweet_id = tweet_id
+        entry.last_error = None
+        await self._save()
+
+    async def mark_failed(self, entry: OutboxEntry, error: str) -> None:
+        self._in_flight.discard(entry.content_hash)
+        entry.attempts += 1
+        entry.last_error = error
+        if entry.attempts >= MAX_ATTEMPTS:
+            entry.status = "failed"
+            logger.error(f"Giving up posting after {entry.attempts} attempts")
+        else:
+            delay = min(
+                RETRY_BASE_DELAY_SECONDS * 2 ** (entry.attempts - 1),
+                RETRY_MAX_DELAY_SECONDS,
+            )
+            entry.next_attempt_at = utils.get_current_timestamp() + delay
+            logger.info(f"Retrying post in {delay} seconds")
+        await self._save()
+
+    async def _get_entries(self) -> Dict[str, OutboxEntry]:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.file_path):
+                try:
+                    content = await file_utils.read_json(self.file_path)
+                    for entry_dict in content:
+                        entry = OutboxEntry.from_dict(entry_dict)
+                        self._entries[entry.content_hash] = entry
+                except Exception:
+                    logger.error("Failed to read outbox", exc_info=True)
+        return self._entries
+
+    async def _save(self) -> None:
+        entries = await self._get_entries()
+        now = utils.get_current_timestamp()
+        for content_hash, entry in list(entries.items()):
+            if (
+                entry.status != "pending"
+                and now - entry.created_at > DONE_RETENTION_SECONDS
+            ):
+                del entries[content_hash]
+        try:
+            await file_utils.write_json(
+                self.file_path, [e.to_dict() for e in entries.values()]
+            )
+        except Exception:
+            logger.error("Failed to save outbox", exc_info=True)
+
+
+def get_content_hash(post: TwitterPost) -> str:
+    content = f"{post.reply_to_id or ''}\n{post.text}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
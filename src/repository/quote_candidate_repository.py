@@ -0,0 +1,36 @@
+import os
+from typing import Dict
+from typing import Optional
+
+from galadriel.logging_utils import get_agent_logger
+from src.repository import file_utils
+
+logger = get_agent_logger()
+
+QUOTE_CANDIDATES_FILE = "quote_candidates.json"
+
+
+class QuoteCandidateRepository:
+    file_path: str
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+    ):
+        os.makedirs(data_dir, exist_ok=True)
+        self.file_path = os.path.join(data_dir, QUOTE_CANDIDATES_FILE)
+
+    async def get(self) -> Optional[Dict]:
+        if not os.path.exists(self.file_path):
+            return None
+        try:
+            return await file_utils.read_json(self.file_path)
+        except Exception:
+            logger.error("Failed to read quote candidates", exc_info=True)
+            return None
+
+    async def save(self, data: Dict) -> None:
+        try:
+            await file_utils.write_json(self.file_path, data)
+        except Exception:
+            logger.error("Failed to save quote candidates", exc_info=True)
@@ -0,0 +1,140 @@
+import datetime
+import os
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from galadriel.logging_utils import get_agent_logger
+from src import utils
+from src.repository import file_utils
+
+logger = get_agent_logger()
+
+USAGE_FILE = "llm_usage.json"
+# Days of aggregates kept
+RETENTION_DAYS = 30
+
+# Day -> agent name -> task -> usage
+DailyUsage = Dict[str, Dict[str, Dict[str, "TaskUsage"]]]
+
+
+@dataclass
+class TaskUsage:
+    requests: int = 0
+    failures: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_seconds: float = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, usage: "TaskUsage") -> None:
+        self.requests += usage.requests
+        self.failures += usage.failures
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.latency_seconds += usage.latency_seconds
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @staticmethod
+    def from_dict(data: Dict) -> "TaskUsage":
+        return TaskUsage(**data)
+
+
+class UsageStore:
+    """
+    LLM token usage and latency per day, agent and task, kept for RETENTION_DAYS.
+    The file is reloaded when it is changed by another process sharing the data dir.
+    """
+
+    file_path: str
+
+    _days: Optional[DailyUsage]
+    _file_stat: Optional[Tuple[int, int]]
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+    ):
+        os.makedirs(data_dir, exist_ok=True)
+        self.file_path = os.path.join(data_dir, USAGE_FILE)
+        self._days = None
+        self._file_stat = None
+
+    async def add(self, agent_name: str, task: str, usage: TaskUsage) -> None:
+        # Reloaded if changed, the other processes' usage is not overwritten
+        days = await self.get_days()
+        day = get_day()
+        days.setdefault(day, {}).setdefault(agent_name, {}).setdefault(
+            task, TaskUsage()
+        ).add(usage)
+        min_day = get_day(utils.get_current_timestamp() - RETENTION_DAYS * 86400)
+        for expired_day in [d for d in days if d < min_day]:
+            del days[expired_day]
+        try:
+            await file_utils.write_json(
+                self.file_path,
+                {
+                    day: {
+                        agent: {task: u.to_dict() for task, u in tasks.items()}
+                        for agent, tasks in agents.items()
+                    }
+                    for day, agents in days.items()
+                },
+            )
+            self._file_stat = self._get_file_stat()
+        except Exception:
+            logger.error("Failed to save LLM usage", exc_info=True)
+
+    async def get_usage(
+        self, agent_name: str, day: Optional[str] = None
+    ) -> Dict[str, TaskUsage]:
+        """
+        Returns the usage of the agent by task, for today by default
+        """
+        days = await self.get_days()
+        return days.get(day or get_day(), {}).get(agent_name, {})
+
+    async def get_days(self) -> DailyUsage:
+        file_stat = self._get_file_stat()
+        if self._days is None or file_stat != self._file_stat:
+            self._days = {}
+            self._file_stat = file_stat
+            if file_stat:
+                try:
+                    data = await file_utils.read_json(self.file_path)
+                    self._days = {
+                        day: {
+                            agent: {
+                                task: TaskUsage.from_dict(u)
+                                for task, u in tasks.items()
+                            }
+                            for agent, tasks in agents.items()
+                        }
+                        for day, agents in data.items()
+                    }
+                except Exception:
+                    logger.error("Failed to read LLM usage", exc_info=True)
+        return self._days
+
+    def _get_file_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.file_path)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+
+def get_day(timestamp: Optional[int] = None) -> str:
+    # UTC, the budgets reset at midnight UTC
+    if timestamp is None:
+        timestamp = utils.get_current_timestamp()
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime(
+        "%Y-%m-%d"
+    )
@@ -9,21 +9,57 @@ from galadriel.entities import Message, PushOnlyQueue
 from galadriel.logging_utils import get_agent_logger
 from galadriel.tools.twitter import TwitterPostTool
 from galadriel.tools.twitter import TwitterRepliesTool
+from src import metrics
 from src import utils
+from src.connectors.connection_pool import ConnectionPool
+from src.connectors.connection_pool import ConnectionPoolConfig
+from src.connectors.llm_usage import LlmUsageTracker
 from src.models import Memory
 from src.models import TwitterAgentConfig
 from src.models import TwitterPost
+from src.priority_event_queue import DEFAULT_MAX_IN_FLIGHT_SECONDS
+from src.priority_event_queue import DEFAULT_MAX_SIZE
+from src.priority_event_queue import PriorityEventQueue
+from src.replies.adaptive_reply_poller import AdaptiveReplyPoller
+from src.replies.adaptive_reply_poller import AdaptiveReplyPollerConfig
+from src.replies.thread_cache import CachedTweet
+from src.replies.thread_cache import ThreadCache
 from src.repository.database import DatabaseClient
+from src.repository.dead_letter_store import DeadLetterStore
+from src.repository.draft_buffer import DraftBuffer
+from src.repository.outbox import Outbox
+from src.repository.outbox import OutboxEntry
 
 logger = get_agent_logger()
 
+# How often the outbox is checked for posts to retry
+OUTBOX_RETRY_INTERVAL_SECONDS = 60
+# How often failed events are checked for a retry
+DEAD_LETTER_RETRY_INTERVAL_SECONDS = 30
+
+# Original tweets are generated ahead of time, so posting does not wait for the LLM
+DEFAULT_DRAFTS_COUNT = 1
+DEFAULT_DRAFTS_LEAD_MINUTES = 60
+DEFAULT_DRAFTS_MAX_AGE_MINUTES = 6 * 60
+
 
 class TwitterClient(AgentInput, AgentOutput):
     agent: TwitterAgentConfig
 
-    event_queue: PushOnlyQueue
+    # Only set when the client is started as an input
+    event_queue: Optional[PriorityEventQueue]
+    _started: asyncio.Event
 
     database_client: DatabaseClient
+    connection_pool: ConnectionPool
+    outbox: Outbox
+    draft_buffer: DraftBuffer
+    dead_letter_store: DeadLetterStore
+    reply_poller: AdaptiveReplyPoller
+    # Shared with the reply agent, filled from the fetched replies
+    thread_cache: ThreadCache
+    # No new replies are scheduled when the LLM budget is used up
+    usage_tracker: Optional[LlmUsageTracker]
 
     twitter_post_tool: TwitterPostTool
     twitter_replies_tool: TwitterRepliesTool
@@ -31,6 +67,8 @@ class TwitterClient(AgentInput, AgentOutput):
     post_interval_minutes_min: int
     post_interval_minutes_max: int
     max_conversations_count_for_replies: int
+    drafts_count: int
+    drafts_lead_minutes: int
 
     def __init__(
         self,
@@ -39,33 +77,91 @@ class TwitterClient(AgentInput, AgentOutput):
         post_interval_minutes_min: int = 22 * 60,
         post_interval_minutes_max: int = 26 * 60,
         max_conversations_count_for_replies: int = 3,
+        connection_pool: Optional[ConnectionPool] = None,
+        dead_letter_store: Optional[DeadLetterStore] = None,
+        thread_cache: Optional[ThreadCache] = None,
+        usage_tracker: Optional[LlmUsageTracker] = None,
     ):
         self.agent = agent
+        self.usage_tracker = usage_tracker
         self.twitter_username = self.agent.extra_fields.get("twitter_profile", {}).get(
             "username", "user"
         )
 
-        self.twitter_post_tool = TwitterPostTool()
-        self.twitter_replies_tool = TwitterRepliesTool()
+        self.connection_pool = connection_pool or ConnectionPool(
+            ConnectionPoolConfig.from_settings(self.agent.settings)
+        )
+        self.twitter_post_tool = self.connection_pool.get_twitter_tool(TwitterPostTool)
+        self.twitter_replies_tool = self.connection_pool.get_twitter_tool(
+            TwitterRepliesTool
+        )
+
+        self.event_queue = None
+        self._started = asyncio.Event()
 
         self.database_client = database_client
+        self.outbox = Outbox(database_client.data_dir)
+        self.dead_letter_store = dead_letter_store or DeadLetterStore(
+            database_client.data_dir
+        )
+
+        drafts_settings = self.agent.settings.get("drafts", {})
+        self.drafts_count = drafts_settings.get("count", DEFAULT_DRAFTS_COUNT)
+        self.drafts_lead_minutes = drafts_settings.get(
+            "lead_minutes", DEFAULT_DRAFTS_LEAD_MINUTES
+        )
+        self.draft_buffer = DraftBuffer(
+            database_client.data_dir,
+            max_age_seconds=drafts_settings.get(
+                "max_age_minutes", DEFAULT_DRAFTS_MAX_AGE_MINUTES
+            )
+            * 60,
+        )
 
         self.post_interval_minutes_min = post_interval_minutes_min
         self.post_interval_minutes_max = post_interval_minutes_max
         self.max_conversations_count_for_replies = max_conversations_count_for_replies
+        self.thread_cache = thread_cache or ThreadCache()
+        self.reply_poller = AdaptiveReplyPoller(
+            AdaptiveReplyPollerConfig.from_settings(self.agent.settings)
+        )
 
     async def start(self, queue: PushOnlyQueue) -> None:
-        self.event_queue = queue
+        event_queue_settings = self.agent.settings.get("event_queue", {})
+        self.event_queue = PriorityEventQueue(
+            queue,
+            max_size=event_queue_settings.get("max_size", DEFAULT_MAX_SIZE),
+            max_in_flight_seconds=event_queue_settings.get(
+                "max_in_flight_seconds", DEFAULT_MAX_IN_FLIGHT_SECONDS
+            ),
+        )
+        self.event_queue.start()
+        self._started.set()
         # Should be configurable: which kind of flows to run
         asyncio.create_task(self._run_post_loop())
-        # asyncio.create_task(self._run_reply_loop())
+        asyncio.create_task(self._run_outbox_loop())
+        asyncio.create_task(self._run_dead_letter_loop())
+        if self.reply_poller.config.is_enabled:
+            asyncio.create_task(self._run_reply_loop())
+
+    async def send(self, request: Message, response: Message) -> None:
+        try:
+            await self._handle_response(response)
+        finally:
+            # The runtime is done with the event, the next one can be sent
+            if self.event_queue:
+                await self.event_queue.task_done(request)
 
-    async def send(self, _: Message, response: Message) -> None:
+    async def _handle_response(self, response: Message) -> None:
         response_type = response.type
         if not response_type or not response.additional_kwargs:
             return
         if response_type == "tweet":
             await self._post_tweet(TwitterPost.from_dict(response.additional_kwargs))
+        if response_type == "tweet_draft":
+            await self.draft_buffer.add(
+                TwitterPost.from_dict(response.additional_kwargs)
+            )
         if response_type == "tweet_excluded":
             twitter_post = TwitterPost.from_dict(response.additional_kwargs)
             await self.database_client.add_memory(
@@ -83,19 +179,16 @@ class TwitterClient(AgentInput, AgentOutput):
             )
 
     async def _run_post_loop(self) -> None:
-        tweets = await self.database_client.get_tweets()
-        latest_tweet: Optional[Memory] = None
-        for tweet in reversed(tweets):
-            if not tweet.reply_to_id:
-                latest_tweet = tweet
-                break
+        summary = await self.database_client.get_history_summary()
+        latest_tweet = summary.latest_original_tweet
         if last_tweet_timestamp := (latest_tweet and latest_tweet.timestamp):
             minutes_passed = int(
                 (utils.get_current_timestamp() - last_tweet_timestamp) / 60
             )
             if minutes_passed > self.post_interval_minutes_min:
                 logger.info(
-                    f"Last tweet happened {minutes_passed} minutes ago, generating new tweet immediately"
+                    "Last tweet happened %d minutes ago, generating new tweet immediately",
+                    minutes_passed,
                 )
             else:
                 sleep_time = random.randint(
@@ -103,43 +196,88 @@ class TwitterClient(AgentInput, AgentOutput):
                     self.post_interval_minutes_max - minutes_passed,
                 )
                 logger.info(
-                    f"Last tweet happened {minutes_passed} minutes ago, waiting for {sleep_time} minutes"
+                    "Last tweet happened %d minutes ago, waiting for %d minutes",
+                    minutes_passed,
+                    sleep_time,
                 )
-                await asyncio.sleep(sleep_time * 60)
+                await self._wait_for_post_slot(sleep_time)
 
         while True:
-            await self.event_queue.put(
-                Message(
-                    content="",
-                    type="tweet_original",
-                ),
-            )
+            await self._post_original_tweet()
             sleep_time = random.randint(
                 self.post_interval_minutes_min,
                 self.post_interval_minutes_max,
             )
-            logger.info(f"Next Tweet scheduled in {sleep_time} minutes.")
-            await asyncio.sleep(sleep_time * 60)
+            logger.info("Next Tweet scheduled in %d minutes.", sleep_time)
+            logger.info(
+                "Connection pool metrics: %s", self.connection_pool.get_metrics()
+            )
+            await self._wait_for_post_slot(sleep_time)
 
-    async def _run_reply_loop(self) -> None:
-        # sleep_time = random.randint(
-        #     int(self.post_interval_minutes_min / 4),
-        #     int(self.post_interval_minutes_max / 4),
-        # )
-        # await asyncio.sleep(sleep_time * 60)
+    async def _wait_for_post_slot(self, sleep_time_minutes: int) -> None:
+        lead_minutes = min(self.drafts_lead_minutes, sleep_time_minutes)
+        await asyncio.sleep((sleep_time_minutes - lead_minutes) * 60)
+        missing_drafts_count = self.drafts_count - await self.draft_buffer.get_count()
+        if lead_minutes and missing_drafts_count > 0:
+            logger.info("Generating %d tweet drafts", missing_drafts_count)
+            for i in range(missing_drafts_count):
+                await self.put_event(
+                    Message(content="", type="tweet_draft"),
+                    dedup_key=f"tweet_draft:{i}",
+                )
+        await asyncio.sleep(lead_minutes * 60)
 
+    async def _post_original_tweet(self) -> None:
+        summary = await self.database_client.get_history_summary()
+        if draft := await self.draft_buffer.pop_valid(summary):
+            logger.info("Posting pre-generated tweet draft")
+            await self._post_tweet(draft.post)
+            return
+        await self.put_event(
+            Message(
+                content="",
+                type="tweet_original",
+            ),
+            dedup_key="tweet_original",
+        )
+
+    async def put_event(self, message: Message, dedup_key: str) -> bool:
+        """
+        Queues an event for the agent, also used by the other inputs so all the
+        events are prioritised and deduplicated together
+        """
+        # Inputs started before this client wait for the event queue
+        await self._started.wait()
+        if not self.event_queue:
+            raise Exception("TwitterClient is not started")
+        return await self.event_queue.put(message, dedup_key=dedup_key)
+
+    async def is_replies_throttled(self) -> bool:
+        if not self.usage_tracker:
+            return False
+        if await self.usage_tracker.get_budget_state("reply") != "throttle":
+            return False
+        metrics.increment("llm.budget.throttled_polls")
+        return True
+
+    async def close(self) -> None:
+        if self.event_queue:
+            await self.event_queue.close()
+
+    async def _run_reply_loop(self) -> None:
         while True:
-            await self._get_replies()
-            sleep_time = random.randint(
-                int(self.post_interval_minutes_min / 4),
-                int(self.post_interval_minutes_max / 4),
-            )
-            logger.info(f"Next Tweet replies scheduled in {sleep_time} minutes.")
-            await asyncio.sleep(sleep_time * 60)
+            try:
+                await self._get_replies()
+            except Exception:
+                logger.error("Failed to get replies", exc_info=True)
+            sleep_seconds = self.reply_poller.get_sleep_seconds()
+            logger.info("Next Tweet replies check in %d seconds.", sleep_seconds)
+            await asyncio.sleep(sleep_seconds)
 
     async def _get_replies(self):
-        logger.info("Generating replies")
-
+        if await self.is_replies_throttled():
+            logger.info("LLM budget is used up, not checking for replies")
+            return
         # Get all conversations
         tweets = await self.database_client.get_tweets()
         conversations = []
@@ -155,61 +293,154 @@ class TwitterClient(AgentInput, AgentOutput):
                     and conversation_id != "dry_run"
                 ):
                     conversations.append(conversation_id)
+                    # The original tweet starts the cached thread
+                    self.thread_cache.add_tweet(
+                        conversation_id,
+                        CachedTweet(
+                            id=tweet.id,
+                            username=self.twitter_username,
+                            text=tweet.text,
+                            parent_id=None,
+                        ),
+                    )
             if len(conversations) > self.max_conversations_count_for_replies:
                 break
 
-        for conversation_id in conversations:
+        due_conversations = self.reply_poller.get_due_conversations(conversations)
+        if due_conversations:
+            logger.info("Getting replies for %d conversations", len(due_conversations))
+        summary = await self.database_client.get_history_summary()
+        for conversation_id in due_conversations:
             try:
                 replies = self.twitter_replies_tool(conversation_id)
             except Exception as e:
-                logger.error(f"Failed to get replies: {e}", exc_info=True)
-                continue
-
-            if not len(replies):
+                logger.error(
+                    "Failed to get replies: %s",
+                    e,
+                    exc_info=True,
+                    extra={"conversation_id": conversation_id},
+                )
                 continue
 
-            formatted_replies = [SearchResult.from_dict(r) for r in json.loads(replies)]
+            formatted_replies = (
+                [SearchResult.from_dict(r) for r in json.loads(replies)]
+                if replies
+                else []
+            )
+            self.reply_poller.record_poll(
+                conversation_id, [r.id for r in formatted_replies]
+            )
+            self.thread_cache.add_tweets(conversation_id, formatted_replies)
             reply_to_ids = []
             for reply in formatted_replies:
                 if reply.username == self.twitter_username:
                     continue
-                existing_response = [t for t in tweets if t.reply_to_id == reply.id]
-                if len(existing_response) or reply.id in reply_to_ids:
+                # Includes the replies that are only in the archive
+                if reply.id in summary.replied_to_ids or reply.id in reply_to_ids:
                     continue
                 reply_to_ids.append(reply.id)
-                await self.event_queue.put(
+                await self.put_event(
                     Message(
                         content="",
                         conversation_id=conversation_id,
                         type="tweet_reply",
                         additional_kwargs=reply.to_dict(),
-                    )
+                    ),
+                    dedup_key=f"tweet_reply:{conversation_id}:{reply.id}",
                 )
 
+    async def _run_outbox_loop(self) -> None:
+        while True:
+            for entry in await self.outbox.get_due_entries():
+                logger.info(
+                    "Retrying post from outbox, attempt: %d", entry.attempts + 1
+                )
+                await self._send_outbox_entry(entry)
+            await asyncio.sleep(OUTBOX_RETRY_INTERVAL_SECONDS)
+
+    async def _run_dead_letter_loop(self) -> None:
+        while True:
+            try:
+                await self._retry_dead_letters()
+            except Exception:
+                logger.error("Failed to retry dead letters", exc_info=True)
+            await asyncio.sleep(DEAD_LETTER_RETRY_INTERVAL_SECONDS)
+
+    async def _retry_dead_letters(self) -> None:
+        for entry in await self.dead_letter_store.get_due_entries():
+            logger.info(
+                "Retrying failed %s event, attempt: %d",
+                entry.message.type,
+                entry.attempts + 1,
+                extra={"dead_letter_key": entry.key},
+            )
+            await self.put_event(entry.message, dedup_key=f"dead_letter:{entry.key}")
+            await self.dead_letter_store.mark_requeued(entry)
+
     async def _post_tweet(self, twitter_post: TwitterPost) -> bool:
+        # Recorded before sending, so the post is not lost if sending fails
+        entry = await self.outbox.add(twitter_post)
+        if not entry:
+            return False
+        return await self._send_outbox_entry(entry)
+
+    async def _send_outbox_entry(self, entry: OutboxEntry) -> bool:
+        twitter_post = entry.post
         try:
             twitter_response = self.twitter_post_tool(
                 twitter_post.text, twitter_post.reply_to_id or ""
             )
-        except Exception:
+        except Exception as e:
+            if _is_duplicate_content_error(e):
+                # A previous attempt got through, but the response was lost
+                logger.info("Tweet was already posted, marking it as done")
+                await self._mark_posted(entry, None)
+                return True
             logger.error("Failed to post tweet", exc_info=True)
+            await self.outbox.mark_failed(entry, str(e))
             return False
         if tweet_id := (
             twitter_response and twitter_response.get("data", {}).get("id")
         ):
-            logger.debug(f"Tweet ID: {tweet_id}")
-            await self.database_client.add_memory(
-                Memory(
-                    id=tweet_id,
-                    conversation_id=twitter_post.conversation_id or tweet_id,
-                    type="tweet",
-                    text=twitter_post.text,
-                    topics=[],
-                    timestamp=utils.get_current_timestamp(),
-                    search_topic=twitter_post.search_topic,
-                    quoted_tweet_id=twitter_post.quoted_tweet_id,
-                    quoted_tweet_username=twitter_post.quoted_tweet_username,
-                    reply_to_id=twitter_post.reply_to_id,
-                )
-            )
+            logger.debug("Tweet ID: %s", tweet_id, extra={"tweet_id": tweet_id})
+            await self._mark_posted(entry, tweet_id)
             return True
+        await self.outbox.mark_failed(entry, f"Unexpected response: {twitter_response}")
+        return False
+
+    async def _mark_posted(self, entry: OutboxEntry, tweet_id: Optional[str]) -> None:
+        await self._save_posted_tweet(entry, tweet_id)
+        # The memory has to be on disk before the outbox entry is done, otherwise
+        # a crash in between forgets the post and the tweet can be answered again
+        if not await self.database_client.flush():
+            logger.error(
+                "Posted tweet memory not saved, keeping the outbox entry pending",
+                extra={"tweet_id": tweet_id},
+            )
+            return
+        await self.outbox.mark_done(entry, tweet_id)
+
+    async def _save_posted_tweet(
+        self, entry: OutboxEntry, tweet_id: Optional[str]
+    ) -> None:
+        twitter_post = entry.post
+        await self.database_client.add_memory(
+            Memory(
+                # Without the tweet ID the memory is still needed, to avoid repeating it
+                id=tweet_id or f"outbox_{entry.content_hash}",
+                conversation_id=twitter_post.conversation_id or tweet_id,
+                type="tweet",
+                text=twitter_post.text,
+                topics=[],
+                timestamp=utils.get_current_timestamp(),
+                search_topic=twitter_post.search_topic,
+                quoted_tweet_id=twitter_post.quoted_tweet_id,
+                quoted_tweet_username=twitter_post.quoted_tweet_username,
+                reply_to_id=twitter_post.reply_to_id,
+            )
+        )
+
+
+def _is_duplicate_content_error(error: Exception) -> bool:
+    # Twitter rejects a tweet with the same text as a recent one with 403
+    return "duplicate content" in str(error).lower()
@@ -0,0 +1,182 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Literal
+from typing import Optional
+
+from galadriel import AgentInput
+from galadriel.connectors.twitter import SearchResult
+from galadriel.entities import Message
+from galadriel.entities import PushOnlyQueue
+from galadriel.logging_utils import get_agent_logger
+from src import metrics
+from src import utils
+from src.connectors.twitter_timeline_client import TwitterTimelineClient
+from src.replies.thread_cache import get_parent_id
+from src.repository.cursor_repository import CursorRepository
+from src.twitter_client import TwitterClient
+
+logger = get_agent_logger()
+
+Timeline = Literal["mentions", "home_timeline"]
+
+
+@dataclass
+class TwitterMentionsInputConfig:
+    # Every mention becomes a reply candidate, only when enabled
+    is_mentions_enabled: bool = False
+    # Every tweet of the followed accounts becomes a reply candidate
+    is_home_timeline_enabled: bool = False
+    interval_seconds: float = 5 * 60
+    # Pages of new tweets read in one poll, 100 tweets per page
+    max_pages: int = 3
+    # Parent tweets fetched for the thread context of every new tweet
+    thread_context_depth: int = 3
+
+    @staticmethod
+    def from_settings(settings: Dict) -> "TwitterMentionsInputConfig":
+        """
+        Reads the config from the "mentions_input" key in the character settings
+        """
+        return utils.config_from_settings(
+            TwitterMentionsInputConfig, settings, "mentions_input"
+        )
+
+
+class TwitterMentionsInput(AgentInput):
+    """
+    Polls the mentions (and optionally the home timeline) of the agent with
+    since-id cursors, so only new tweets are read. The tweets are queued as
+    tweet_reply events through the TwitterClient event queue, the parent tweets
+    are added to the thread cache for the reply context.
+    """
+
+    config: TwitterMentionsInputConfig
+    twitter_client: TwitterClient
+    timeline_client: TwitterTimelineClient
+    cursor_repository: CursorRepository
+
+    def __init__(
+        self,
+        config: TwitterMentionsInputConfig,
+        twitter_client: TwitterClient,
+        timeline_client: TwitterTimelineClient,
+        cursor_repository: Optional[CursorRepository] = None,
+    ):
+        self.config = config
+        self.twitter_client = twitter_client
+        self.timeline_client = timeline_client
+        self.cursor_repository = cursor_repository or CursorRepository(
+            twitter_client.database_client.data_dir
+        )
+
+    async def start(self, queue: PushOnlyQueue) -> None:
+        # Events go through the TwitterClient, not directly to the runtime queue
+        timelines: List[Timeline] = []
+        if self.config.is_mentions_enabled:
+            timelines.append("mentions")
+        if self.config.is_home_timeline_enabled:
+            timelines.append("home_timeline")
+        if not timelines:
+            return
+        while True:
+            for timeline in timelines:
+                try:
+                    await self.poll(timeline)
+                except Exception:
+                    logger.error(f"Failed to poll {timeline}", exc_info=True)
+            await asyncio.sleep(self.config.interval_seconds)
+
+    async def poll(self, timeline: Timeline) -> int:
+        """
+        Returns the number of events queued
+        """
+        if await self.twitter_client.is_replies_throttled():
+            # The cursor is kept, the tweets are read once the budget resets
+            return 0
+        since_id = await self.cursor_repository.get(timeline)
+        if timeline == "mentions":
+            page = self.timeline_client.get_mentions(since_id, self.config.max_pages)
+        else:
+            page = self.timeline_client.get_home_timeline(
+                since_id, self.config.max_pages
+            )
+        metrics.increment(f"mentions_input.{timeline}.tweets", len(page.results))
+        if page.is_truncated:
+            # The cursor moves to the newest tweet, older unread pages are not answered
+            metrics.increment(f"mentions_input.{timeline}.truncated_polls")
+            logger.warning(
+                "More than %s pages of new tweets in %s, skipped the older ones",
+                self.config.max_pages,
+                timeline,
+            )
+        if page.newest_id:
+            await self.cursor_repository.save(timeline, page.newest_id)
+        if not since_id:
+            # Started from now, the tweets from before the first poll are not answered
+            logger.info(f"Started {timeline} cursor at {page.newest_id}")
+            return 0
+
+        summary = await self.twitter_client.database_client.get_history_summary()
+        tweets = [
+            t
+            for t in page.results
+            if t.username != self.twitter_client.twitter_username
+            and t.id not in summary.replied_to_ids
+        ]
+        self._cache_threads(tweets, page.conversation_ids)
+        count = 0
+        for tweet in tweets:
+            conversation_id = page.conversation_ids.get(tweet.id, tweet.id)
+            is_queued = await self.twitter_client.put_event(
+                Message(
+                    content="",
+                    conversation_id=conversation_id,
+                    type="tweet_reply",
+                    additional_kwargs={**tweet.to_dict(), "source": timeline},
+                ),
+                dedup_key=f"tweet_reply:{conversation_id}:{tweet.id}",
+            )
+            count += int(is_queued)
+        if count:
+            logger.info(f"Queued {count} new tweets from {timeline}")
+        return count
+
+    def _cache_threads(
+        self, tweets: List[SearchResult], conversation_ids: Dict[str, str]
+    ) -> None:
+        """
+        Adds the tweets to the thread cache, with the missing parent tweets
+        fetched one level at a time, one request per level for all the tweets
+        """
+        thread_cache = self.twitter_client.thread_cache
+        conversation_ids = dict(conversation_ids)
+        known = {t.id for t in tweets}
+        for tweet in tweets:
+            thread_cache.add_tweets(conversation_ids.get(tweet.id, tweet.id), [tweet])
+        frontier = tweets
+        for _ in range(self.config.thread_context_depth):
+            # parent id -> conversation id of the reply to it
+            missing: Dict[str, str] = {}
+            for tweet in frontier:
+                conversation_id = conversation_ids.get(tweet.id, tweet.id)
+                parent_id = get_parent_id(tweet)
+                if (
+                    parent_id
+                    and parent_id not in known
+                    and not thread_cache.has_tweet(conversation_id, parent_id)
+                ):
+                    missing[parent_id] = conversation_id
+            if not missing:
+                break
+            page = self.timeline_client.get_tweets(list(missing))
+            metrics.increment("mentions_input.thread_lookups")
+            for parent in page.results:
+                conversation_id = missing.get(parent.id) or page.conversation_ids.get(
+                    parent.id, parent.id
+                )
+                conversation_ids[parent.id] = conversation_id
+                known.add(parent.id)
+                thread_cache.add_tweets(conversation_id, [parent])
+            frontier = page.results
@@ -1,4 +1,10 @@
+import dataclasses
 import datetime
+from typing import Dict
+from typing import Type
+from typing import TypeVar
+
+T = TypeVar("T")
 
 
 def get_current_timestamp() -> int:
@@ -23,3 +29,14 @@ def format_timestamp(timestamp: int) -> str:
         return f"{hours} hour{'s' if hours != 1 else ''} ago"
     else:
         return f"{days} day{'s' if days != 1 else ''} ago"
+
+
+def config_from_settings(config_class: Type[T], settings: Dict, key: str) -> T:
+    """
+    Builds the config dataclass from the settings[key] dict, unknown keys are ignored
+    """
+    config_settings = settings.get(key, {})
+    field_names = {f.name for f in dataclasses.fields(config_class)}  # type: ignore
+    return config_class(
+        **{k: v for k, v in config_settings.items() if k in field_names}
+    )
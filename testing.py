@@ -3,28 +3,28 @@ import asyncio
 import json
 import os
 import time
-from pathlib import Path
-from typing import List
 from typing import Literal
 
-from dotenv import load_dotenv
-
 from galadriel import AgentInput
 from galadriel import AgentOutput
 from galadriel import AgentRuntime
-from galadriel.connectors.llm import LlmClient
 from galadriel.entities import Message
 from galadriel.entities import PushOnlyQueue
 from src.agent.twitter_agent import TwitterAgent
-from src.models import TwitterAgentConfig
+from src.agent_config_loader import load_agent_config
+from src.connectors.connection_pool import ConnectionPool
+from src.connectors.connection_pool import ConnectionPoolConfig
 from src.models import TwitterPost
 from src.repository.database import DatabaseClient
 
 
 async def main(request_type: Literal["perplexity", "search"], count: int):
-    agent_config = _load_agent_config()
+    agent_config = load_agent_config("daige")
 
-    galadriel_client = LlmClient()
+    connection_pool = ConnectionPool(
+        ConnectionPoolConfig.from_settings(agent_config.settings)
+    )
+    galadriel_client = connection_pool.get_llm_client()
     database_client = DatabaseClient()
 
     # Set up my own agent
@@ -33,6 +33,7 @@ async def main(request_type: Literal["perplexity", "search"], count: int):
         llm_client=galadriel_client,
         database_client=database_client,
         original_tweet_type=request_type,
+        connection_pool=connection_pool,
     )
 
     os.makedirs("data", exist_ok=True)
@@ -50,14 +51,11 @@ async def main(request_type: Literal["perplexity", "search"], count: int):
         if output_client.count >= count:
             break
     task.cancel()
+    await database_client.close()
+    await connection_pool.close()
     print(f"Results saved in {results_file}")
 
 
-def _load_dotenv():
-    env_path = Path(".") / ".env"
-    load_dotenv(dotenv_path=env_path)
-
-
 class TestingTwitterClient(AgentInput):
 
     def __init__(self, count: int):
@@ -96,24 +94,6 @@ class OutputClient(AgentOutput):
         self.count += 1
 
 
-def _load_agent_config() -> TwitterAgentConfig:
-    _load_dotenv()
-    agent_name = "daige"
-    agent_path = Path("agent_configurator") / f"{agent_name}.json"
-    with open(agent_path, "r", encoding="utf-8") as f:
-        agent_dict = json.loads(f.read())
-    missing_fields: List[str] = [
-        field
-        for field in TwitterAgentConfig.required_fields()
-        if not agent_dict.get(field)
-    ]
-    if missing_fields:
-        raise KeyError(
-            f"Character file is missing required fields: {', '.join(missing_fields)}"
-        )
-    return TwitterAgentConfig.from_json(agent_dict)
-
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Generate tweets without posting them."
@@ -0,0 +1,52 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.agent.twitter_agent import TwitterAgent
+
+
+def _get_agent_config(settings):
+    agent_config = MagicMock()
+    agent_config.name = "agent"
+    agent_config.settings = settings
+    return agent_config
+
+
+def _get_agent(tmp_path, monkeypatch) -> TwitterAgent:
+    monkeypatch.delenv("PERPLEXITY_API_KEY", raising=False)
+    database_client = MagicMock()
+    database_client.data_dir = str(tmp_path)
+    return TwitterAgent(
+        _get_agent_config({"model": "gpt-4o"}),
+        MagicMock(),
+        database_client,
+        connection_pool=MagicMock(),
+    )
+
+
+def test_update_config_swaps_routes_and_persona(tmp_path, monkeypatch):
+    agent = _get_agent(tmp_path, monkeypatch)
+    agent_config = _get_agent_config(
+        {"model": "gpt-4o-mini", "reply_prefilter": {"min_words": 5}}
+    )
+
+    agent.update_config(agent_config)
+
+    assert agent.agent_config is agent_config
+    assert agent.reply_agent.agent is agent_config
+    assert agent.model_router.routes["reply"].models == ["gpt-4o-mini"]
+    assert agent.reply_agent.reply_prefilter.config.min_words == 5
+
+
+def test_invalid_config_is_not_partially_applied(tmp_path, monkeypatch):
+    agent = _get_agent(tmp_path, monkeypatch)
+    previous_config = agent.agent_config
+
+    with pytest.raises(AttributeError):
+        agent.update_config(
+            _get_agent_config({"model": "gpt-4o-mini", "reply_prefilter": [1]})
+        )
+
+    assert agent.agent_config is previous_config
+    assert agent.reply_agent.agent is previous_config
+    assert agent.model_router.routes["reply"].models == ["gpt-4o"]
@@ -0,0 +1,140 @@
+import asyncio
+
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+
+from galadriel.connectors.twitter import SearchResult
+from galadriel.entities import Message
+from src import metrics
+from src.agent import twitter_reply_agent
+from src.agent.twitter_reply_agent import TwitterReplyAgent
+from src.models import Memory
+from src.replies.reply_prefilter import ReplyPrefilterConfig
+
+
+def _get_completion(content: str, total_tokens: int):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    response.usage.total_tokens = total_tokens
+    return response
+
+
+def _get_agent(mocker, should_reply_answer: str) -> TwitterReplyAgent:
+    mocker.patch.object(
+        twitter_reply_agent.get_default_prompt_state_use_case,
+        "execute",
+        AsyncMock(return_value={}),
+    )
+
+    async def _completion(model, messages):
+        if "Response options" in messages[-1]["content"]:
+            return _get_completion(should_reply_answer, 10)
+        return _get_completion("Great point about AI", 100)
+
+    llm_client = MagicMock()
+    llm_client.client.chat.completions.create = AsyncMock(side_effect=_completion)
+    db = AsyncMock()
+    db.get_tweets.return_value = [
+        Memory(
+            id="1",
+            conversation_id="1",
+            type="tweet",
+            text="mock_text",
+            topics=[],
+            timestamp=123,
+        )
+    ]
+    db.is_replied_to.return_value = False
+    agent_config = MagicMock()
+    agent_config.settings = {"speculative_replies": True}
+    return TwitterReplyAgent(agent_config, llm_client, db)
+
+
+def _get_reply() -> SearchResult:
+    return SearchResult(
+        id="2",
+        username="user",
+        text="what do you think about AI agents?",
+        retweet_count=0,
+        reply_count=0,
+        like_count=0,
+        quote_count=0,
+        bookmark_count=0,
+        impression_count=0,
+        referenced_tweets=[],
+        attachments=None,
+    )
+
+
+async def test_speculative_reply_used(mocker):
+    metrics.reset()
+    agent = _get_agent(mocker, "[RESPOND]")
+
+    response = await agent._handle_reply("1", _get_reply())
+
+    assert response.type == "tweet"
+    assert response.additional_kwargs["text"] == "Great point about AI"
+    assert metrics.get_counter("speculative_reply.used_tokens") == 100
+
+
+async def test_speculative_reply_discarded(mocker):
+    metrics.reset()
+    agent = _get_agent(mocker, "[IGNORE]")
+
+    assert await agent._handle_reply("1", _get_reply()) is None
+    assert metrics.get_counter("speculative_reply.discarded") == 1
+    assert metrics.get_snapshot()["speculative_reply.wasted_token_ratio"] == 1
+
+
+async def test_skipped_reply_is_not_an_error(mocker):
+    agent = _get_agent(mocker, "[IGNORE]")
+    request = Message(
+        content="",
+        conversation_id="1",
+        type="tweet_reply",
+        additional_kwargs=_get_reply().to_dict(),
+    )
+    response = await agent.execute(request)
+    assert response.content == "" and response.type is None
+
+
+async def test_discard_does_not_swallow_caller_cancellation(mocker):
+    mocker.patch.object(twitter_reply_agent.format_prompt, "execute", return_value="")
+    is_finishing = asyncio.Event()
+
+    async def _slow_completion():
+        # Keeps running after it is cancelled, like a request that is finishing
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            is_finishing.set()
+            await asyncio.sleep(10)
+
+    speculative_reply = asyncio.create_task(_slow_completion())
+    await asyncio.sleep(0)
+    task = asyncio.create_task(
+        twitter_reply_agent._discard_speculative_reply(speculative_reply, {})
+    )
+    await is_finishing.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    speculative_reply.cancel()
+
+
+def test_update_config_keeps_prefilter_history(mocker):
+    agent = _get_agent(mocker, "[RESPOND]")
+    reply_prefilter = agent.reply_prefilter
+    agent_config = MagicMock()
+    agent_config.settings = {"reply_prefilter": {"max_replies_per_user": 1}}
+
+    agent.update_config(
+        agent_config, ReplyPrefilterConfig.from_settings(agent_config.settings)
+    )
+
+    assert agent.agent is agent_config
+    assert not agent.is_speculative_replies
+    assert agent.reply_prefilter is reply_prefilter
+    assert reply_prefilter.config.max_replies_per_user == 1
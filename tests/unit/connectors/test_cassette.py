@@ -0,0 +1,87 @@
+import pytest
+
+from galadriel.connectors.perplexity import PerplexitySources
+from src import metrics
+from src.connectors.cassette import Cassette
+from src.connectors.cassette import CassetteExhaustedError
+from src.connectors.cassette import read_entries
+
+
+class _PerplexityClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def search_topic(self, topic: str) -> PerplexitySources:
+        self.calls += 1
+        return PerplexitySources(content=f"content {topic}", sources="sources")
+
+
+class _TwitterTool:
+    name = "twitter_get_post_tool"
+
+    def __init__(self):
+        self.calls = 0
+
+    def forward(self, tweet_id: str) -> str:
+        self.calls += 1
+        if tweet_id == "timeout":
+            raise TimeoutError("timed out")
+        return f"tweet {tweet_id}"
+
+
+def _record(file_path: str):
+    cassette = Cassette("record", file_path)
+    perplexity_client = _PerplexityClient()
+    twitter_tool = _TwitterTool()
+    cassette.wrap_perplexity_client(perplexity_client)  # type: ignore
+    cassette.wrap_twitter_tool(twitter_tool)  # type: ignore
+    return cassette, perplexity_client, twitter_tool
+
+
+async def test_replays_recorded_calls_without_calling_the_connectors(tmp_path):
+    file_path = str(tmp_path / "cassette.jsonl.gz")
+    cassette, perplexity_client, twitter_tool = _record(file_path)
+    await perplexity_client.search_topic("ai")
+    assert twitter_tool.forward("1") == "tweet 1"
+    with pytest.raises(TimeoutError):
+        twitter_tool.forward("timeout")
+    cassette.close()
+    assert [e["target"] for e in read_entries(file_path)] == [
+        "perplexity",
+        "twitter.twitter_get_post_tool",
+        "twitter.twitter_get_post_tool",
+    ]
+
+    replay = Cassette("replay", file_path, time_scale=0)
+    perplexity_client = _PerplexityClient()
+    twitter_tool = _TwitterTool()
+    replay.wrap_perplexity_client(perplexity_client)  # type: ignore
+    replay.wrap_twitter_tool(twitter_tool)  # type: ignore
+
+    result = await perplexity_client.search_topic("ai")
+    assert result == PerplexitySources(content="content ai", sources="sources")
+    assert twitter_tool.forward("1") == "tweet 1"
+    # Recorded errors are raised again with the same type
+    with pytest.raises(TimeoutError):
+        twitter_tool.forward("timeout")
+    with pytest.raises(CassetteExhaustedError):
+        twitter_tool.forward("2")
+    assert perplexity_client.calls == 0
+    assert twitter_tool.calls == 0
+
+
+async def test_counts_changed_requests(tmp_path):
+    metrics.reset()
+    file_path = str(tmp_path / "cassette.jsonl.gz")
+    cassette, perplexity_client, _ = _record(file_path)
+    await perplexity_client.search_topic("ai")
+    cassette.close()
+
+    replay = Cassette("replay", file_path, time_scale=0)
+    perplexity_client = _PerplexityClient()
+    replay.wrap_perplexity_client(perplexity_client)  # type: ignore
+
+    # The recorded response is replayed in call order
+    result = await perplexity_client.search_topic("crypto")
+    assert result.content == "content ai"
+    assert metrics.get_counter("cassette.request_mismatches") == 1
@@ -0,0 +1,50 @@
+from unittest.mock import MagicMock
+
+from src.connectors.llm_usage import LlmBudgetConfig
+from src.connectors.llm_usage import LlmUsageTracker
+from src.repository.usage_store import UsageStore
+
+
+def _get_response(prompt_tokens: int, completion_tokens: int):
+    response = MagicMock()
+    response.usage.prompt_tokens = prompt_tokens
+    response.usage.completion_tokens = completion_tokens
+    return response
+
+
+async def test_records_usage_per_task(tmp_path):
+    tracker = LlmUsageTracker(LlmBudgetConfig(), UsageStore(str(tmp_path)), "agent")
+    await tracker.record("reply", _get_response(100, 20), 1.5)
+    await tracker.record("reply", None, 0.5)
+    await tracker.record("should_reply", _get_response(50, 1), 0.2)
+
+    # Read back from the file
+    usage = await UsageStore(str(tmp_path)).get_usage("agent")
+    assert usage["reply"].requests == 2
+    assert usage["reply"].failures == 1
+    assert usage["reply"].total_tokens == 120
+    assert usage["reply"].latency_seconds == 2
+    assert usage["should_reply"].prompt_tokens == 50
+    assert not await UsageStore(str(tmp_path)).get_usage("other_agent")
+
+
+async def test_budget_downgrades_then_throttles_replies(tmp_path):
+    tracker = LlmUsageTracker(
+        LlmBudgetConfig(daily_tokens=1000, task_daily_tokens={"reply": 500}),
+        UsageStore(str(tmp_path)),
+        "agent",
+    )
+    await tracker.record("original_post", _get_response(700, 0), 1)
+    assert await tracker.get_budget_state("reply") == "ok"
+
+    # Over 80% of the daily budget
+    await tracker.record("should_reply", _get_response(150, 0), 1)
+    assert await tracker.get_budget_state("reply") == "downgrade"
+    # Original posts are not budgeted
+    assert await tracker.get_budget_state("original_post") == "ok"
+
+    # The reply budget is used up before the daily one
+    await tracker.record("reply", _get_response(100, 0), 1)
+    assert await tracker.get_budget_state("should_reply") == "downgrade"
+    tracker.config.task_daily_tokens["reply"] = 100
+    assert await tracker.get_budget_state("reply") == "throttle"
@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+from src import metrics
+from src.connectors.llm_usage import LlmBudgetConfig
+from src.connectors.llm_usage import LlmUsageTracker
+from src.connectors.model_router import ModelRouter
+from src.repository.usage_store import UsageStore
+
+MESSAGES = [{"role": "user", "content": "mock_prompt"}]
+
+
+def _get_llm_client(responses):
+    async def _create(model, messages):
+        response = responses[model]
+        if isinstance(response, Exception):
+            raise response
+        if response == "slow":
+            await asyncio.sleep(1)
+        return MagicMock(usage=None)
+
+    llm_client = MagicMock()
+    llm_client.client.chat.completions.create = AsyncMock(side_effect=_create)
+    llm_client.completion = AsyncMock(return_value=None)
+    return llm_client
+
+
+def _get_called_models(llm_client):
+    return [
+        c.kwargs["model"] for c in llm_client.client.chat.completions.create.mock_calls
+    ]
+
+
+async def test_uses_default_model_without_routes():
+    llm_client = _get_llm_client({"gpt-4o": "ok"})
+    router = ModelRouter(llm_client, {})
+
+    assert await router.completion("should_reply", MESSAGES)
+    assert _get_called_models(llm_client) == ["gpt-4o"]
+
+
+async def test_fails_over_on_error_and_timeout():
+    metrics.reset()
+    llm_client = _get_llm_client({"a": Exception("error"), "b": "slow", "c": "ok"})
+    router = ModelRouter(
+        llm_client,
+        {
+            "model_routes": {
+                "reply": {"models": ["a", "b", "c"], "timeout_seconds": 0.01}
+            },
+            "resilience": {"failure_threshold": 1},
+        },
+    )
+
+    assert await router.completion("reply", MESSAGES)
+    assert _get_called_models(llm_client) == ["a", "b", "c"]
+    assert metrics.get_counter("llm.route.reply.failovers") == 2
+    assert metrics.get_counter("llm.route.reply.b.timeouts") == 1
+
+    # Circuit breakers of the failed models are open
+    await router.completion("reply", MESSAGES)
+    assert _get_called_models(llm_client)[3:] == ["c"]
+
+
+async def test_routes_long_prompts():
+    llm_client = _get_llm_client({"small": "ok", "large": "ok"})
+    router = ModelRouter(
+        llm_client,
+        {
+            "model_routes": {
+                "original_post": {
+                    "models": ["small"],
+                    "max_prompt_tokens": 5,
+                    "long_prompt_models": ["large"],
+                }
+            }
+        },
+    )
+
+    await router.completion("original_post", MESSAGES)
+    await router.completion("original_post", [{"content": "long prompt" * 10}])
+    assert _get_called_models(llm_client) == ["small", "large"]
+
+
+async def test_downgrades_replies_near_the_budget(tmp_path):
+    llm_client = _get_llm_client({"gpt-4o": "ok", "mini": "ok"})
+    usage_tracker = LlmUsageTracker(
+        LlmBudgetConfig(daily_tokens=100, downgrade_models=["mini"]),
+        UsageStore(str(tmp_path)),
+        "agent",
+    )
+    router = ModelRouter(llm_client, {}, usage_tracker=usage_tracker)
+    response = MagicMock()
+    response.usage.prompt_tokens = 90
+    response.usage.completion_tokens = 0
+    await usage_tracker.record("original_post", response, 1)
+
+    await router.completion("original_post", MESSAGES)
+    await router.completion("reply", MESSAGES)
+    assert _get_called_models(llm_client) == ["gpt-4o", "mini"]
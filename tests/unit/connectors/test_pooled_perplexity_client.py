@@ -0,0 +1,43 @@
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import aiohttp
+
+from galadriel.connectors import perplexity
+from src.connectors.pooled_perplexity_client import PooledPerplexityClient
+
+
+def _get_session():
+    response = MagicMock()
+    response.json = AsyncMock(
+        return_value={
+            "choices": [{"message": {"content": "mock_content"}}],
+            "citations": ["https://example.com"],
+        }
+    )
+    request = MagicMock()
+    request.__aenter__ = AsyncMock(return_value=response)
+    request.__aexit__ = AsyncMock(return_value=None)
+    session = MagicMock()
+    session.post.return_value = request
+    return session
+
+
+async def test_uses_shared_session():
+    session = _get_session()
+    connection_pool = MagicMock()
+    connection_pool.get_aiohttp_session = AsyncMock(return_value=session)
+    client = PooledPerplexityClient("mock_key", connection_pool)
+
+    result = await client.search_topic("topic")
+    await client.search_topic("topic")
+
+    assert result.content == "mock_content"
+    assert result.sources == "[1] https://example.com"
+    assert session.post.call_count == 2
+    assert "timeout" not in session.post.call_args.kwargs
+    session.close.assert_not_called()
+
+
+async def test_does_not_replace_aiohttp_in_perplexity_module():
+    assert perplexity.aiohttp is aiohttp
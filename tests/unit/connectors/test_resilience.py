@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from src import metrics
+from src.connectors.resilience import CircuitOpenError
+from src.connectors.resilience import ResilienceConfig
+from src.connectors.resilience import ResiliencePolicy
+
+
+def _get_request(result, delay: float = 0):
+    async def _request():
+        await asyncio.sleep(delay)
+        return result
+
+    return _request
+
+
+async def test_breaker_opens_and_probes():
+    metrics.reset()
+    policy = ResiliencePolicy(
+        "mock", ResilienceConfig(failure_threshold=2, reset_timeout_seconds=0.05)
+    )
+    assert await policy.call(_get_request(None)) is None
+    assert await policy.call(_get_request(None)) is None
+    assert policy.breaker.state == "open"
+    assert metrics.get_snapshot()["resilience.mock.state"] == 2
+    with pytest.raises(CircuitOpenError):
+        await policy.call(_get_request("ok"))
+
+    await asyncio.sleep(0.05)
+    assert await policy.call(_get_request("ok")) == "ok"
+    assert policy.breaker.state == "closed"
+
+
+async def test_failed_probe_opens_breaker():
+    policy = ResiliencePolicy(
+        "mock", ResilienceConfig(failure_threshold=1, reset_timeout_seconds=0)
+    )
+    await policy.call(_get_request(None))
+    assert policy.breaker.allow_request()
+    assert policy.breaker.state == "half_open"
+    # Only one probe at a time
+    assert not policy.breaker.allow_request()
+    policy.breaker.record_failure()
+    assert policy.breaker.state == "open"
+
+
+async def test_adaptive_timeout():
+    config = ResilienceConfig(
+        min_latency_samples=3,
+        timeout_multiplier=2,
+        min_timeout_seconds=0.01,
+        default_timeout_seconds=10,
+    )
+    policy = ResiliencePolicy("mock", config)
+    assert policy.latency_tracker.get_timeout() == 10
+    for _ in range(3):
+        await policy.call(_get_request("ok", delay=0.01))
+    assert policy.latency_tracker.get_timeout() < 0.1
+
+    with pytest.raises(asyncio.TimeoutError):
+        await policy.call(_get_request("ok", delay=1))
+
+
+async def test_hedged_request():
+    metrics.reset()
+    config = ResilienceConfig(
+        min_latency_samples=1, is_hedging=True, min_timeout_seconds=1
+    )
+    policy = ResiliencePolicy("mock", config)
+    policy.latency_tracker.add(0.01)
+    delays = [1, 0]
+
+    async def _request():
+        await asyncio.sleep(delays.pop(0))
+        return "ok"
+
+    assert await policy.call(_request) == "ok"
+    assert metrics.get_counter("resilience.mock.hedged") == 1
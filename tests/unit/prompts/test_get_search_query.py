@@ -4,6 +4,7 @@ from unittest.mock import MagicMock
 from src.models import Memory
 from src.prompts import get_search_query
 from src.prompts.get_search_query import SearchQuery
+from src.repository.history_summary import HistorySummary
 
 
 async def test_success():
@@ -12,7 +13,7 @@ async def test_success():
         "key": ["value"],
     }
     db = AsyncMock()
-    db.get_tweets.return_value = []
+    db.get_history_summary.return_value = HistorySummary()
 
     result = await get_search_query.execute(agent, db)
     assert result == SearchQuery(topic="key", query="value")
@@ -25,19 +26,21 @@ async def test_excludes_used_topic():
         "key2": ["value2"],
     }
     db = AsyncMock()
-    db.get_tweets.return_value = [
-        Memory(
-            id="mock_id",
-            conversation_id="mock_id",
-            type="tweet",
-            text="mock_text",
-            topics=["key1"],
-            timestamp=123,
-            search_topic="key1",
-            quoted_tweet_id=None,
-            quoted_tweet_username=None,
-        )
-    ]
+    db.get_history_summary.return_value = HistorySummary.build(
+        [
+            Memory(
+                id="mock_id",
+                conversation_id="mock_id",
+                type="tweet",
+                text="mock_text",
+                topics=["key1"],
+                timestamp=123,
+                search_topic="key1",
+                quoted_tweet_id=None,
+                quoted_tweet_username=None,
+            )
+        ]
+    )
 
     result = await get_search_query.execute(agent, db)
     assert result == SearchQuery(topic="key2", query="value2")
@@ -49,19 +52,21 @@ async def test_no_topics_to_exclude():
         "key1": ["value1"],
     }
     db = AsyncMock()
-    db.get_tweets.return_value = [
-        Memory(
-            id="mock_id",
-            conversation_id="mock_id",
-            type="tweet",
-            text="mock_text",
-            topics=[],
-            timestamp=123,
-            search_topic=None,
-            quoted_tweet_id=None,
-            quoted_tweet_username=None,
-        )
-    ]
+    db.get_history_summary.return_value = HistorySummary.build(
+        [
+            Memory(
+                id="mock_id",
+                conversation_id="mock_id",
+                type="tweet",
+                text="mock_text",
+                topics=[],
+                timestamp=123,
+                search_topic=None,
+                quoted_tweet_id=None,
+                quoted_tweet_username=None,
+            )
+        ]
+    )
 
     result = await get_search_query.execute(agent, db)
     assert result == SearchQuery(topic="key1", query="value1")
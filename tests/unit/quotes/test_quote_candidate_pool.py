@@ -0,0 +1,66 @@
+from galadriel.connectors.twitter import SearchResult
+from src.quotes.quote_candidate_pool import QuoteCandidatePool
+from src.quotes.rank_quote_candidates import QuoteExclusions
+from src.repository.quote_candidate_repository import QuoteCandidateRepository
+
+
+def _get_search_result(tweet_id: str, username: str = "user") -> SearchResult:
+    return SearchResult(
+        id=tweet_id,
+        username=username,
+        text="text",
+        retweet_count=0,
+        reply_count=0,
+        like_count=0,
+        quote_count=0,
+        bookmark_count=0,
+        impression_count=0,
+        referenced_tweets=[],
+        attachments=None,
+    )
+
+
+def _no_exclusions() -> QuoteExclusions:
+    return QuoteExclusions(quoted_ids=set(), quoted_users={})
+
+
+async def test_persists_candidates(tmp_path):
+    pool = QuoteCandidatePool(QuoteCandidateRepository(str(tmp_path)))
+    await pool.refill("query", [_get_search_result("1"), _get_search_result("2")])
+    assert (await pool.pop("query", _no_exclusions())).id == "1"
+
+    reloaded_pool = QuoteCandidatePool(QuoteCandidateRepository(str(tmp_path)))
+    assert (await reloaded_pool.pop("query", _no_exclusions())).id == "2"
+    assert await reloaded_pool.pop("query", _no_exclusions()) is None
+
+
+async def test_skips_excluded_candidates():
+    pool = QuoteCandidatePool()
+    await pool.refill("query", [_get_search_result("1"), _get_search_result("2")])
+    exclusions = QuoteExclusions(quoted_ids={"1"}, quoted_users={})
+    assert (await pool.pop("query", exclusions)).id == "2"
+
+
+async def test_invalidated_by_ttl_and_query():
+    pool = QuoteCandidatePool(ttl_seconds=60)
+    await pool.refill("query", [_get_search_result("1"), _get_search_result("2")])
+    assert await pool.pop("other query", _no_exclusions()) is None
+    # Changing the query also drops the candidates
+    assert await pool.pop("query", _no_exclusions()) is None
+
+    await pool.refill("query", [_get_search_result("1")])
+    pool.created_at -= 120
+    assert pool.is_stale()
+    assert await pool.pop("query", _no_exclusions()) is None
+
+
+async def test_corrupt_file_is_ignored(tmp_path):
+    repository = QuoteCandidateRepository(str(tmp_path))
+    with open(repository.file_path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    pool = QuoteCandidatePool(repository)
+    assert await pool.pop("query", _no_exclusions()) is None
+
+    await repository.save({"search_query": "query"})
+    pool = QuoteCandidatePool(repository)
+    assert await pool.pop("query", _no_exclusions()) is None
@@ -0,0 +1,134 @@
+from unittest.mock import MagicMock
+
+from galadriel.connectors.twitter import SearchResult
+from src.models import Memory
+from src.quotes import rank_quote_candidates
+from src.quotes.rank_quote_candidates import QuoteExclusions
+from src.repository.history_summary import HistorySummary
+
+NOW = 1736942400
+# Snowflake ID of a tweet created at NOW
+NOW_TWEET_ID = ((NOW * 1000 - rank_quote_candidates.TWITTER_EPOCH_MS) << 22) + 1
+
+
+def _get_agent(topics=None):
+    agent = MagicMock()
+    agent.topics = topics or []
+    return agent
+
+
+def _get_search_result(
+    tweet_id: str,
+    username: str = "user",
+    text: str = "text",
+    like_count: int = 0,
+    attachments=None,
+) -> SearchResult:
+    return SearchResult(
+        id=tweet_id,
+        username=username,
+        text=text,
+        retweet_count=0,
+        reply_count=0,
+        like_count=like_count,
+        quote_count=0,
+        bookmark_count=0,
+        impression_count=0,
+        referenced_tweets=[],
+        attachments=attachments,
+    )
+
+
+def _get_memory(quoted_tweet_id: str, quoted_tweet_username: str) -> Memory:
+    return Memory(
+        id="mock_id",
+        conversation_id="mock_id",
+        type="tweet",
+        text="mock_text",
+        topics=[],
+        timestamp=123,
+        quoted_tweet_id=quoted_tweet_id,
+        quoted_tweet_username=quoted_tweet_username,
+    )
+
+
+def _no_exclusions() -> QuoteExclusions:
+    return QuoteExclusions(quoted_ids=set(), quoted_users={})
+
+
+def test_excludes_links_and_attachments():
+    candidates = [
+        _get_search_result("1", text="look https://t.co/asd"),
+        _get_search_result("2", attachments={"media_keys": []}),
+        _get_search_result("3"),
+    ]
+    result = rank_quote_candidates.execute(
+        _get_agent(), candidates, _no_exclusions(), NOW
+    )
+    assert [r.id for r in result] == ["3"]
+
+
+def test_excludes_quoted_tweets_and_recent_users():
+    exclusions = rank_quote_candidates.get_exclusions(
+        HistorySummary.build([_get_memory("1", "old"), _get_memory("2", "recent")])
+    )
+    candidates = [
+        _get_search_result("1", username="other"),
+        _get_search_result("3", username="recent"),
+        _get_search_result("4", username="other"),
+    ]
+    result = rank_quote_candidates.execute(_get_agent(), candidates, exclusions, NOW)
+    assert [r.id for r in result] == ["4"]
+
+
+def test_recently_quoted_user_window():
+    memories = [_get_memory(str(i), f"user{i}") for i in range(5)]
+    exclusions = rank_quote_candidates.get_exclusions(HistorySummary.build(memories))
+    assert exclusions.quoted_users == {
+        "user4": 0,
+        "user3": 1,
+        "user2": 2,
+        "user1": 3,
+        "user0": 4,
+    }
+    assert exclusions.is_excluded(_get_search_result("10", username="user2"))
+    assert not exclusions.is_excluded(_get_search_result("10", username="user1"))
+
+
+def test_ranks_by_engagement():
+    candidates = [
+        _get_search_result(str(NOW_TWEET_ID), username="a", like_count=1),
+        _get_search_result(str(NOW_TWEET_ID + 1), username="b", like_count=1000),
+    ]
+    result = rank_quote_candidates.execute(
+        _get_agent(), candidates, _no_exclusions(), NOW
+    )
+    assert [r.username for r in result] == ["b", "a"]
+
+
+def test_ranks_by_topic_relevance():
+    candidates = [
+        _get_search_result(str(NOW_TWEET_ID), username="a", text="nice weather"),
+        _get_search_result(str(NOW_TWEET_ID + 1), username="b", text="SpaceX to mars"),
+    ]
+    result = rank_quote_candidates.execute(
+        _get_agent(["spacex", "mars colonization"]), candidates, _no_exclusions(), NOW
+    )
+    assert [r.username for r in result] == ["b", "a"]
+
+
+def test_diversifies_authors():
+    candidates = [
+        _get_search_result(str(NOW_TWEET_ID), username="a", like_count=100),
+        _get_search_result(str(NOW_TWEET_ID + 1), username="a", like_count=90),
+        _get_search_result(str(NOW_TWEET_ID + 2), username="b", like_count=80),
+    ]
+    result = rank_quote_candidates.execute(
+        _get_agent(), candidates, _no_exclusions(), NOW
+    )
+    assert [r.username for r in result] == ["a", "b", "a"]
+
+
+def test_tweet_timestamp():
+    assert rank_quote_candidates.get_tweet_timestamp(str(NOW_TWEET_ID)) == NOW
+    assert rank_quote_candidates.get_tweet_timestamp("dry_run") is None
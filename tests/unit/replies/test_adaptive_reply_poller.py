@@ -0,0 +1,53 @@
+from src.replies.adaptive_reply_poller import AdaptiveReplyPoller
+from src.replies.adaptive_reply_poller import AdaptiveReplyPollerConfig
+
+
+def _get_poller(max_requests_per_hour: float = 100) -> AdaptiveReplyPoller:
+    return AdaptiveReplyPoller(
+        AdaptiveReplyPollerConfig(
+            min_interval_seconds=60,
+            max_interval_seconds=600,
+            backoff_multiplier=2,
+            max_requests_per_hour=max_requests_per_hour,
+        )
+    )
+
+
+def test_backs_off_cold_conversations():
+    poller = _get_poller()
+    assert poller.get_due_conversations(["1"], now=0) == ["1"]
+    assert poller.record_poll("1", [], now=0) == 0
+    assert poller.get_due_conversations(["1"], now=59) == []
+
+    intervals = []
+    now = 0
+    for _ in range(5):
+        now += poller.get_sleep_seconds(now=now)
+        assert poller.get_due_conversations(["1"], now=now) == ["1"]
+        poller.record_poll("1", [], now=now)
+        intervals.append(poller.get_sleep_seconds(now=now))
+    assert intervals == [240, 480, 600, 600, 600]
+
+
+def test_polls_active_conversations_first():
+    poller = _get_poller()
+    poller.get_due_conversations(["cold", "hot"], now=0)
+    poller.record_poll("cold", ["1"], now=0)
+    poller.record_poll("hot", ["2"], now=0)
+
+    assert poller.record_poll("cold", ["1"], now=60) == 0
+    assert poller.record_poll("hot", ["2", "3", "4"], now=60) == 2
+    # Hot conversation keeps the short interval, the cold one is backed off
+    assert poller.get_due_conversations(["cold", "hot"], now=120) == ["hot"]
+    assert poller.get_due_conversations(["cold", "hot"], now=180) == ["hot", "cold"]
+
+
+def test_global_request_budget():
+    poller = _get_poller(max_requests_per_hour=2)
+    conversations = ["1", "2", "3"]
+    assert poller.get_due_conversations(conversations, now=0) == ["1", "2"]
+    for conversation_id in ["1", "2"]:
+        poller.record_poll(conversation_id, ["reply"], now=0)
+    # One request is refilled every 30 minutes
+    assert poller.get_sleep_seconds(now=0) == 1800
+    assert poller.get_due_conversations(conversations, now=1800) == ["3"]
@@ -0,0 +1,93 @@
+from galadriel.connectors.twitter import SearchResult
+from src.models import Memory
+from src.replies.reply_prefilter import ReplyPrefilter
+from src.replies.reply_prefilter import ReplyPrefilterConfig
+
+
+def _get_reply(
+    reply_id: str, text: str, username: str = "user", attachments=None
+) -> SearchResult:
+    return SearchResult(
+        id=reply_id,
+        username=username,
+        text=text,
+        retweet_count=0,
+        reply_count=0,
+        like_count=0,
+        quote_count=0,
+        bookmark_count=0,
+        impression_count=0,
+        referenced_tweets=[],
+        attachments=attachments,
+    )
+
+
+def _get_own_reply(reply_to_id: str) -> Memory:
+    return Memory(
+        id=f"reply_{reply_to_id}",
+        conversation_id="1",
+        type="tweet",
+        text="mock_text",
+        topics=[],
+        timestamp=123,
+        reply_to_id=reply_to_id,
+    )
+
+
+def _get_rule(prefilter: ReplyPrefilter, reply: SearchResult, tweets=None):
+    decision = prefilter.execute("1", reply, tweets or [])
+    return decision and decision.rule
+
+
+def test_ignores_low_value_replies():
+    prefilter = ReplyPrefilter(ReplyPrefilterConfig())
+    assert _get_rule(prefilter, _get_reply("2", "@daige 🔥🔥")) == "no_text"
+    assert (
+        _get_rule(prefilter, _get_reply("3", "", attachments={"media_keys": ["1"]}))
+        == "media_only"
+    )
+    assert _get_rule(prefilter, _get_reply("4", "@daige based")) == "too_short"
+    assert (
+        _get_rule(prefilter, _get_reply("5", "Huge AIRDROP, check my bio"))
+        == "spam_phrase"
+    )
+    assert (
+        _get_rule(
+            prefilter, _get_reply("6", "@daige what do you think?", username="other")
+        )
+        is None
+    )
+
+
+def test_ignores_repeated_and_frequent_users():
+    prefilter = ReplyPrefilter(ReplyPrefilterConfig(max_replies_per_user=2))
+    assert _get_rule(prefilter, _get_reply("2", "what about AI")) is None
+    # Same reply again from the reply loop is not a repeat
+    assert _get_rule(prefilter, _get_reply("2", "what about AI")) is None
+    assert _get_rule(prefilter, _get_reply("3", "What about  AI?")) == "repeated_text"
+    assert _get_rule(prefilter, _get_reply("4", "and robots too")) == "user_reply_count"
+
+
+def test_stops_at_conversation_reply_cap():
+    tweets = [_get_own_reply("2"), _get_own_reply("3")]
+    # Off by default
+    prefilter = ReplyPrefilter(ReplyPrefilterConfig())
+    assert prefilter.execute("1", _get_reply("4", "tell me more"), tweets) is None
+
+    prefilter = ReplyPrefilter(ReplyPrefilterConfig(max_replies_per_conversation=2))
+    decision = prefilter.execute("1", _get_reply("4", "tell me more"), tweets)
+    assert decision.decision == "STOP"
+    assert decision.rule == "conversation_reply_cap"
+
+
+def test_stops_deep_threads():
+    prefilter = ReplyPrefilter(ReplyPrefilterConfig(max_thread_depth=3))
+    assert prefilter.execute("1", _get_reply("2", "tell me more"), [], 2) is None
+    decision = prefilter.execute("1", _get_reply("3", "and then what"), [], 3)
+    assert decision.decision == "STOP"
+    assert decision.rule == "thread_depth"
+
+
+def test_disabled():
+    prefilter = ReplyPrefilter(ReplyPrefilterConfig(is_enabled=False))
+    assert _get_rule(prefilter, _get_reply("2", "")) is None
@@ -0,0 +1,51 @@
+from typing import Optional
+
+from galadriel.connectors.twitter import SearchResult
+from src.replies import thread_cache
+from src.replies.thread_cache import ThreadCache
+
+
+def _get_tweet(tweet_id: str, parent_id: Optional[str] = None) -> SearchResult:
+    return SearchResult(
+        id=tweet_id,
+        username=f"user{tweet_id}",
+        text=f"text {tweet_id}",
+        retweet_count=0,
+        reply_count=0,
+        like_count=0,
+        quote_count=0,
+        bookmark_count=0,
+        impression_count=0,
+        referenced_tweets=(
+            [{"type": "replied_to", "id": parent_id}] if parent_id else []
+        ),
+        attachments=None,
+    )
+
+
+def test_builds_thread_incrementally():
+    cache = ThreadCache()
+    assert cache.add_tweets("1", [_get_tweet("1"), _get_tweet("2", "1")]) == 2
+    # Later sweeps return the same replies again, only the new ones are added
+    assert cache.add_tweets("1", [_get_tweet("2", "1"), _get_tweet("3", "2")]) == 1
+
+    assert [t.id for t in cache.get_thread("1", "3")] == ["1", "2"]
+    assert [t.id for t in cache.get_replies("1", "1")] == ["2"]
+    assert cache.format_thread("1", "3") == "@user1: text 1\n@user2: text 2"
+    assert cache.format_thread("1", "3", max_tweets=1) == "@user1: text 1"
+
+
+def test_evicts_least_recently_used_and_expired(mocker):
+    mocker.patch.object(thread_cache.utils, "get_current_timestamp", return_value=0)
+    cache = ThreadCache(max_conversations=2, max_age_seconds=60)
+    cache.add_tweets("1", [_get_tweet("1")])
+    cache.add_tweets("2", [_get_tweet("2")])
+    cache.get_thread("1", "1")
+    cache.add_tweets("3", [_get_tweet("3")])
+    assert cache.has_tweet("1", "1")
+    assert not cache.has_tweet("2", "2")
+
+    mocker.patch.object(thread_cache.utils, "get_current_timestamp", return_value=61)
+    cache.add_tweets("4", [_get_tweet("4")])
+    assert not cache.has_tweet("1", "1")
+    assert cache.has_tweet("4", "4")
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+from src.models import Memory
+from src.repository import database
+from src.repository.database import DatabaseClient
+
+
+def _get_memory(memory_id: str) -> Memory:
+    return Memory(
+        id=memory_id,
+        conversation_id=memory_id,
+        type="tweet",
+        text="mock_text",
+        topics=[],
+        timestamp=123,
+    )
+
+
+def _read_file(db: DatabaseClient):
+    with open(db.memories_file_path, "r", encoding="utf-8") as f:
+        return json.loads(f.read())
+
+
+async def test_pending_memories_are_readable(tmp_path):
+    db = DatabaseClient(str(tmp_path), flush_interval_seconds=60)
+    await db.add_memory(_get_memory("1"))
+
+    assert _read_file(db) == []
+    assert [t.id for t in await db.get_tweets()] == ["1"]
+    await db.close()
+
+
+async def test_flushes_on_batch_size(tmp_path):
+    db = DatabaseClient(str(tmp_path), flush_interval_seconds=60, flush_batch_size=2)
+    await db.add_memory(_get_memory("1"))
+    await db.add_memory(_get_memory("2"))
+    # Written by the scheduled flush, without waiting for the interval
+    for _ in range(100):
+        if _read_file(db):
+            break
+        await asyncio.sleep(0.01)
+
+    assert [m["id"] for m in _read_file(db)] == ["1", "2"]
+    await db.close()
+
+
+async def test_failed_flush_is_retried(tmp_path, mocker):
+    db = DatabaseClient(str(tmp_path), flush_interval_seconds=60)
+    await db.add_memory(_get_memory("1"))
+    for task in list(db._flush_tasks):
+        task.cancel()
+    db._flush_tasks.clear()
+    mocker.patch.object(
+        database.file_utils, "write_json", side_effect=[OSError("disk full")]
+    )
+
+    assert not await db.flush()
+    assert len(db._flush_tasks) == 1
+    assert [t.id for t in await db.get_tweets()] == ["1"]
+    mocker.stopall()
+    await db.close()
+    assert [m["id"] for m in _read_file(db)] == ["1"]
+
+
+async def test_close_flushes(tmp_path):
+    db = DatabaseClient(str(tmp_path), flush_interval_seconds=60)
+    await db.add_memory(_get_memory("1"))
+    await db.close()
+
+    assert [m["id"] for m in _read_file(db)] == ["1"]
+    assert [t.id for t in await DatabaseClient(str(tmp_path)).get_tweets()] == ["1"]
+
+
+async def test_archives_memories_over_hot_window(tmp_path):
+    db = DatabaseClient(str(tmp_path), flush_interval_seconds=60, hot_window_size=10)
+    for i in range(70):
+        memory = _get_memory(str(i))
+        memory.quoted_tweet_id = f"quoted_{i}"
+        await db.add_memory(memory)
+    await db.close()
+
+    assert [m["id"] for m in _read_file(db)] == [str(i) for i in range(60, 70)]
+    archived = await db.get_archived_memories()
+    assert [m.id for m in archived] == [str(i) for i in range(60)]
+    quoted_tweet_ids = await DatabaseClient(str(tmp_path)).get_quoted_tweet_ids()
+    assert quoted_tweet_ids == {f"quoted_{i}" for i in range(70)}
+
+
+async def test_history_summary_is_persisted(tmp_path):
+    db = DatabaseClient(str(tmp_path), flush_interval_seconds=60)
+    reply = _get_memory("2")
+    reply.reply_to_id = "1"
+    await db.add_memory(_get_memory("1"))
+    await db.add_memory(reply)
+    await db.close()
+
+    summary = await DatabaseClient(str(tmp_path)).get_history_summary()
+    assert summary.latest_tweet.id == "2"
+    assert summary.latest_original_tweet.id == "1"
+    assert [t.id for t in summary.get_recent_tweets()] == ["1", "2"]
+
+
+async def test_history_summary_rebuilt_if_stale(tmp_path):
+    db = DatabaseClient(str(tmp_path), flush_interval_seconds=60)
+    await db.add_memory(_get_memory("1"))
+    await db.close()
+    with open(db.memories_file_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps([_get_memory("2").to_dict(), _get_memory("3").to_dict()]))
+
+    summary = await DatabaseClient(str(tmp_path)).get_history_summary()
+    assert summary.latest_tweet.id == "3"
+
+
+async def test_archived_replies_are_known(tmp_path):
+    db = DatabaseClient(str(tmp_path), flush_interval_seconds=60, hot_window_size=10)
+    for i in range(70):
+        memory = _get_memory(str(i))
+        memory.reply_to_id = f"reply_to_{i}"
+        await db.add_memory(memory)
+    await db.close()
+
+    db = DatabaseClient(str(tmp_path))
+    assert await db.is_replied_to("reply_to_0")
+    assert await db.is_replied_to("reply_to_69")
+    assert not await db.is_replied_to("reply_to_70")
+
+
+async def test_archiving_again_does_not_duplicate(tmp_path):
+    db = DatabaseClient(str(tmp_path))
+    memories = [_get_memory("1"), _get_memory("2")]
+    await db.archive.add_memories(memories)
+    # Crashed before memories.json was written, archived again on the next flush
+    await db.archive.add_memories(memories)
+
+    assert [m.id for m in await db.get_archived_memories()] == ["1", "2"]
@@ -0,0 +1,98 @@
+import asyncio
+
+from galadriel.entities import Message
+from src.connectors.resilience import CircuitOpenError
+from src.connectors.resilience import NoResultError
+from src.repository import dead_letter_store
+from src.repository.dead_letter_store import DeadLetterStore
+
+
+def _set_time(mocker, timestamp: int) -> None:
+    mocker.patch.object(
+        dead_letter_store.utils, "get_current_timestamp", return_value=timestamp
+    )
+
+
+def _get_message() -> Message:
+    return Message(
+        content="",
+        conversation_id="1",
+        type="tweet_reply",
+        additional_kwargs={"id": "2"},
+    )
+
+
+def test_classifies_errors():
+    assert dead_letter_store.classify_error(asyncio.TimeoutError()) == "transient"
+    assert dead_letter_store.classify_error(CircuitOpenError()) == "transient"
+    assert dead_letter_store.classify_error(NoResultError("No LLM response")) == (
+        "transient"
+    )
+    assert dead_letter_store.classify_error(Exception("unexpected")) == "permanent"
+    assert dead_letter_store.classify_error(KeyError("text")) == "permanent"
+
+
+async def test_retries_transient_errors_with_backoff(tmp_path, mocker):
+    _set_time(mocker, 1000)
+    store = DeadLetterStore(str(tmp_path))
+    entry = await store.add(_get_message(), asyncio.TimeoutError())
+    assert entry.next_attempt_at == 1000 + dead_letter_store.RETRY_BASE_DELAY_SECONDS
+    assert await store.get_due_entries() == []
+
+    # Failing again is the next attempt of the same entry
+    entry = await store.add(_get_message(), asyncio.TimeoutError())
+    assert entry.attempts == 2
+    assert (
+        entry.next_attempt_at == 1000 + 2 * dead_letter_store.RETRY_BASE_DELAY_SECONDS
+    )
+
+    _set_time(mocker, entry.next_attempt_at)
+    assert await store.get_due_entries() == [entry]
+    await store.mark_done(_get_message())
+    assert await store.get_due_entries() == []
+    assert [e.status for e in await store.get_entries()] == ["done"]
+
+
+async def test_gives_up_on_permanent_errors_and_max_attempts(tmp_path):
+    store = DeadLetterStore(str(tmp_path))
+    entry = await store.add(_get_message(), KeyError("text"))
+    assert entry.status == "failed"
+
+    other_message = Message(content="", type="tweet_original")
+    for _ in range(dead_letter_store.MAX_ATTEMPTS):
+        entry = await store.add(other_message, asyncio.TimeoutError())
+    assert entry.status == "failed"
+    assert entry.attempts == dead_letter_store.MAX_ATTEMPTS
+
+
+async def test_replay_is_seen_by_running_store(tmp_path, mocker):
+    _set_time(mocker, 1000)
+    store = DeadLetterStore(str(tmp_path))
+    entry = await store.add(_get_message(), KeyError("text"))
+
+    # Replayed from another process, eg the CLI
+    await asyncio.sleep(0.01)
+    cli_store = DeadLetterStore(str(tmp_path))
+    await cli_store.replay([entry.key])
+
+    due_entries = await store.get_due_entries()
+    assert [e.key for e in due_entries] == [entry.key]
+    assert due_entries[0].message == _get_message()
+
+
+async def test_save_keeps_replay_from_another_process(tmp_path, mocker):
+    _set_time(mocker, 1000)
+    store = DeadLetterStore(str(tmp_path))
+    failed_entry = await store.add(_get_message(), KeyError("text"))
+    other_message = Message(content="", type="tweet_original")
+    await store.add(other_message, asyncio.TimeoutError())
+    _set_time(mocker, 2000)
+    [due_entry] = await store.get_due_entries()
+
+    await asyncio.sleep(0.01)
+    await DeadLetterStore(str(tmp_path)).replay([failed_entry.key])
+    # Saved from the entries read before the replay
+    await store.mark_requeued(due_entry)
+
+    entries = await DeadLetterStore(str(tmp_path)).get_entries("pending")
+    assert {e.key for e in entries} == {failed_entry.key, due_entry.key}
@@ -0,0 +1,62 @@
+from src.models import Memory
+from src.models import TwitterPost
+from src.repository.draft_buffer import DraftBuffer
+from src.repository.history_summary import HistorySummary
+
+
+def _get_post(text: str, quoted_tweet_username: str = None) -> TwitterPost:
+    return TwitterPost(
+        type="tweet",
+        conversation_id=None,
+        text=text,
+        topics=[],
+        search_topic=None,
+        quoted_tweet_id="10" if quoted_tweet_username else None,
+        quoted_tweet_username=quoted_tweet_username,
+    )
+
+
+def _get_memory(text: str) -> Memory:
+    return Memory(
+        id="mock_id",
+        conversation_id="mock_id",
+        type="tweet",
+        text=text,
+        topics=[],
+        timestamp=123,
+        quoted_tweet_id="1",
+        quoted_tweet_username="recent",
+    )
+
+
+async def test_pops_drafts_in_order(tmp_path):
+    buffer = DraftBuffer(str(tmp_path), max_age_seconds=60)
+    await buffer.add(_get_post("first"))
+    await buffer.add(_get_post("second"))
+
+    reloaded_buffer = DraftBuffer(str(tmp_path), max_age_seconds=60)
+    assert await reloaded_buffer.get_count() == 2
+    draft = await reloaded_buffer.pop_valid(HistorySummary())
+    assert draft.post.text == "first"
+    assert await reloaded_buffer.get_count() == 1
+
+
+async def test_drops_invalid_drafts(tmp_path):
+    buffer = DraftBuffer(str(tmp_path), max_age_seconds=60)
+    await buffer.add(_get_post("Posted  already"))
+    await buffer.add(_get_post("quote", quoted_tweet_username="recent"))
+    await buffer.add(_get_post("valid"))
+
+    summary = HistorySummary.build([_get_memory("posted already")])
+    draft = await buffer.pop_valid(summary)
+    assert draft.post.text == "valid"
+    assert await buffer.get_count() == 0
+
+
+async def test_drops_old_drafts(tmp_path):
+    buffer = DraftBuffer(str(tmp_path), max_age_seconds=60)
+    await buffer.add(_get_post("old"))
+    buffer._drafts[0].created_at -= 120
+
+    assert await buffer.pop_valid(HistorySummary()) is None
+    assert await buffer.get_count() == 0
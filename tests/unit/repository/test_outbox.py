@@ -0,0 +1,76 @@
+from src.models import TwitterPost
+from src.repository import outbox
+from src.repository.outbox import Outbox
+
+
+def _get_post(text: str = "mock_text", reply_to_id: str = None) -> TwitterPost:
+    return TwitterPost(
+        type="tweet", conversation_id=None, text=text, reply_to_id=reply_to_id
+    )
+
+
+def _set_time(mocker, timestamp: int) -> None:
+    mocker.patch.object(outbox.utils, "get_current_timestamp", return_value=timestamp)
+
+
+async def test_new_entry_is_only_retried_after_failing(tmp_path, mocker):
+    _set_time(mocker, 1000)
+    box = Outbox(str(tmp_path))
+    entry = await box.add(_get_post())
+    # Being sent by the caller, the retry loop must not send it too
+    assert await box.get_due_entries() == []
+
+    await box.mark_failed(entry, "error")
+    _set_time(mocker, 1000 + outbox.RETRY_BASE_DELAY_SECONDS)
+    assert await box.get_due_entries() == [entry]
+
+
+async def test_backoff_schedule(tmp_path, mocker):
+    _set_time(mocker, 1000)
+    box = Outbox(str(tmp_path))
+    entry = await box.add(_get_post())
+
+    delays = []
+    for _ in range(outbox.MAX_ATTEMPTS - 1):
+        await box.mark_failed(entry, "error")
+        delays.append(entry.next_attempt_at - 1000)
+    assert delays[:3] == [60, 120, 240]
+    assert max(delays) == outbox.RETRY_MAX_DELAY_SECONDS
+    assert entry.status == "pending"
+
+    await box.mark_failed(entry, "error")
+    assert entry.status == "failed"
+    assert entry.attempts == outbox.MAX_ATTEMPTS
+    assert await box.get_due_entries() == []
+
+
+async def test_deduplicates_by_content_hash(tmp_path, mocker):
+    _set_time(mocker, 1000)
+    box = Outbox(str(tmp_path))
+    entry = await box.add(_get_post())
+    await box.mark_done(entry, "tweet_id")
+
+    # Kept after a restart, so the same content is not posted twice
+    box = Outbox(str(tmp_path))
+    assert await box.add(_get_post()) is None
+    assert await box.add(_get_post(reply_to_id="1")) is not None
+    assert await box.add(_get_post(text="other_text")) is not None
+
+
+async def test_prunes_finished_entries(tmp_path, mocker):
+    _set_time(mocker, 1000)
+    box = Outbox(str(tmp_path))
+    done_entry = await box.add(_get_post())
+    await box.mark_done(done_entry, "tweet_id")
+    pending_entry = await box.add(_get_post(text="other_text"))
+    await box.mark_failed(pending_entry, "error")
+
+    _set_time(mocker, 1001 + outbox.DONE_RETENTION_SECONDS)
+    await box.add(_get_post(text="new_text"))
+
+    box = Outbox(str(tmp_path))
+    assert await box.add(_get_post()) is not None
+    # Pending entries are kept however old they are, and after a restart the
+    # entries that were being sent are retried as well
+    due_entries = await box.get_due_entries()
+    assert [e.post.text for e in due_entries] == ["other_text", "new_text"]
@@ -0,0 +1,20 @@
+import asyncio
+
+from src.repository.usage_store import TaskUsage
+from src.repository.usage_store import UsageStore
+
+
+async def test_stores_sharing_data_dir_keep_each_others_usage(tmp_path):
+    store = UsageStore(str(tmp_path))
+    other_store = UsageStore(str(tmp_path))
+    await store.add("agent", "reply", TaskUsage(requests=1, prompt_tokens=10))
+    await asyncio.sleep(0.01)
+    await other_store.add("other_agent", "reply", TaskUsage(requests=1))
+    await asyncio.sleep(0.01)
+    await store.add("agent", "reply", TaskUsage(requests=1, prompt_tokens=5))
+
+    usage = await UsageStore(str(tmp_path)).get_usage("agent")
+    assert usage["reply"].requests == 2
+    assert usage["reply"].prompt_tokens == 15
+    other_usage = await UsageStore(str(tmp_path)).get_usage("other_agent")
+    assert other_usage["reply"].requests == 1
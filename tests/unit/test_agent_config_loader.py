@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from src.agent_config_loader import load_agent_config
+from src.models import TwitterAgentConfig
+
+
+def _write_config(tmp_path, **fields) -> None:
+    agent_dict = {field: ["value"] for field in TwitterAgentConfig.required_fields()}
+    agent_dict.update({"name": "agent", "settings": {"model": "gpt-4o"}}, **fields)
+    with open(tmp_path / "agent.json", "w", encoding="utf-8") as f:
+        f.write(json.dumps(agent_dict))
+
+
+def test_caches_config_by_file_content(tmp_path):
+    _write_config(tmp_path)
+    agent_config = load_agent_config("agent", str(tmp_path))
+    assert agent_config.name == "agent"
+    assert load_agent_config("agent", str(tmp_path)) is agent_config
+
+    _write_config(tmp_path, twitter_profile={"username": "agent"})
+    changed_config = load_agent_config("agent", str(tmp_path))
+    assert changed_config is not agent_config
+    assert changed_config.extra_fields == {"twitter_profile": {"username": "agent"}}
+
+
+def test_raises_on_missing_fields(tmp_path):
+    _write_config(tmp_path, system="")
+    with pytest.raises(KeyError, match="system"):
+        load_agent_config("agent", str(tmp_path))
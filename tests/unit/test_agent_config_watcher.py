@@ -0,0 +1,62 @@
+import json
+import os
+
+from src.agent_config_loader import load_agent_config
+from src.agent_config_watcher import AgentConfigWatcher
+from src.models import TwitterAgentConfig
+
+
+def _write_config(tmp_path, modified_at: int, **fields) -> None:
+    agent_dict = {field: ["value"] for field in TwitterAgentConfig.required_fields()}
+    agent_dict.update({"name": "agent", "settings": {"model": "gpt-4o"}}, **fields)
+    file_path = tmp_path / "agent.json"
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(agent_dict))
+    os.utime(file_path, ns=(modified_at, modified_at))
+
+
+def _get_watcher(tmp_path, reloaded_configs):
+    return AgentConfigWatcher(
+        "agent",
+        load_agent_config("agent", str(tmp_path)),
+        reloaded_configs.append,
+        config_dir=str(tmp_path),
+    )
+
+
+def test_reloads_changed_config(tmp_path):
+    _write_config(tmp_path, 1)
+    reloaded_configs = []
+    watcher = _get_watcher(tmp_path, reloaded_configs)
+    assert not watcher.check()
+
+    _write_config(tmp_path, 2, topics=["new topic"])
+    assert watcher.check()
+    assert reloaded_configs == [watcher.agent_config]
+    assert watcher.agent_config.topics == ["new topic"]
+
+    # Touched without changes
+    _write_config(tmp_path, 3, topics=["new topic"])
+    assert not watcher.check()
+    assert len(reloaded_configs) == 1
+
+
+def test_keeps_config_on_invalid_file(tmp_path):
+    _write_config(tmp_path, 1)
+    reloaded_configs = []
+    watcher = _get_watcher(tmp_path, reloaded_configs)
+    agent_config = watcher.agent_config
+
+    _write_config(tmp_path, 2, system="")
+    assert not watcher.check()
+    with open(tmp_path / "agent.json", "w", encoding="utf-8") as f:
+        f.write("{")
+    os.utime(tmp_path / "agent.json", ns=(3, 3))
+    assert not watcher.check()
+    assert not reloaded_configs
+    assert watcher.agent_config is agent_config
+
+    # Fixed file is picked up on the next change
+    _write_config(tmp_path, 4, topics=["fixed"])
+    assert watcher.check()
+    assert watcher.agent_config.topics == ["fixed"]
@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+from src.loop_monitor import LoopMonitor
+from src.loop_monitor import LoopMonitorConfig
+
+
+def _block(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def test_reports_blocking_call_sites():
+    loop_monitor = LoopMonitor(
+        LoopMonitorConfig(check_interval_seconds=0.01, blocked_threshold_seconds=0.05)
+    )
+    loop_monitor.start()
+    await asyncio.sleep(0.05)
+    _block(0.3)
+    await asyncio.sleep(0.05)
+    _block(0.3)
+    await asyncio.sleep(0.05)
+    loop_monitor.close()
+
+    report = loop_monitor.get_report()
+    assert len(report) == 1
+    assert report[0].call_site.startswith("tests/unit/test_loop_monitor.py:")
+    assert report[0].call_site.endswith(" _block")
+    assert report[0].count == 2
+    assert report[0].total_seconds >= 0.4
+    assert "_block" in report[0].stack
+
+
+async def test_no_blocks_are_reported_for_awaits():
+    loop_monitor = LoopMonitor(
+        LoopMonitorConfig(check_interval_seconds=0.01, blocked_threshold_seconds=0.05)
+    )
+    loop_monitor.start()
+    await asyncio.sleep(0.2)
+    loop_monitor.close()
+
+    assert not loop_monitor.get_report()
@@ -0,0 +1,49 @@
+from src.models import Memory
+from src.models import TwitterPost
+
+
+def test_memory_from_old_format():
+    memory = Memory.from_dict(
+        {
+            "id": "1",
+            "conversation_id": None,
+            "type": "tweet_excluded",
+            "text": "mock_text",
+            "topics": None,
+            "timestamp": 123,
+        }
+    )
+    assert memory.topics == []
+    assert memory.to_dict() == {
+        "id": "1",
+        "conversation_id": None,
+        "type": "tweet_excluded",
+        "text": "mock_text",
+        "topics": [],
+        "timestamp": 123,
+        "search_topic": None,
+        "quoted_tweet_id": None,
+        "quoted_tweet_username": None,
+        "reply_to_id": None,
+    }
+
+
+def test_memory_interns_repeated_strings():
+    data = {
+        "id": "1",
+        "conversation_id": "1",
+        "type": "tweet",
+        "text": "mock_text",
+        "topics": ["".join(["crypto", " mining"])],
+        "timestamp": 123,
+        "quoted_tweet_username": "".join(["mock", "_user"]),
+    }
+    first = Memory.from_dict(data)
+    second = Memory.from_dict({**data, "topics": ["".join(["crypto", " mining"])]})
+    assert first.topics[0] is second.topics[0]
+    assert first.quoted_tweet_username is second.quoted_tweet_username
+
+
+def test_twitter_post_round_trip():
+    post = TwitterPost(type="tweet", conversation_id=None, text="mock_text")
+    assert TwitterPost.from_dict(post.to_dict()) == post
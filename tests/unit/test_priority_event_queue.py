@@ -0,0 +1,61 @@
+import asyncio
+
+from galadriel.entities import Message
+from galadriel.entities import PushOnlyQueue
+from src.priority_event_queue import PriorityEventQueue
+
+
+def _get_queues(max_size: int = 10):
+    runtime_queue = asyncio.Queue()
+    return runtime_queue, PriorityEventQueue(
+        PushOnlyQueue(runtime_queue), max_size=max_size
+    )
+
+
+async def _get_next(runtime_queue: asyncio.Queue) -> Message:
+    return await asyncio.wait_for(runtime_queue.get(), 1)
+
+
+async def test_orders_by_priority_and_waits_for_handling():
+    runtime_queue, event_queue = _get_queues()
+    await event_queue.put(Message(content="reply1", type="tweet_reply"))
+    await event_queue.put(Message(content="reply2", type="tweet_reply"))
+    await event_queue.put(Message(content="original", type="tweet_original"))
+    event_queue.start()
+
+    message = await _get_next(runtime_queue)
+    assert message.content == "original"
+    await asyncio.sleep(0)
+    # Nothing is sent before the previous event is handled
+    assert runtime_queue.empty()
+
+    await event_queue.task_done(message)
+    assert (await _get_next(runtime_queue)).content == "reply1"
+    await event_queue.close()
+
+
+async def test_deduplicates_queued_and_in_flight_events():
+    runtime_queue, event_queue = _get_queues()
+    assert await event_queue.put(Message(content="1"), dedup_key="reply:1")
+    assert not await event_queue.put(Message(content="1"), dedup_key="reply:1")
+    event_queue.start()
+
+    message = await _get_next(runtime_queue)
+    assert not await event_queue.put(Message(content="1"), dedup_key="reply:1")
+    await event_queue.task_done(message)
+    assert await event_queue.put(Message(content="1"), dedup_key="reply:1")
+    await event_queue.close()
+
+
+async def test_backpressure():
+    runtime_queue, event_queue = _get_queues(max_size=1)
+    await event_queue.put(Message(content="1"))
+    put_task = asyncio.create_task(event_queue.put(Message(content="2")))
+    await asyncio.sleep(0.01)
+    assert not put_task.done()
+
+    event_queue.start()
+    await _get_next(runtime_queue)
+    assert await asyncio.wait_for(put_task, 1)
+    assert event_queue.get_size() == 1
+    await event_queue.close()
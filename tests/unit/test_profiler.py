@@ -0,0 +1,54 @@
+import time
+
+from src.profiler import Profiler
+from src.profiler import ProfilerConfig
+
+
+def _busy_work(seconds: float) -> None:
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def test_profiles_the_next_executions(tmp_path):
+    profiler = Profiler(
+        ProfilerConfig(
+            executions=2, sample_interval_seconds=0.001, output_dir=str(tmp_path)
+        )
+    )
+    # Off by default, counting executions does nothing
+    profiler.record_execution()
+    assert not profiler.is_active
+
+    profiler.toggle()
+    assert profiler.is_active
+    _busy_work(0.05)
+    profiler.record_execution()
+    assert profiler.is_active
+    profiler.record_execution()
+    assert not profiler.is_active
+    profiler.close()
+
+    assert profiler.output_path
+    with open(profiler.output_path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    busy_lines = [line for line in lines if "_busy_work (test_profiler.py" in line]
+    assert busy_lines
+    stack, count = busy_lines[0].rsplit(" ", 1)
+    assert stack.split(";")[-1].startswith("_busy_work")
+    assert int(count) > 0
+
+
+def test_stops_after_the_time_window(tmp_path):
+    profiler = Profiler(
+        ProfilerConfig(
+            window_seconds=0.01,
+            sample_interval_seconds=0.001,
+            output_dir=str(tmp_path),
+        )
+    )
+    profiler.start()
+    _busy_work(0.1)
+    assert not profiler.is_active
+    profiler.close()
+    assert profiler.output_path
@@ -0,0 +1,45 @@
+import gzip
+import json
+import os
+from unittest.mock import MagicMock
+
+from src.prompt_log import PromptLog
+from src.prompt_log import PromptLogConfig
+
+MESSAGES = [{"role": "user", "content": "mock_prompt"}]
+
+
+def _get_response(content: str):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+
+def test_does_nothing_when_disabled(tmp_path):
+    file_path = str(tmp_path / "prompts.log")
+    prompt_log = PromptLog(PromptLogConfig(file_path=file_path))
+    prompt_log.log_completion("reply", MESSAGES, _get_response("reply"))
+    assert not os.path.exists(file_path)
+
+
+def test_rate_limits_and_rotates_to_gzip(tmp_path):
+    file_path = str(tmp_path / "prompts.log")
+    prompt_log = PromptLog(
+        PromptLogConfig(
+            is_enabled=True,
+            sample_rate=1,
+            max_per_minute=2,
+            file_path=file_path,
+            max_bytes=150,
+        )
+    )
+    for i in range(3):
+        prompt_log.log_completion("reply", MESSAGES, _get_response(f"reply {i}"))
+
+    with gzip.open(file_path + ".1.gz", "rt", encoding="utf-8") as f:
+        rotated = [json.loads(line) for line in f]
+    with open(file_path, "r", encoding="utf-8") as f:
+        current = [json.loads(line) for line in f]
+    # The third completion is over the rate limit
+    assert [r["response"] for r in rotated + current] == ["reply 0", "reply 1"]
+    assert current[0]["messages"] == MESSAGES
@@ -0,0 +1,131 @@
+from typing import List
+from typing import Optional
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+from galadriel.connectors.twitter import SearchResult
+from src import metrics
+from src.connectors.twitter_timeline_client import TimelinePage
+from src.connectors.twitter_timeline_client import TwitterTimelineClient
+from src.replies.thread_cache import ThreadCache
+from src.repository.cursor_repository import CursorRepository
+from src.repository.history_summary import HistorySummary
+from src.twitter_mentions_input import TwitterMentionsInput
+from src.twitter_mentions_input import TwitterMentionsInputConfig
+
+
+def _get_tweet(
+    tweet_id: str, username: str = "user", parent_id: Optional[str] = None
+) -> SearchResult:
+    return SearchResult(
+        id=tweet_id,
+        username=username,
+        text=f"text {tweet_id}",
+        retweet_count=0,
+        reply_count=0,
+        like_count=0,
+        quote_count=0,
+        bookmark_count=0,
+        impression_count=0,
+        referenced_tweets=(
+            [{"type": "replied_to", "id": parent_id}] if parent_id else []
+        ),
+        attachments=None,
+    )
+
+
+def _get_page(tweets: List[SearchResult], newest_id: Optional[str]) -> TimelinePage:
+    return TimelinePage(
+        results=tweets,
+        conversation_ids={t.id: "conversation" for t in tweets},
+        newest_id=newest_id,
+    )
+
+
+def _get_input(tmp_path, timeline_client) -> TwitterMentionsInput:
+    summary = HistorySummary()
+    summary.replied_to_ids.add("replied")
+    twitter_client = MagicMock()
+    twitter_client.twitter_username = "agent"
+    twitter_client.database_client.get_history_summary = AsyncMock(return_value=summary)
+    twitter_client.put_event = AsyncMock(return_value=True)
+    twitter_client.is_replies_throttled = AsyncMock(return_value=False)
+    twitter_client.thread_cache = ThreadCache()
+    return TwitterMentionsInput(
+        TwitterMentionsInputConfig(thread_context_depth=2),
+        twitter_client,
+        timeline_client,
+        CursorRepository(str(tmp_path)),
+    )
+
+
+async def test_first_poll_only_starts_the_cursor(tmp_path):
+    timeline_client = MagicMock()
+    timeline_client.get_mentions.return_value = _get_page([_get_tweet("1")], "1")
+    mentions_input = _get_input(tmp_path, timeline_client)
+
+    assert await mentions_input.poll("mentions") == 0
+    assert await CursorRepository(str(tmp_path)).get("mentions") == "1"
+    mentions_input.twitter_client.put_event.assert_not_called()
+
+
+async def test_queues_new_mentions_with_thread_context(tmp_path):
+    await CursorRepository(str(tmp_path)).save("mentions", "1")
+    timeline_client = MagicMock()
+    timeline_client.get_mentions.return_value = _get_page(
+        [
+            _get_tweet("5", parent_id="4"),
+            _get_tweet("6", parent_id="5"),
+            _get_tweet("7", username="agent"),
+            _get_tweet("replied"),
+        ],
+        "replied",
+    )
+    timeline_client.get_tweets.side_effect = [
+        _get_page([_get_tweet("4", parent_id="3")], None),
+        _get_page([_get_tweet("3", parent_id="2")], None),
+    ]
+    mentions_input = _get_input(tmp_path, timeline_client)
+
+    assert await mentions_input.poll("mentions") == 2
+    timeline_client.get_mentions.assert_called_once_with("1", 3)
+    # One lookup per level, known tweets are not fetched again
+    assert [c.args[0] for c in timeline_client.get_tweets.mock_calls] == [["4"], ["3"]]
+    events = [c.args[0] for c in mentions_input.twitter_client.put_event.mock_calls]
+    assert [e.additional_kwargs["id"] for e in events] == ["5", "6"]
+    assert events[0].conversation_id == "conversation"
+    thread_cache = mentions_input.twitter_client.thread_cache
+    assert [t.id for t in thread_cache.get_thread("conversation", "6")] == [
+        "3",
+        "4",
+        "5",
+    ]
+    assert await CursorRepository(str(tmp_path)).get("mentions") == "replied"
+
+
+async def test_counts_truncated_polls(tmp_path):
+    metrics.reset()
+    await CursorRepository(str(tmp_path)).save("mentions", "1")
+    timeline_client = MagicMock()
+    page = _get_page([_get_tweet("5")], "5")
+    page.is_truncated = True
+    timeline_client.get_mentions.return_value = page
+    mentions_input = _get_input(tmp_path, timeline_client)
+
+    assert await mentions_input.poll("mentions") == 1
+    assert await CursorRepository(str(tmp_path)).get("mentions") == "5"
+    assert metrics.get_counter("mentions_input.mentions.truncated_polls") == 1
+
+
+def test_timeline_is_truncated_after_max_pages():
+    timeline_client = TwitterTimelineClient(MagicMock())
+    timeline_client._user_id = "agent"
+    timeline_client._make_request = MagicMock(
+        return_value={"data": [], "meta": {"newest_id": "9", "next_token": "next"}}
+    )
+
+    page = timeline_client.get_mentions("1", max_pages=2)
+
+    assert page.is_truncated
+    assert page.newest_id == "9"
+    assert timeline_client._make_request.call_count == 2